@@ -92,6 +92,12 @@ WSGI_APPLICATION = 'registrovehiculos.wsgi.application'
 DATABASES = {
     'default': dj_database_url.config(default=os.getenv('DATABASE_URL'))
 }
+# Las pruebas usan un archivo (en .gitignore) en vez de la base en memoria:
+# NumeroOrdenConcurrenteTests escribe desde varios hilos, y la memoria
+# compartida bloquea por tabla y falla al instante ("database table is locked")
+# en vez de esperar el bloqueo como hace SQLite sobre un archivo
+if DATABASES['default'].get('ENGINE') == 'django.db.backends.sqlite3':
+    DATABASES['default']['TEST'] = {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')}
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -124,6 +130,24 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Almacén de imágenes direccionado por contenido (SHA-256).
+# En Railway el disco es efímero: para guardar las fotos en Postgres usar
+# IMAGENES_STORAGE_BACKEND=vehiculos.almacenamiento.AlmacenamientoBaseDatos
+IMAGENES_STORAGE = {
+    'BACKEND': os.getenv('IMAGENES_STORAGE_BACKEND', 'django.core.files.storage.FileSystemStorage'),
+    'OPTIONS': {
+        'location': os.getenv('IMAGENES_STORAGE_LOCATION', os.path.join(MEDIA_ROOT, 'imagenes')),
+    },
+}
+
+# Normalización de fotos al recibirlas (ver vehiculos/imagenes.py)
+IMAGENES_NORMALIZACION = {
+    'LADO_MAXIMO': int(os.getenv('IMAGENES_LADO_MAXIMO', 2560)),
+    'CALIDAD': int(os.getenv('IMAGENES_CALIDAD', 85)),
+    'FORMATO': os.getenv('IMAGENES_FORMATO', 'JPEG'),  # o 'WEBP'
+    'PROCESOS': int(os.getenv('IMAGENES_PROCESOS', 2)),
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -3,7 +3,7 @@ from django.utils.html import format_html
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
 from .models import (
-    Vehiculo, Empresa, PerfilUsuario, ImagenTexto,
+    Vehiculo, Empresa, PerfilUsuario, ImagenTexto, EstadisticaImagenes,
     DetalleMotor, PuntoMotor, PuntoMotorImagen,
     DetalleTransmision, PuntoTransmision, PuntoTransmisionImagen,
     DetalleFrenos, PuntoFrenos, PuntoFrenosImagen,
@@ -22,10 +22,10 @@ class PuntoMotorImagenInline(admin.TabularInline):
     readonly_fields = ('image_preview',)
     
     def image_preview(self, obj):
-        if obj.imagen_base64:
+        if obj.tiene_imagen:
             return format_html(
-                '<img src="data:image/jpeg;base64,{}" style="max-height:50px; max-width:75px;" />',
-                obj.imagen_base64
+                '<img src="{}" style="max-height:50px; max-width:75px;" />',
+                obj.get_imagen_url('thumb')
             )
         return "No hay imagen"
     image_preview.short_description = 'Vista Previa'
@@ -36,10 +36,10 @@ class PuntoTransmisionImagenInline(admin.TabularInline):
     readonly_fields = ('image_preview',)
     
     def image_preview(self, obj):
-        if obj.imagen_base64:
+        if obj.tiene_imagen:
             return format_html(
-                '<img src="data:image/jpeg;base64,{}" style="max-height:50px; max-width:75px;" />',
-                obj.imagen_base64
+                '<img src="{}" style="max-height:50px; max-width:75px;" />',
+                obj.get_imagen_url('thumb')
             )
         return "No hay imagen"
     image_preview.short_description = 'Vista Previa'
@@ -50,10 +50,10 @@ class PuntoFrenosImagenInline(admin.TabularInline):
     readonly_fields = ('image_preview',)
     
     def image_preview(self, obj):
-        if obj.imagen_base64:
+        if obj.tiene_imagen:
             return format_html(
-                '<img src="data:image/jpeg;base64,{}" style="max-height:50px; max-width:75px;" />',
-                obj.imagen_base64
+                '<img src="{}" style="max-height:50px; max-width:75px;" />',
+                obj.get_imagen_url('thumb')
             )
         return "No hay imagen"
     image_preview.short_description = 'Vista Previa'
@@ -64,10 +64,10 @@ class PuntoDireccionSuspensionImagenInline(admin.TabularInline):
     readonly_fields = ('image_preview',)
     
     def image_preview(self, obj):
-        if obj.imagen_base64:
+        if obj.tiene_imagen:
             return format_html(
-                '<img src="data:image/jpeg;base64,{}" style="max-height:50px; max-width:75px;" />',
-                obj.imagen_base64
+                '<img src="{}" style="max-height:50px; max-width:75px;" />',
+                obj.get_imagen_url('thumb')
             )
         return "No hay imagen"
     image_preview.short_description = 'Vista Previa'
@@ -78,10 +78,10 @@ class PuntoCarroceriaImagenInline(admin.TabularInline):
     readonly_fields = ('image_preview',)
     
     def image_preview(self, obj):
-        if obj.imagen_base64:
+        if obj.tiene_imagen:
             return format_html(
-                '<img src="data:image/jpeg;base64,{}" style="max-height:50px; max-width:75px;" />',
-                obj.imagen_base64
+                '<img src="{}" style="max-height:50px; max-width:75px;" />',
+                obj.get_imagen_url('thumb')
             )
         return "No hay imagen"
     image_preview.short_description = 'Vista Previa'
@@ -92,10 +92,10 @@ class PuntoRevisionGeneralImagenInline(admin.TabularInline):
     readonly_fields = ('image_preview',)
     
     def image_preview(self, obj):
-        if obj.imagen_base64:
+        if obj.tiene_imagen:
             return format_html(
-                '<img src="data:image/jpeg;base64,{}" style="max-height:50px; max-width:75px;" />',
-                obj.imagen_base64
+                '<img src="{}" style="max-height:50px; max-width:75px;" />',
+                obj.get_imagen_url('thumb')
             )
         return "No hay imagen"
     image_preview.short_description = 'Vista Previa'
@@ -106,10 +106,10 @@ class PuntoInteriorImagenInline(admin.TabularInline):
     readonly_fields = ('image_preview',)
     
     def image_preview(self, obj):
-        if obj.imagen_base64:
+        if obj.tiene_imagen:
             return format_html(
-                '<img src="data:image/jpeg;base64,{}" style="max-height:50px; max-width:75px;" />',
-                obj.imagen_base64
+                '<img src="{}" style="max-height:50px; max-width:75px;" />',
+                obj.get_imagen_url('thumb')
             )
         return "No hay imagen"
     image_preview.short_description = 'Vista Previa'
@@ -275,26 +275,26 @@ class PuntoInteriorAdmin(admin.ModelAdmin):
 # --------------------------------------------------
 @admin.register(Vehiculo)
 class VehiculoAdmin(admin.ModelAdmin):
-    list_display = ('numero_orden', 'patente', 'marca', 'modelo', 'usuario', 'fecha_registro', 'image_preview')
+    list_display = ('numero_orden', 'patente', 'marca', 'modelo', 'usuario', 'empresa', 'fecha_registro', 'image_preview')
     list_display_links = ('numero_orden', 'patente')
     search_fields = ('patente', 'marca', 'modelo', 'numero_orden')
-    list_filter = ('marca', 'fecha_registro')
+    list_filter = ('empresa', 'marca', 'fecha_registro')
     readonly_fields = ('numero_orden', 'fecha_registro', 'image_preview_large')
     
     def image_preview(self, obj):
-        if obj.imagen_base64:
+        if obj.tiene_imagen:
             return format_html(
-                '<img src="data:image/jpeg;base64,{}" style="max-height:30px; max-width:45px;" />',
-                obj.imagen_base64
+                '<img src="{}" style="max-height:30px; max-width:45px;" />',
+                obj.get_imagen_url('thumb')
             )
         return "Sin imagen"
     image_preview.short_description = 'Vista Previa'
     
     def image_preview_large(self, obj):
-        if obj.imagen_base64:
+        if obj.tiene_imagen:
             return format_html(
-                '<img src="data:image/jpeg;base64,{}" style="max-height:200px; max-width:300px;" />',
-                obj.imagen_base64
+                '<img src="{}" style="max-height:200px; max-width:300px;" />',
+                obj.get_imagen_url('medium')
             )
         return "Sin imagen"
     image_preview_large.short_description = 'Imagen del Vehículo'
@@ -308,19 +308,19 @@ class ImagenTextoAdmin(admin.ModelAdmin):
     readonly_fields = ('image_preview_large',)
     
     def image_preview(self, obj):
-        if obj.imagen_base64:
+        if obj.tiene_imagen:
             return format_html(
-                '<img src="data:image/jpeg;base64,{}" style="max-height:30px; max-width:45px;" />',
-                obj.imagen_base64
+                '<img src="{}" style="max-height:30px; max-width:45px;" />',
+                obj.get_imagen_url('thumb')
             )
         return "Sin imagen"
     image_preview.short_description = 'Vista Previa'
     
     def image_preview_large(self, obj):
-        if obj.imagen_base64:
+        if obj.tiene_imagen:
             return format_html(
-                '<img src="data:image/jpeg;base64,{}" style="max-height:200px; max-width:300px;" />',
-                obj.imagen_base64
+                '<img src="{}" style="max-height:200px; max-width:300px;" />',
+                obj.get_imagen_url('medium')
             )
         return "Sin imagen"
     image_preview_large.short_description = 'Imagen Completa'
@@ -362,6 +362,27 @@ class PerfilUsuarioAdmin(admin.ModelAdmin):
     search_fields = ('usuario__username', 'empresa__nombre')
     list_filter = ('cargo', 'empresa')
 
+@admin.register(EstadisticaImagenes)
+class EstadisticaImagenesAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'imagenes', 'mb_originales', 'mb_guardados', 'mb_ahorrados', 'fecha_actualizacion')
+    list_select_related = ('empresa',)
+    readonly_fields = ('empresa', 'imagenes', 'bytes_originales', 'bytes_guardados', 'fecha_actualizacion')
+
+    def mb_originales(self, obj):
+        return f"{obj.bytes_originales / 1048576:.1f}"
+    mb_originales.short_description = 'MB recibidos'
+
+    def mb_guardados(self, obj):
+        return f"{obj.bytes_guardados / 1048576:.1f}"
+    mb_guardados.short_description = 'MB guardados'
+
+    def mb_ahorrados(self, obj):
+        if not obj.bytes_originales:
+            return "0.0"
+        porcentaje = obj.bytes_ahorrados * 100 / obj.bytes_originales
+        return f"{obj.bytes_ahorrados / 1048576:.1f} ({porcentaje:.0f}%)"
+    mb_ahorrados.short_description = 'MB ahorrados'
+
 # Re-registrar UserAdmin
 admin.site.unregister(User)
 admin.site.register(User, CustomUserAdmin)
\ No newline at end of file
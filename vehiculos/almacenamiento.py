@@ -0,0 +1,126 @@
+import io
+
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.db import connection
+
+from .models import BlobImagen
+
+
+# --------------------------------------------
+# Backend del almacén de imágenes en la base de datos
+# --------------------------------------------
+# Para despliegues con disco efímero (Railway) los blobs pueden vivir en
+# Postgres. Se activa con:
+#
+#     IMAGENES_STORAGE_BACKEND=vehiculos.almacenamiento.AlmacenamientoBaseDatos
+#
+# Los bytes se guardan en bruto en BlobImagen.datos (BinaryField), que ocupa
+# ~25% menos que el mismo contenido en base64, y se leen por tramos para no
+# cargar la imagen entera en memoria al servirla.
+
+TAMANO_TRAMO = 256 * 1024
+
+
+class LectorBlob(io.RawIOBase):
+    """Lectura secuencial/aleatoria de un BlobImagen pidiendo tramos con substr()"""
+
+    def __init__(self, pk, tamano):
+        super().__init__()
+        self.pk = pk
+        self.tamano = tamano
+        self.posicion = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.posicion
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.posicion = offset
+        elif whence == io.SEEK_CUR:
+            self.posicion += offset
+        elif whence == io.SEEK_END:
+            self.posicion = self.tamano + offset
+        self.posicion = max(self.posicion, 0)
+        return self.posicion
+
+    def readinto(self, buffer):
+        cantidad = min(len(buffer), self.tamano - self.posicion)
+        if cantidad <= 0:
+            return 0
+        tabla = connection.ops.quote_name(BlobImagen._meta.db_table)
+        with connection.cursor() as cursor:
+            # substr() sobre bytea/BLOB cuenta bytes y empieza en 1
+            cursor.execute(
+                f"SELECT substr(datos, %s, %s) FROM {tabla} WHERE id = %s",
+                [self.posicion + 1, cantidad, self.pk],
+            )
+            fila = cursor.fetchone()
+        if fila is None:
+            raise FileNotFoundError(f"Blob {self.pk} eliminado durante la lectura")
+        tramo = bytes(fila[0])
+        buffer[:len(tramo)] = tramo
+        self.posicion += len(tramo)
+        return len(tramo)
+
+
+class AlmacenamientoBaseDatos(Storage):
+    """Storage de Django sobre la tabla BlobImagen; rutas como ab/cd/<sha256>"""
+
+    def __init__(self, tamano_tramo=TAMANO_TRAMO, **kwargs):
+        # Se aceptan (e ignoran) las opciones del backend de disco, p. ej. location
+        self.tamano_tramo = tamano_tramo
+
+    def _open(self, name, mode='rb'):
+        fila = BlobImagen.objects.filter(ruta=name).values_list('pk', 'tamano').first()
+        if fila is None:
+            raise FileNotFoundError(name)
+        lector = io.BufferedReader(LectorBlob(*fila), buffer_size=self.tamano_tramo)
+        return File(lector, name=name)
+
+    def _save(self, name, content):
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        datos = b''.join(content.chunks())
+        BlobImagen.objects.get_or_create(ruta=name, defaults={'datos': datos, 'tamano': len(datos)})
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # Direccionado por contenido: el mismo nombre siempre tiene los mismos bytes
+        return name
+
+    def exists(self, name):
+        return BlobImagen.objects.filter(ruta=name).exists()
+
+    def delete(self, name):
+        BlobImagen.objects.filter(ruta=name).delete()
+
+    def size(self, name):
+        tamano = BlobImagen.objects.filter(ruta=name).values_list('tamano', flat=True).first()
+        if tamano is None:
+            raise FileNotFoundError(name)
+        return tamano
+
+    def get_modified_time(self, name):
+        fecha = BlobImagen.objects.filter(ruta=name).values_list('fecha_creacion', flat=True).first()
+        if fecha is None:
+            raise FileNotFoundError(name)
+        return fecha
+
+    def listdir(self, path):
+        prefijo = f"{path.strip('/')}/" if path.strip('/') else ''
+        directorios, archivos = set(), []
+        rutas = BlobImagen.objects.filter(ruta__startswith=prefijo).values_list('ruta', flat=True)
+        for ruta in rutas.iterator():
+            resto = ruta[len(prefijo):]
+            if '/' in resto:
+                directorios.add(resto.split('/', 1)[0])
+            else:
+                archivos.append(resto)
+        return sorted(directorios), archivos
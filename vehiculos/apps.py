@@ -2,9 +2,15 @@ from django.apps import AppConfig
 
 
 class VehiculosConfig(AppConfig):
+    # Hay otra AppConfig en este archivo: sin esto Django usaría la genérica y no llamaría a ready()
+    default = True
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'vehiculos'
 
+    def ready(self):
+        from .models import conectar_senales
+        conectar_senales()
+
 
 from django.apps import AppConfig
 
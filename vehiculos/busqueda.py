@@ -0,0 +1,145 @@
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import connections
+from django.db.models import Count, Q, Sum, Value
+
+
+# --------------------------------------------
+# Planificador del buscador de vehículos
+# --------------------------------------------
+# En vez de un OR de icontains sobre todas las columnas (que obliga a
+# recorrer la tabla entera), el texto se clasifica y cada tipo va a una
+# consulta que usa índice:
+#
+#   - solo dígitos        -> numero_orden exacto (índice único)
+#   - forma de patente    -> prefijo de patente_normalizada (índice btree, por rango)
+#   - texto libre         -> cada palabra en marca o modelo (índice de trigramas
+#                            en PostgreSQL, migración 0015; en SQLite se recorre)
+#
+# Dos a cuatro letras solas ("KIA", "BBCL") pueden ser una marca o el inicio
+# de una patente, así que se buscan de las dos formas.
+
+ORDEN = 'orden'
+PATENTE = 'patente'
+TEXTO = 'texto'
+
+# Patentes chilenas: BBBB12 (actual), AB1234 (antigua), motos BBB12 / AB123
+FORMA_PATENTE = re.compile(r'^[A-Z]{2,4}[0-9]{1,4}$')
+SOLO_LETRAS_CORTO = re.compile(r'^[A-Z]{2,4}$')
+# Solo dígitos ASCII: str.isdigit() acepta '²' o '١', que int() rechaza o no son un número de orden
+SOLO_DIGITOS = re.compile(r'^[0-9]+$')
+ORDEN_MAXIMO = 2 ** 31 - 1
+
+
+def normalizar_patente(patente):
+    """Mayúsculas y solo letras y dígitos: 'ab-cd 12' -> 'ABCD12'"""
+    return re.sub(r'[^A-Z0-9]', '', (patente or '').upper())
+
+
+def clasificar(texto):
+    """Tipos de búsqueda que corresponden al texto, en orden de preferencia"""
+    texto = (texto or '').strip().lstrip('#')
+    if not texto:
+        return []
+    if SOLO_DIGITOS.match(texto):
+        return [ORDEN]
+
+    normalizado = normalizar_patente(texto)
+    if FORMA_PATENTE.match(normalizado):
+        return [PATENTE]
+    if SOLO_LETRAS_CORTO.match(normalizado) and ' ' not in texto:
+        return [PATENTE, TEXTO]
+    return [TEXTO]
+
+
+def rango_prefijo(campo, prefijo):
+    """Q equivalente a startswith pero como rango, para que use un btree en cualquier motor"""
+    siguiente = prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+    return Q(**{f'{campo}__gte': prefijo, f'{campo}__lt': siguiente})
+
+
+def filtro_busqueda(texto):
+    """Q para filtrar vehículos por el texto del buscador; None si no hay nada que buscar"""
+    filtro = None
+    for tipo in clasificar(texto):
+        if tipo == ORDEN:
+            numero = int(texto.strip().lstrip('#'))
+            q = Q(numero_orden=numero) if numero <= ORDEN_MAXIMO else Q(pk__in=[])
+        elif tipo == PATENTE:
+            q = rango_prefijo('patente_normalizada', normalizar_patente(texto))
+        else:
+            q = Q()
+            for palabra in texto.split():
+                q &= Q(marca__icontains=palabra) | Q(modelo__icontains=palabra)
+        filtro = q if filtro is None else filtro | q
+    return filtro
+
+
+# --------------------------------------------
+# Búsqueda en las observaciones de los puntos
+# --------------------------------------------
+# En PostgreSQL se usa un índice GIN sobre to_tsvector('spanish', observacion)
+# (migración 0016), que la base mantiene sola en cada INSERT/UPDATE. En los
+# demás motores PuntoInspeccion.save() mantiene un índice invertido propio
+# (TerminoObservacion) con las raíces que calcula terminos().
+
+CONFIGURACION_TEXTO = 'spanish'
+LARGO_TERMINO = 40
+
+PALABRAS_VACIAS = {
+    'a', 'al', 'con', 'de', 'del', 'el', 'en', 'es', 'esta', 'este', 'hay', 'la', 'las', 'lo',
+    'los', 'no', 'o', 'para', 'pero', 'por', 'que', 'se', 'sin', 'su', 'sus', 'un', 'una', 'y',
+}
+# De más largo a más corto; se quita el primero que deje una raíz de 3 letras o más
+SUFIJOS = (
+    'amientos', 'imientos', 'amiento', 'imiento', 'aciones', 'acion', 'mente',
+    'ados', 'adas', 'idos', 'idas', 'ado', 'ada', 'ido', 'ida', 'es', 'os', 'as', 's', 'o', 'a', 'e',
+)
+
+
+def sin_tildes(texto):
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+
+
+def raiz(palabra):
+    """Raíz aproximada de una palabra en español: 'fugas' -> 'fug', 'aceites' -> 'aceit'"""
+    for sufijo in SUFIJOS:
+        if palabra.endswith(sufijo) and len(palabra) - len(sufijo) >= 3:
+            return palabra[:-len(sufijo)]
+    return palabra
+
+
+def terminos(texto):
+    """Raíces del texto sin palabras vacías, con su frecuencia"""
+    palabras = re.findall(r'[a-z0-9]+', sin_tildes((texto or '').lower()))
+    return Counter(raiz(p)[:LARGO_TERMINO] for p in palabras if p not in PALABRAS_VACIAS)
+
+
+def usa_texto_completo(alias):
+    return connections[alias].vendor == 'postgresql'
+
+
+def buscar_observaciones(puntos, texto):
+    """Puntos del queryset cuya observación contiene todas las palabras del texto,
+    anotados con ``relevancia`` (mayor es mejor)"""
+    if usa_texto_completo(puntos.db):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        # La misma expresión que el índice de la migración 0016, para que lo use
+        vector = SearchVector('observacion', config=CONFIGURACION_TEXTO)
+        consulta = SearchQuery(texto, config=CONFIGURACION_TEXTO, search_type='websearch')
+        return (
+            puntos.annotate(documento=vector).filter(documento=consulta)
+            .annotate(relevancia=SearchRank(vector, consulta))
+        )
+
+    buscados = list(terminos(texto))
+    if not buscados:
+        return puntos.annotate(relevancia=Value(0)).none()
+    return (
+        puntos.filter(terminos__termino__in=buscados)
+        .annotate(coincidencias=Count('terminos'), relevancia=Sum('terminos__frecuencia'))
+        .filter(coincidencias=len(buscados))
+    )
@@ -0,0 +1,119 @@
+import io
+import zipfile
+
+from django.db.models import Q
+from django.utils import timezone
+
+from . import imagenes
+from .models import ImagenPunto
+
+
+# --------------------------------------------
+# Exportación de fotos en un ZIP por streaming
+# --------------------------------------------
+# El ZIP se escribe sobre un buffer que no admite seek: zipfile usa data
+# descriptors y cada entrada se entrega al cliente a medida que se copia.
+# Las filas se leen con .iterator(), así que la memoria no crece con la
+# cantidad de fotos. Estructura: <numero_orden>/<sistema>/<punto>/<id>.jpg
+
+EXTENSIONES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+
+TAMANO_BLOQUE = 64 * 1024
+FILAS_POR_CONSULTA = 200
+
+
+class SalidaZip(io.RawIOBase):
+    """Destino sin seek para zipfile; acumula lo escrito hasta que se vacía"""
+
+    def __init__(self):
+        super().__init__()
+        self.partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes.clear()
+        return datos
+
+
+def filtrar_vehiculos(vehiculos, vehiculo_id=None, fecha_desde=None, fecha_hasta=None, empresa_id=None):
+    """Acota el queryset (ya filtrado por permisos) a lo que se quiere exportar"""
+    if vehiculo_id:
+        vehiculos = vehiculos.filter(id=vehiculo_id)
+    vehiculos = vehiculos.registrados_entre(fecha_desde, fecha_hasta)
+    if empresa_id:
+        vehiculos = vehiculos.filter(empresa_id=empresa_id)
+    return vehiculos
+
+
+def nombre_archivo(mime, base):
+    return f"{base}.{EXTENSIONES.get(mime, 'bin')}"
+
+
+def abrir_fila(modelo, pk, sha256):
+    """Abre el blob de la fila; si aún está en base64 se decodifica solo esa fila"""
+    if sha256:
+        return imagenes.abrir_imagen(sha256)
+    imagen_base64 = modelo.objects.filter(pk=pk).values_list('imagen_base64', flat=True).first()
+    return io.BytesIO(imagenes.decodificar_base64(imagen_base64))
+
+
+def entradas_zip(vehiculos):
+    """Genera (ruta en el ZIP, fecha, modelo, pk, sha256) sin cargar las filas en memoria"""
+    ids = vehiculos.values('id')
+    con_imagen = ~Q(imagen_sha256='') | (Q(imagen_base64__isnull=False) & ~Q(imagen_base64=''))
+
+    fotos_vehiculo = (
+        vehiculos.filter(con_imagen)
+        .values_list('pk', 'numero_orden', 'imagen_sha256', 'imagen_mime', 'fecha_registro')
+        .order_by('numero_orden')
+    )
+    for pk, numero_orden, sha256, mime, fecha in fotos_vehiculo.iterator(chunk_size=FILAS_POR_CONSULTA):
+        yield nombre_archivo(mime or 'image/jpeg', f"{numero_orden}/vehiculo"), fecha, vehiculos.model, pk, sha256
+
+    fotos = (
+        ImagenPunto.objects.filter(punto__detalle__vehiculo__in=ids).filter(con_imagen)
+        .values_list(
+            'pk', 'punto__detalle__vehiculo__numero_orden', 'punto__sistema', 'punto__nombre',
+            'imagen_sha256', 'imagen_mime', 'fecha_subida',
+        )
+        .order_by('punto__detalle__vehiculo__numero_orden', 'punto__sistema', 'punto__nombre', 'pk')
+    )
+    for pk, numero_orden, sistema, punto, sha256, mime, fecha in fotos.iterator(chunk_size=FILAS_POR_CONSULTA):
+        ruta = nombre_archivo(mime or 'image/jpeg', f"{numero_orden}/{sistema}/{punto}/{pk}")
+        yield ruta, fecha, ImagenPunto, pk, sha256
+
+
+def generar_zip(vehiculos):
+    """Itera los bytes del ZIP con las fotos de los vehículos, entrada por entrada"""
+    salida = SalidaZip()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_STORED) as archivo_zip:
+        for ruta, fecha, modelo, pk, sha256 in entradas_zip(vehiculos):
+            fecha = timezone.localtime(fecha) if timezone.is_aware(fecha) else fecha
+            info = zipfile.ZipInfo(ruta, date_time=fecha.timetuple()[:6])
+            # Las fotos ya vienen comprimidas: se guardan sin volver a comprimir
+            info.compress_type = zipfile.ZIP_STORED
+            try:
+                origen = abrir_fila(modelo, pk, sha256)
+            except FileNotFoundError:
+                continue
+            with origen, archivo_zip.open(info, 'w') as destino:
+                for bloque in iter(lambda: origen.read(TAMANO_BLOQUE), b''):
+                    destino.write(bloque)
+                    datos = salida.vaciar()
+                    if datos:
+                        yield datos
+            yield salida.vaciar()
+    # Directorio central del ZIP
+    yield salida.vaciar()
@@ -0,0 +1,137 @@
+import json
+import uuid
+from datetime import timedelta
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.http import HttpResponseRedirect, JsonResponse
+from django.utils import timezone
+
+from .models import ClaveIdempotencia
+from .sincronizacion import AMBITO as AMBITO_SINCRONIZACION
+
+
+# --------------------------------------------
+# Claves de idempotencia para los POST que crean cosas
+# --------------------------------------------
+# Un doble toque o un reintento tras un corte repetía el POST completo: un
+# segundo vehículo con otro numero_orden, otra vez las fotos por normalizar.
+# El cliente manda una clave por envío, en la cabecera Idempotency-Key (fetch)
+# o en el campo oculto clave_idempotencia ({% campo_idempotencia %} en los
+# formularios). La primera vez la vista se ejecuta y su respuesta queda en
+# ClaveIdempotencia; las siguientes con la misma clave reciben esa respuesta
+# sin ejecutar la vista.
+#
+# Solo se guardan las redirecciones y las respuestas JSON exitosas. Un error,
+# o un formulario que vuelve a mostrarse, no deja la clave usada.
+#
+# La fila de la clave se crea (y se confirma) antes de ejecutar la vista, que
+# corre sin transacción propia del decorador: las fotos se guardan y normalizan
+# sin bloquear filas. Un envío simultáneo con la misma clave recibe 409 y la
+# misma clave en otra URL (p. ej. otro vehículo) recibe 422.
+#
+# limpiar_claves_idempotencia borra las claves vencidas (ver VIGENCIAS).
+
+CABECERA = 'Idempotency-Key'
+CAMPO_FORMULARIO = 'clave_idempotencia'
+LARGO_CLAVE = 64
+
+# Tiempo que se guarda cada clave; la sincronización necesita más, porque la
+# app puede pasar días sin conexión y nombra vehículos por la clave que los creó
+VIGENCIA = timedelta(days=1)
+VIGENCIAS = {
+    AMBITO_SINCRONIZACION: timedelta(days=30),
+}
+# Una clave sin respuesta más antigua que esto quedó de una vista que no
+# terminó (se reinició el proceso); un reenvío la retoma en vez de recibir 409
+EN_CURSO = timedelta(minutes=10)
+
+
+def nueva_clave():
+    return uuid.uuid4().hex
+
+
+def clave_de(request):
+    """Clave enviada con la petición, o None si no trae una válida"""
+    clave = request.headers.get(CABECERA) or request.POST.get(CAMPO_FORMULARIO) or ''
+    clave = clave.strip()
+    return clave if 0 < len(clave) <= LARGO_CLAVE else None
+
+
+def serializar(respuesta):
+    """Lo que se guarda de la respuesta para repetirla; None si no se guarda"""
+    if 300 <= respuesta.status_code < 400 and respuesta.has_header('Location'):
+        return {'estado': respuesta.status_code, 'ubicacion': respuesta['Location']}
+    if isinstance(respuesta, JsonResponse) and 200 <= respuesta.status_code < 300:
+        return {'estado': respuesta.status_code, 'json': json.loads(respuesta.content)}
+    return None
+
+
+def reconstruir(guardada):
+    if 'ubicacion' in guardada:
+        respuesta = HttpResponseRedirect(guardada['ubicacion'])
+        respuesta.status_code = guardada['estado']
+    else:
+        respuesta = JsonResponse(guardada['json'], status=guardada['estado'], safe=False)
+    respuesta['Idempotent-Replayed'] = 'true'
+    return respuesta
+
+
+def reservar(filtro, ruta):
+    """Crea la fila de la clave antes de ejecutar la vista.
+
+    Devuelve ``(registro, None)`` si la vista debe ejecutarse, o
+    ``(None, respuesta)`` con la respuesta guardada o el error que corresponde.
+    """
+    try:
+        with transaction.atomic():
+            return ClaveIdempotencia.objects.create(ruta=ruta, **filtro), None
+    except IntegrityError:
+        pass
+
+    anterior = ClaveIdempotencia.objects.filter(**filtro).first()
+    if anterior is not None and anterior.ruta != ruta:
+        return None, JsonResponse(
+            {'success': False, 'error': 'La clave de idempotencia ya se usó en otra petición'}, status=422,
+        )
+    if anterior is not None and anterior.respuesta:
+        return None, reconstruir(anterior.respuesta)
+    # Sin respuesta: la vista sigue ejecutándose, o su proceso murió sin borrar la clave
+    if anterior is not None and ClaveIdempotencia.objects.filter(
+        pk=anterior.pk, respuesta={}, fecha_creacion__lt=timezone.now() - EN_CURSO,
+    ).update(fecha_creacion=timezone.now()):
+        return anterior, None
+    return None, JsonResponse({'success': False, 'error': 'La petición ya se está procesando'}, status=409)
+
+
+def idempotente(ambito):
+    """Decora una vista para que un POST con clave ya respondida reciba la misma respuesta.
+
+    Solo el alta de la clave y el guardado de la respuesta tocan la base de
+    datos aquí; la vista corre fuera de cualquier transacción del decorador.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            clave = clave_de(request) if request.method == 'POST' else None
+            if clave is None or not request.user.is_authenticated:
+                return vista(request, *args, **kwargs)
+
+            registro, repetida = reservar({'usuario': request.user, 'ambito': ambito, 'clave': clave}, request.path)
+            if repetida is not None:
+                return repetida
+            try:
+                respuesta = vista(request, *args, **kwargs)
+            except BaseException:
+                registro.delete()
+                raise
+
+            guardada = serializar(respuesta)
+            if guardada is None:
+                registro.delete()
+            else:
+                registro.respuesta = guardada
+                registro.save(update_fields=['respuesta'])
+            return respuesta
+        return envoltura
+    return decorador
@@ -0,0 +1,413 @@
+import base64
+import binascii
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+# --------------------------------------------
+# Almacén de imágenes direccionado por contenido
+# --------------------------------------------
+# Cada imagen se guarda una sola vez en el backend de almacenamiento,
+# usando como nombre el SHA-256 de sus bytes: el contenido de un nombre no
+# cambia nunca. Las filas de la base de datos solo guardan el hash y los
+# metadatos (tamaño, MIME, dimensiones).
+#
+# Junto al original se guardan variantes reducidas (thumb, medium) para que
+# las páginas pidan la versión más pequeña que les sirva.
+
+# Lado mayor en píxeles de cada variante; 'full' es siempre el original
+VARIANTES = {
+    'thumb': 200,
+    'medium': 800,
+}
+VARIANTE_ORIGINAL = 'full'
+CALIDAD_VARIANTES = 82
+
+# Normalización de las fotos recibidas: se limita el lado mayor, se aplica la orientación
+# EXIF, se quitan los metadatos y se recomprime. Se sobrescribe con
+# settings.IMAGENES_NORMALIZACION; PROCESOS=0 la ejecuta en el mismo proceso.
+NORMALIZACION = {
+    'LADO_MAXIMO': 2560,
+    'CALIDAD': 85,
+    'FORMATO': 'JPEG',
+    'PROCESOS': 2,
+}
+# Si no hace falta reducir ni limpiar EXIF, solo se recomprime si ahorra al menos esto
+AHORRO_MINIMO = 0.10
+
+@dataclass(frozen=True)
+class InfoImagen:
+    sha256: str
+    tamano: int
+    mime: str
+    ancho: int = None
+    alto: int = None
+    tamano_original: int = None
+    # El blob se acaba de escribir y falta normalizarlo
+    nueva: bool = False
+
+
+@lru_cache(maxsize=None)
+def get_storage():
+    """Devuelve el backend configurado en settings.IMAGENES_STORAGE"""
+    config = getattr(settings, 'IMAGENES_STORAGE', {})
+    backend = config.get('BACKEND', 'django.core.files.storage.FileSystemStorage')
+    opciones = config.get('OPTIONS', {
+        'location': os.path.join(settings.MEDIA_ROOT, 'imagenes'),
+    })
+    return import_string(backend)(**opciones)
+
+
+def get_variantes():
+    return getattr(settings, 'IMAGENES_VARIANTES', VARIANTES)
+
+
+def ruta_blob(sha256, variante=VARIANTE_ORIGINAL):
+    """Ruta del blob dentro del almacenamiento: ab/cd/abcd... (o abcd..._thumb)"""
+    ruta = f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+    if variante != VARIANTE_ORIGINAL:
+        ruta = f"{ruta}_{variante}"
+    return ruta
+
+
+def decodificar_base64(texto):
+    """Decodifica un base64 (con o sin prefijo data:) a bytes"""
+    if not texto:
+        return b''
+    texto = texto.strip()
+    if texto.startswith('data:') and ',' in texto:
+        texto = texto.split(',', 1)[1]
+    try:
+        return base64.b64decode(texto)
+    except (binascii.Error, ValueError):
+        return b''
+
+
+def analizar_archivo(archivo):
+    """Obtiene MIME y dimensiones leyendo solo la cabecera; deja el archivo al inicio"""
+    try:
+        with Image.open(archivo) as img:
+            resultado = Image.MIME.get(img.format, 'application/octet-stream'), img.width, img.height
+    except (UnidentifiedImageError, OSError):
+        resultado = 'application/octet-stream', None, None
+    archivo.seek(0)
+    return resultado
+
+
+def analizar_imagen(datos):
+    """Obtiene MIME y dimensiones de la imagen sin decodificar los píxeles"""
+    return analizar_archivo(io.BytesIO(datos))
+
+
+def detectar_mime(archivo):
+    """MIME de un archivo abierto, leyendo solo la cabecera"""
+    return analizar_archivo(archivo)[0]
+
+
+def generar_variante(sha256, variante, img=None):
+    """Genera y guarda una variante reducida del original.
+
+    Devuelve la ruta guardada, o None si el original ya cabe en ese tamaño
+    (en ese caso se sirve el original).
+    """
+    lado = get_variantes()[variante]
+    storage = get_storage()
+    ruta = ruta_blob(sha256, variante)
+    if storage.exists(ruta):
+        return ruta
+
+    if img is None:
+        with abrir_imagen(sha256) as archivo:
+            return generar_variante(sha256, variante, Image.open(archivo))
+
+    datos = reducir(img, lado)
+    if datos is None:
+        return None
+    storage.save(ruta, ContentFile(datos))
+    return ruta
+
+
+def reducir(img, lado):
+    """JPEG de la imagen con el lado mayor en ``lado``; None si ya cabe"""
+    if max(img.size) <= lado:
+        return None
+    # Un original aún sin normalizar puede traer la rotación en el EXIF
+    reducida = ImageOps.exif_transpose(img)
+    reducida.thumbnail((lado, lado), Image.LANCZOS)
+    if reducida.mode not in ('RGB', 'L'):
+        reducida = reducida.convert('RGB')
+    salida = io.BytesIO()
+    reducida.save(salida, 'JPEG', quality=CALIDAD_VARIANTES, optimize=True)
+    return salida.getvalue()
+
+
+def variante_en_memoria(datos, variante):
+    """Variante de unos bytes que no están en el almacén (filas base64 sin migrar).
+
+    No se guarda: devuelve los bytes reducidos, o los originales si ya caben
+    o no se pueden decodificar.
+    """
+    if variante == VARIANTE_ORIGINAL:
+        return datos
+    try:
+        with Image.open(io.BytesIO(datos)) as img:
+            return reducir(img, get_variantes()[variante]) or datos
+    except (UnidentifiedImageError, OSError):
+        return datos
+
+
+def generar_variantes(sha256, archivo):
+    """Genera todas las variantes configuradas a partir del archivo original"""
+    try:
+        with Image.open(archivo) as img:
+            img.load()
+            for variante in get_variantes():
+                generar_variante(sha256, variante, img)
+    except (UnidentifiedImageError, OSError):
+        pass
+
+
+# --------------------------------------------
+# Normalización (en un pool de procesos)
+# --------------------------------------------
+# Las fotos se guardan tal como llegan y se normalizan después, fuera de la
+# petición (vehiculos/normalizacion.py). El blob normalizado se guarda con su
+# propio hash y las filas pasan a usarlo; el hash recibido queda como alias
+# (AliasImagen), así que las referencias que ya tiene el cliente siguen valiendo.
+_pool = None
+
+
+def get_normalizacion():
+    return {**NORMALIZACION, **getattr(settings, 'IMAGENES_NORMALIZACION', {})}
+
+
+def get_pool(procesos):
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=procesos)
+    return _pool
+
+
+def normalizar_archivo(origen, destino, lado_maximo, calidad, formato):
+    """Orienta, reduce y recomprime sin metadatos la imagen en la ruta ``origen``.
+
+    Escribe el resultado en la ruta ``destino`` y devuelve True; devuelve False
+    sin escribir nada si no es una imagen, si es animada o si recomprimirla no
+    compensa. Se ejecuta en los procesos del pool, así que solo recibe rutas
+    (no los bytes) y no debe tocar Django.
+    """
+    try:
+        with Image.open(origen) as img:
+            if getattr(img, 'is_animated', False):
+                return False
+            obligatoria = max(img.size) > lado_maximo or bool(img.getexif()) or 'icc_profile' in img.info
+
+            normalizada = ImageOps.exif_transpose(img)
+            normalizada.thumbnail((lado_maximo, lado_maximo), Image.LANCZOS)
+            if formato == 'JPEG' and normalizada.mode not in ('RGB', 'L'):
+                con_alfa = normalizada.convert('RGBA')
+                normalizada = Image.new('RGB', con_alfa.size, 'white')
+                normalizada.paste(con_alfa, mask=con_alfa.getchannel('A'))
+            elif normalizada.mode not in ('RGB', 'RGBA', 'L'):
+                normalizada = normalizada.convert('RGBA')
+
+            salida = io.BytesIO()
+            normalizada.save(salida, formato, quality=calidad, optimize=True)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return False
+
+    if not obligatoria and salida.tell() >= os.path.getsize(origen) * (1 - AHORRO_MINIMO):
+        return False
+    with open(destino, 'wb') as archivo:
+        archivo.write(salida.getbuffer())
+    return True
+
+
+def ejecutar_normalizacion(origen, destino):
+    """Ejecuta normalizar_archivo() en el pool y espera el resultado.
+
+    Quien llama ya está fuera de la petición (hilo de normalizacion.py o un
+    comando); con PROCESOS=0 se ejecuta en el mismo proceso.
+    """
+    config = get_normalizacion()
+    argumentos = (origen, destino, config['LADO_MAXIMO'], config['CALIDAD'], config['FORMATO'])
+    if not config['PROCESOS']:
+        return normalizar_archivo(*argumentos)
+
+    global _pool
+    try:
+        return get_pool(config['PROCESOS']).submit(normalizar_archivo, *argumentos).result()
+    except BrokenProcessPool:
+        # Un proceso murió (p. ej. por memoria): se recrea el pool en la próxima imagen
+        _pool = None
+        return normalizar_archivo(*argumentos)
+
+
+def normalizar_blob(sha256, reemplazar=True):
+    """Normaliza un blob ya guardado y guarda el resultado con su propio hash.
+
+    Devuelve la InfoImagen del normalizado (con ``tamano_original``), o None si
+    el blob no existe o no cambió. El original no se toca: quien llama pasa las
+    filas al hash nuevo (normalizacion.reapuntar). Con ``reemplazar=False``
+    solo calcula el resultado.
+    """
+    storage = get_storage()
+    ruta = ruta_blob(sha256)
+    if not storage.exists(ruta):
+        return None
+
+    tamano_original = storage.size(ruta)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        destino = os.path.join(directorio, 'normalizada')
+        try:
+            origen = storage.path(ruta)
+        except NotImplementedError:
+            # Almacenamiento sin disco local: el pool necesita una ruta
+            origen = os.path.join(directorio, 'original')
+            with storage.open(ruta, 'rb') as blob, open(origen, 'wb') as copia:
+                shutil.copyfileobj(blob, copia)
+        if not ejecutar_normalizacion(origen, destino):
+            return None
+
+        with open(destino, 'rb') as normalizada:
+            archivo = File(normalizada)
+            sha256_normalizada = calcular_sha256(archivo)
+            if sha256_normalizada == sha256:
+                return None
+            mime, ancho, alto = analizar_archivo(archivo)
+            ruta_normalizada = ruta_blob(sha256_normalizada)
+            if reemplazar and not storage.exists(ruta_normalizada):
+                storage.save(ruta_normalizada, archivo)
+                archivo.seek(0)
+                generar_variantes(sha256_normalizada, archivo)
+
+        return InfoImagen(
+            sha256=sha256_normalizada, tamano=os.path.getsize(destino), mime=mime, ancho=ancho, alto=alto,
+            tamano_original=tamano_original,
+        )
+
+
+def calcular_sha256(archivo):
+    """SHA-256 del archivo leído por bloques; lo deja al inicio"""
+    hasher = hashlib.sha256()
+    for bloque in archivo.chunks():
+        hasher.update(bloque)
+    archivo.seek(0)
+    return hasher.hexdigest()
+
+
+def hashes_vigentes(hashes):
+    """{hash: hash del blob que lo sirve hoy}: el normalizado si ese hash tiene alias"""
+    from .models import AliasImagen
+    return AliasImagen.vigentes(hashes)
+
+
+def hash_vigente(sha256):
+    return hashes_vigentes([sha256])[sha256]
+
+
+def guardar_archivo(archivo):
+    """Guarda un archivo (UploadedFile, File) en el almacén tal como llegó.
+
+    Se lee por bloques sin cargarlo entero. Si el hash ya existe (o ya se
+    normalizó, ver AliasImagen) no se vuelve a escribir; ``nueva`` indica si se
+    escribió y queda por normalizar.
+    """
+    sha256 = calcular_sha256(archivo)
+    vigente = hash_vigente(sha256)
+    if existe_imagen(vigente):
+        return replace(info_blob(vigente), tamano_original=archivo.size)
+    mime, ancho, alto = analizar_archivo(archivo)
+    get_storage().save(ruta_blob(sha256), archivo)
+
+    return InfoImagen(
+        sha256=sha256, tamano=archivo.size, mime=mime, ancho=ancho, alto=alto,
+        tamano_original=archivo.size, nueva=True,
+    )
+
+
+def guardar_imagen(datos):
+    """Guarda los bytes en el almacén (si no existen ya) y devuelve su InfoImagen"""
+    return guardar_archivo(ContentFile(datos))
+
+
+def guardar_imagen_base64(texto):
+    """Atajo para guardar una imagen recibida como base64. Devuelve None si está vacía"""
+    datos = decodificar_base64(texto)
+    if not datos:
+        return None
+    return guardar_imagen(datos)
+
+
+def existe_imagen(sha256):
+    return get_storage().exists(ruta_blob(sha256))
+
+
+def listar_blobs(storage=None):
+    """Recorre el almacén y devuelve {sha256: [rutas]} (original y variantes)"""
+    storage = storage or get_storage()
+    blobs = {}
+    for nivel1 in storage.listdir('')[0]:
+        for nivel2 in storage.listdir(nivel1)[0]:
+            directorio = f"{nivel1}/{nivel2}"
+            for nombre in storage.listdir(directorio)[1]:
+                sha256 = nombre.split('_', 1)[0]
+                if es_sha256(sha256):
+                    blobs.setdefault(sha256, []).append(f"{directorio}/{nombre}")
+    return blobs
+
+
+def es_sha256(valor):
+    return len(valor) == 64 and all(c in '0123456789abcdef' for c in valor)
+
+
+def info_imagen(sha256):
+    """InfoImagen de un blob ya guardado (p. ej. subido antes por /imagenes/subir/).
+
+    Un hash ya normalizado lleva a su blob normalizado. Devuelve None si el
+    hash no es válido o no existe en el almacén.
+    """
+    if not es_sha256(sha256):
+        return None
+    sha256 = hash_vigente(sha256)
+    if not existe_imagen(sha256):
+        return None
+    return info_blob(sha256)
+
+
+def info_blob(sha256):
+    """InfoImagen leída del blob guardado con ese nombre"""
+    with abrir_imagen(sha256) as archivo:
+        mime, ancho, alto = analizar_archivo(archivo)
+    tamano = get_storage().size(ruta_blob(sha256))
+    return InfoImagen(sha256=sha256, tamano=tamano, mime=mime, ancho=ancho, alto=alto)
+
+
+def abrir_imagen(sha256, variante=VARIANTE_ORIGINAL):
+    """Abre el blob en modo lectura binaria"""
+    return get_storage().open(ruta_blob(sha256, variante), 'rb')
+
+
+def abrir_variante(sha256, variante):
+    """Abre la variante pedida, generándola si falta; cae al original si es más pequeño"""
+    if variante != VARIANTE_ORIGINAL:
+        try:
+            if generar_variante(sha256, variante):
+                return abrir_imagen(sha256, variante)
+        except (UnidentifiedImageError, OSError):
+            pass
+    return abrir_imagen(sha256)
@@ -0,0 +1,327 @@
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import imagenes
+from .models import (
+    ESTADOS, PUNTOS_POR_SISTEMA, ImagenCompartida, ImagenPunto, Inspeccion, PuntoInspeccion,
+    TerminoObservacion, Vehiculo, punto_modificado,
+)
+
+
+# --------------------------------------------
+# Guardado por lote de los puntos de una inspección
+# --------------------------------------------
+# Un envío (un formulario de sistema o la inspección completa en JSON) se
+# guarda en una sola transacción con un número fijo de consultas, sin
+# importar cuántos sistemas, puntos o fotos traiga:
+#
+#   1. bloqueo de las inspecciones (dos envíos iguales van en fila)
+#   2. lectura de los puntos que ya existen
+#   3. un INSERT ... ON CONFLICT (detalle, nombre) DO UPDATE para los puntos
+#      nuevos o que cambiaron; los que llegan igual no se reescriben
+#   4. un UPDATE de los contadores por vehículo (y, fuera de PostgreSQL, el
+#      índice de observaciones de los puntos que cambiaron)
+#   5. un bulk_create de las imágenes nuevas y el alta de sus referencias
+#
+# Las fotos se reciben y guardan en el almacén antes, fuera de la transacción.
+
+
+@dataclass
+class DatosPunto:
+    """Lo recibido para un punto; None en estado u observación deja el valor guardado"""
+    estado: str = None
+    observacion: str = None
+    imagenes: list = field(default_factory=list)
+
+    @property
+    def vacio(self):
+        return not self.estado and self.observacion is None and not self.imagenes
+
+
+def guardar_puntos(detalle, datos, usuario):
+    """Guarda los puntos ``{clave: DatosPunto}`` de la inspección y sus imágenes.
+
+    Las claves sin datos se ignoran y los puntos que quedan igual no se
+    reescriben. Devuelve ``{clave: PuntoInspeccion}`` con todos los puntos recibidos.
+    """
+    return guardar_lote({detalle: datos}, usuario).get(detalle.pk, {})
+
+
+def guardar_lote(por_detalle, usuario):
+    """guardar_puntos() para varias inspecciones a la vez: ``{detalle: {clave: DatosPunto}}``.
+
+    Devuelve ``{detalle.pk: {clave: PuntoInspeccion}}``.
+    """
+    datos = {
+        (detalle.pk, clave): dato
+        for detalle, puntos_detalle in por_detalle.items()
+        for clave, dato in puntos_detalle.items() if not dato.vacio
+    }
+    if not datos:
+        return {}
+    detalles = {detalle.pk: detalle for detalle in por_detalle}
+
+    with transaction.atomic():
+        list(Inspeccion.objects.select_for_update().filter(pk__in=detalles).values_list('pk'))
+        existentes = {
+            (p.detalle_id, p.nombre): p
+            for p in PuntoInspeccion.objects.filter(
+                detalle__in=detalles, nombre__in={clave for _, clave in datos}
+            )
+        }
+
+        puntos = {}
+        cambios = {}
+        escribir = []
+        for llave, dato in datos.items():
+            detalle = detalles[llave[0]]
+            punto = existentes.get(llave)
+            if punto is None:
+                punto = PuntoInspeccion(detalle=detalle, sistema=detalle.sistema, nombre=llave[1], usuario=usuario)
+            if dato.estado:
+                punto.estado = dato.estado
+            if dato.observacion is not None:
+                punto.observacion = dato.observacion
+            puntos[llave] = punto
+
+            if llave not in existentes:
+                escribir.append(punto)
+            elif punto.cambios():
+                # Queda a nombre de quien lo cambió
+                punto.usuario = usuario
+                cambios[llave] = punto.cambios()
+                # Sin pk, para que nuevos y modificados vayan en el mismo INSERT
+                escribir.append(PuntoInspeccion(
+                    detalle=detalle, sistema=detalle.sistema, nombre=llave[1],
+                    estado=punto.estado, observacion=punto.observacion, usuario=usuario,
+                ))
+
+        if escribir:
+            PuntoInspeccion.objects.bulk_create(
+                escribir,
+                update_conflicts=True,
+                unique_fields=['detalle', 'nombre'],
+                update_fields=['estado', 'observacion', 'usuario', 'fecha_modificacion'],
+            )
+
+        # Con ON CONFLICT el INSERT no devuelve los ids de los nuevos: se leen en una consulta
+        nuevos = [llave for llave in puntos if llave not in existentes]
+        if nuevos:
+            ids = {
+                (detalle_id, nombre): pk
+                for detalle_id, nombre, pk in PuntoInspeccion.objects.filter(
+                    detalle__in={d for d, _ in nuevos}, nombre__in={c for _, c in nuevos}
+                ).values_list('detalle_id', 'nombre', 'pk')
+            }
+            for llave in nuevos:
+                punto = puntos[llave]
+                punto.pk = ids[llave]
+                cambios[llave] = {
+                    campo.attname: (None, getattr(punto, campo.attname))
+                    for campo in punto._meta.concrete_fields if not campo.primary_key
+                }
+
+        por_vehiculo = {}
+        for llave, diferencias in cambios.items():
+            vehiculo = por_vehiculo.setdefault(detalles[llave[0]].vehiculo_id, {'estados': [], 'fechas': []})
+            if 'estado' in diferencias:
+                vehiculo['estados'].append(diferencias['estado'])
+            if llave not in existentes:
+                # bulk_create ya llenó fecha_registro (auto_now_add) en los puntos nuevos
+                vehiculo['fechas'].append(puntos[llave].fecha_registro)
+        for vehiculo_id, vehiculo in por_vehiculo.items():
+            if vehiculo['estados']:
+                Vehiculo.objects.filter(pk=vehiculo_id).ajustar_contadores(
+                    cambios_estado=vehiculo['estados'], fecha=max(vehiculo['fechas'], default=None),
+                )
+
+        TerminoObservacion.indexar([puntos[llave] for llave in cambios if 'observacion' in cambios[llave]])
+
+        imagenes_nuevas = guardar_imagenes(puntos, datos, usuario)
+        # Una foto nueva también es un cambio del punto para la sincronización
+        solo_fotos = {imagen.punto_id for imagen in imagenes_nuevas} - {puntos[llave].pk for llave in cambios}
+        if solo_fotos:
+            PuntoInspeccion.objects.filter(pk__in=solo_fotos).update(fecha_modificacion=timezone.now())
+
+        for llave, diferencias in cambios.items():
+            punto_modificado.send(
+                sender=PuntoInspeccion, punto=puntos[llave], cambios=diferencias, creado=llave not in existentes,
+            )
+
+    guardados = {}
+    for (detalle_id, clave), punto in puntos.items():
+        punto.marcar_guardado()
+        guardados.setdefault(detalle_id, {})[clave] = punto
+
+    # El resumen de inspección del vehículo en memoria ya no vale
+    if cambios or imagenes_nuevas:
+        for detalle in detalles.values():
+            if Inspeccion.vehiculo.is_cached(detalle):
+                detalle.vehiculo.invalidar_resumen()
+    return guardados
+
+
+def guardar_imagenes(puntos, datos, usuario):
+    """Crea las filas de las fotos recibidas que los puntos todavía no tienen.
+
+    Una foto repetida (reenvío, doble captura) no crea otra fila.
+    """
+    if not any(dato.imagenes for dato in datos.values()):
+        return []
+
+    ya_guardadas = set(
+        ImagenPunto.objects.filter(punto__in=[p.pk for p in puntos.values()])
+        .exclude(imagen_sha256='').values_list('punto_id', 'imagen_sha256')
+    )
+    nuevas = []
+    for llave, dato in datos.items():
+        punto = puntos[llave]
+        for info in dato.imagenes:
+            if (punto.pk, info.sha256) in ya_guardadas:
+                continue
+            ya_guardadas.add((punto.pk, info.sha256))
+            imagen = ImagenPunto(punto=punto, usuario=usuario)
+            imagen.asignar_imagen(info)
+            nuevas.append(imagen)
+
+    ImagenPunto.objects.bulk_create(nuevas)
+    ImagenCompartida.sumar_referencias(nuevas)
+    return nuevas
+
+
+# --------------------------------------------
+# Inspección completa en un solo envío (JSON)
+# --------------------------------------------
+# {"sistemas": {"motor": {"ruidos": {"estado": "BUENO", "observacion": "...",
+#                                    "imagenes": ["<sha256>", ...]}, ...}, ...}}
+#
+# Las fotos se suben antes con /imagenes/subir/ y aquí solo van sus hashes.
+# Reenviar el mismo cuerpo deja todo igual: los puntos se comparan antes de
+# escribir y una foto que el punto ya tiene no se vuelve a agregar.
+
+ESTADOS_VALIDOS = {estado for estado, _ in ESTADOS}
+
+
+class ErrorInspeccion(Exception):
+    """Cuerpo inválido; ``errores`` indica qué falló en cada ruta (sistema.punto.campo)"""
+    def __init__(self, errores):
+        super().__init__("La inspección tiene errores")
+        self.errores = errores
+
+
+def leer_inspeccion(cuerpo):
+    """Valida el JSON contra los sistemas y puntos conocidos.
+
+    Devuelve ``{sistema: {clave: DatosPunto}}`` con las imágenes ya resueltas
+    en el almacén, o lanza ErrorInspeccion con todos los errores encontrados.
+    """
+    sistemas = cuerpo.get('sistemas') if isinstance(cuerpo, dict) else None
+    if not isinstance(sistemas, dict) or not sistemas:
+        raise ErrorInspeccion({'sistemas': "Se esperaba un objeto con los sistemas"})
+
+    errores = {}
+    por_sistema = {}
+    for sistema, puntos in sistemas.items():
+        if sistema not in PUNTOS_POR_SISTEMA:
+            errores[sistema] = "Sistema desconocido"
+            continue
+        if not isinstance(puntos, dict):
+            errores[sistema] = "Se esperaba un objeto con los puntos"
+            continue
+        claves = {clave for clave, _ in PUNTOS_POR_SISTEMA[sistema]}
+        for clave, punto in puntos.items():
+            ruta = f"{sistema}.{clave}"
+            if clave not in claves:
+                errores[ruta] = "Punto desconocido"
+                continue
+            if not isinstance(punto, dict):
+                errores[ruta] = "Se esperaba un objeto"
+                continue
+
+            estado = punto.get('estado')
+            observacion = punto.get('observacion')
+            hashes = punto.get('imagenes', [])
+            if estado is None and observacion is None and not hashes:
+                # guardar_lote lo ignoraría, pero antes crearía la inspección del sistema
+                errores[ruta] = "Se esperaba estado, observacion o imagenes"
+                continue
+            # isinstance antes del "in": una lista o un objeto no se pueden buscar en el set
+            if estado is not None and not (isinstance(estado, str) and estado in ESTADOS_VALIDOS):
+                errores[f"{ruta}.estado"] = f"Debe ser uno de {', '.join(sorted(ESTADOS_VALIDOS))}"
+            if observacion is not None and not isinstance(observacion, str):
+                errores[f"{ruta}.observacion"] = "Debe ser texto"
+            if not isinstance(hashes, list) or not all(isinstance(h, str) for h in hashes):
+                errores[f"{ruta}.imagenes"] = "Debe ser una lista de hashes"
+                continue
+
+            infos = [imagenes.info_imagen(h.strip()) for h in hashes]
+            faltantes = [h for h, info in zip(hashes, infos) if info is None]
+            if faltantes:
+                errores[f"{ruta}.imagenes"] = f"Imágenes no subidas: {', '.join(faltantes)}"
+            por_sistema.setdefault(sistema, {})[clave] = DatosPunto(
+                estado=estado, observacion=observacion, imagenes=infos,
+            )
+
+    if errores:
+        raise ErrorInspeccion(errores)
+    return por_sistema
+
+
+def guardar_inspeccion(vehiculo, por_sistema, usuario):
+    """Guarda varios sistemas del vehículo en una sola transacción.
+
+    Devuelve ``{sistema: {clave: PuntoInspeccion}}``.
+    """
+    return guardar_inspecciones({vehiculo: por_sistema}, usuario)[vehiculo.pk]
+
+
+def guardar_inspecciones(por_vehiculo, usuario):
+    """guardar_inspeccion() para varios vehículos: ``{vehiculo: {sistema: {clave: DatosPunto}}}``.
+
+    Devuelve ``{vehiculo.pk: {sistema: {clave: PuntoInspeccion}}}``.
+    """
+    vehiculos = {vehiculo.pk: vehiculo for vehiculo in por_vehiculo}
+    with transaction.atomic():
+        # Dos envíos del mismo vehículo van en fila: el segundo ya ve las
+        # inspecciones que creó el primero
+        list(Vehiculo.objects.select_for_update().filter(pk__in=vehiculos).values_list('pk'))
+        detalles = {
+            (detalle.vehiculo_id, detalle.sistema): detalle
+            for detalle in Inspeccion.objects.filter(
+                vehiculo__in=vehiculos, sistema__in={s for sistemas in por_vehiculo.values() for s in sistemas}
+            )
+        }
+        faltantes = [
+            Inspeccion(vehiculo=vehiculo, sistema=sistema, usuario=usuario)
+            for vehiculo, por_sistema in por_vehiculo.items()
+            for sistema in por_sistema if (vehiculo.pk, sistema) not in detalles
+        ]
+        if faltantes:
+            # bulk_create no pasa por Inspeccion.save(): los contadores se ajustan aquí
+            Inspeccion.objects.bulk_create(faltantes)
+            nuevas = {}
+            for detalle in faltantes:
+                detalles[(detalle.vehiculo_id, detalle.sistema)] = detalle
+                nuevas[detalle.vehiculo_id] = nuevas.get(detalle.vehiculo_id, 0) + 1
+            for vehiculo_id, cantidad in nuevas.items():
+                Vehiculo.objects.filter(pk=vehiculo_id).ajustar_contadores(
+                    sistemas=cantidad, fecha=faltantes[-1].fecha_revision,
+                )
+                vehiculos[vehiculo_id].invalidar_resumen()
+        for (vehiculo_id, _), detalle in detalles.items():
+            detalle.vehiculo = vehiculos[vehiculo_id]
+
+        guardados = guardar_lote({
+            detalles[(vehiculo.pk, sistema)]: datos
+            for vehiculo, por_sistema in por_vehiculo.items()
+            for sistema, datos in por_sistema.items()
+        }, usuario)
+    return {
+        vehiculo.pk: {
+            sistema: guardados.get(detalles[(vehiculo.pk, sistema)].pk, {})
+            for sistema in por_sistema
+        }
+        for vehiculo, por_sistema in por_vehiculo.items()
+    }
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+
+from vehiculos.models import PerfilUsuario, Vehiculo
+
+
+class Command(BaseCommand):
+    help = (
+        "Completa Vehiculo.empresa en los vehículos registrados antes de que existiera, "
+        "con la empresa actual del técnico que los registró. Trabaja por lotes de ids "
+        "para no bloquear la tabla completa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Vehículos por UPDATE')
+
+    def handle(self, *args, **options):
+        empresa_del_tecnico = Subquery(
+            PerfilUsuario.objects.filter(usuario=OuterRef('usuario')).values('empresa')[:1]
+        )
+        pendientes = Vehiculo.objects.filter(empresa__isnull=True, usuario__isnull=False)
+        ultimo = 0
+        revisados = asignados = 0
+
+        while True:
+            ids = list(pendientes.filter(pk__gt=ultimo).order_by('pk').values_list('pk', flat=True)[:options['lote']])
+            if not ids:
+                break
+            ultimo = ids[-1]
+            revisados += len(ids)
+            Vehiculo.objects.filter(pk__in=ids).update(empresa=empresa_del_tecnico)
+            asignados += Vehiculo.objects.filter(pk__in=ids, empresa__isnull=False).count()
+
+        self.stdout.write(f"{revisados} vehículos sin empresa revisados, {asignados} asignados")
+        if revisados > asignados:
+            self.stdout.write(self.style.WARNING(
+                f"{revisados - asignados} quedan sin empresa (técnico sin perfil o sin empresa)"
+            ))
+        self.stdout.write(self.style.SUCCESS("Asignación terminada"))
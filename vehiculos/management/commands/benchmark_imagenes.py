@@ -0,0 +1,76 @@
+import base64
+import os
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from vehiculos.models import Vehiculo, DetalleMotor, PuntoMotor, PuntoMotorImagen
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara memoria y latencia de las consultas de cada vista cargando o no "
+        "el payload de las imágenes. Trabaja dentro de una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vehiculos', type=int, default=60)
+        parser.add_argument('--imagenes-por-punto', type=int, default=4)
+        parser.add_argument('--kb', type=int, default=300, help='Tamaño de cada foto en KB')
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            vehiculo = self.sembrar(options)
+            escenarios = self.escenarios(vehiculo)
+
+            self.stdout.write(f"{'vista':<28}{'modo':<18}{'ms':>10}{'pico KB':>12}{'consultas':>11}")
+            for nombre, consulta in escenarios:
+                for modo, aplicar in (('con imagen', lambda qs: qs.with_image()), ('sin payload', lambda qs: qs)):
+                    ms, pico, consultas = self.medir(lambda: consulta(aplicar), options['repeticiones'])
+                    self.stdout.write(f"{nombre:<28}{modo:<18}{ms:>10.2f}{pico / 1024:>12.0f}{consultas:>11}")
+
+            transaction.set_rollback(True)
+
+    def sembrar(self, options):
+        usuario = User.objects.create(username=f'benchmark_{os.getpid()}')
+        foto = base64.b64encode(os.urandom(options['kb'] * 1024)).decode()
+
+        vehiculos = Vehiculo.objects.bulk_create([
+            Vehiculo(numero_orden=10_000_000 + i, marca='Bench', imagen_base64=foto, usuario=usuario)
+            for i in range(options['vehiculos'])
+        ])
+        vehiculo = vehiculos[0]
+        detalle = DetalleMotor.objects.create(vehiculo=vehiculo, usuario=usuario)
+        for clave, _ in PuntoMotor.NOMBRES_PUNTOS:
+            punto = PuntoMotor.objects.create(detalle=detalle, nombre=clave, estado='BUENO')
+            PuntoMotorImagen.objects.bulk_create([
+                PuntoMotorImagen(punto=punto, imagen_base64=foto)
+                for _ in range(options['imagenes_por_punto'])
+            ])
+        return vehiculo
+
+    def escenarios(self, vehiculo):
+        vehiculos = Vehiculo.objects.filter(marca='Bench')
+        return [
+            ('listar_vehiculos', lambda m: list(m(vehiculos).order_by('-fecha_registro')[:15])),
+            ('agregar_detalle_*', lambda m: m(vehiculos).get(id=vehiculo.id)),
+            ('ver_reporte (imágenes)', lambda m: [
+                list(m(punto.imagenes.all())) for punto in vehiculo.detalle_motor.puntos.all()
+            ]),
+        ]
+
+    def medir(self, funcion, repeticiones):
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        with CaptureQueriesContext(connection) as consultas:
+            for _ in range(repeticiones):
+                funcion()
+        ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return ms, pico, len(consultas) // repeticiones
@@ -0,0 +1,79 @@
+import os
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from vehiculos.models import Vehiculo
+from vehiculos.paginacion import SIGUIENTE, PaginadorCursor
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la latencia de una página temprana y una profunda del listado de "
+        "vehículos con OFFSET (Paginator) y por cursor. Trabaja dentro de una "
+        "transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vehiculos', type=int, default=1_000_000)
+        parser.add_argument('--por-pagina', type=int, default=15)
+        parser.add_argument('--pagina', type=int, default=1000, help='Página profunda a medir')
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            usuario = self.sembrar(options)
+            vehiculos = Vehiculo.objects.filter(usuario=usuario).image_meta_only()
+            paginador = PaginadorCursor(vehiculos, options['por_pagina'])
+            ordenados = vehiculos.order_by('-fecha_registro', '-pk')
+
+            self.stdout.write(f"{'página':<10}{'modo':<10}{'ms':>10}{'consultas':>11}")
+            for pagina in (1, options['pagina']):
+                desde = (pagina - 1) * options['por_pagina']
+                cursor = self.cursor_para(paginador, ordenados, desde)
+                escenarios = [
+                    ('offset', lambda: (
+                        ordenados.count(),
+                        list(ordenados[desde:desde + options['por_pagina']]),
+                    )),
+                    ('cursor', lambda: list(paginador.pagina(cursor))),
+                ]
+                for modo, funcion in escenarios:
+                    ms, consultas = self.medir(funcion, options['repeticiones'])
+                    self.stdout.write(f"{pagina:<10}{modo:<10}{ms:>10.2f}{consultas:>11}")
+
+            transaction.set_rollback(True)
+
+    def sembrar(self, options):
+        usuario = User.objects.create(username=f'benchmark_{os.getpid()}')
+        ahora = timezone.now()
+        for inicio in range(0, options['vehiculos'], 5000):
+            Vehiculo.objects.bulk_create([
+                # Algunas fechas se repiten para ejercitar el desempate por id
+                Vehiculo(numero_orden=10_000_000 + i, marca='Bench', usuario=usuario,
+                         fecha_registro=ahora - timedelta(minutes=i // 2))
+                for i in range(inicio, min(inicio + 5000, options['vehiculos']))
+            ])
+        return usuario
+
+    def cursor_para(self, paginador, ordenados, desde):
+        """Cursor que lleva a la página que empieza en ``desde`` (fuera de la medición)"""
+        if not desde:
+            return None
+        borde = ordenados[desde - 1]
+        pagina = paginador.pagina()
+        return paginador.codificar(borde, SIGUIENTE, pagina.total, pagina.total_exacto)
+
+    def medir(self, funcion, repeticiones):
+        funcion()
+        inicio = time.perf_counter()
+        with CaptureQueriesContext(connection) as consultas:
+            for _ in range(repeticiones):
+                funcion()
+        ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+        return ms, len(consultas) // repeticiones
@@ -0,0 +1,45 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from vehiculos import imagenes
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia los blobs de otro almacén (por defecto el directorio en disco) al "
+        "configurado en IMAGENES_STORAGE, p. ej. al pasar al backend en base de datos. "
+        "Se puede interrumpir y volver a ejecutar: omite lo que ya está copiado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde-backend', default='django.core.files.storage.FileSystemStorage',
+            help='Backend de origen'
+        )
+        parser.add_argument(
+            '--desde-ubicacion', default=os.path.join(settings.MEDIA_ROOT, 'imagenes'),
+            help='Opción location del backend de origen'
+        )
+        parser.add_argument('--borrar-origen', action='store_true', help='Borrar cada blob del origen tras copiarlo')
+
+    def handle(self, *args, **options):
+        origen = import_string(options['desde_backend'])(location=options['desde_ubicacion'])
+        destino = imagenes.get_storage()
+
+        copiados = omitidos = 0
+        for sha256, rutas in imagenes.listar_blobs(origen).items():
+            for ruta in rutas:
+                if destino.exists(ruta):
+                    omitidos += 1
+                else:
+                    with origen.open(ruta, 'rb') as archivo:
+                        destino.save(ruta, archivo)
+                    copiados += 1
+                if options['borrar_origen']:
+                    origen.delete(ruta)
+
+        self.stdout.write(f"{copiados} blobs copiados, {omitidos} ya estaban")
+        self.stdout.write(self.style.SUCCESS("Copia de imágenes terminada"))
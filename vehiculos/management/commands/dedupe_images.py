@@ -0,0 +1,181 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Min, Sum
+from django.db.models.functions import Length
+from django.template.defaultfilters import filesizeformat as formato_bytes
+from django.utils import timezone
+
+from vehiculos import imagenes
+from vehiculos.models import ImagenCompartida, modelos_con_imagen
+
+
+class Command(BaseCommand):
+    help = (
+        "Informa y recupera el espacio ocupado por imágenes duplicadas: base64 sin migrar, "
+        "fotos repetidas en un mismo punto, contadores de referencias desfasados y blobs "
+        "huérfanos. Sin --aplicar solo muestra el informe."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--aplicar', action='store_true', help='Recuperar el espacio (por defecto solo informa)')
+        parser.add_argument('--lote', type=int, default=100, help='Filas por transacción al migrar base64')
+        parser.add_argument(
+            '--horas', type=int, default=24,
+            help='Antigüedad mínima de un blob sin referencias para borrarlo (subidas en curso)'
+        )
+
+    def handle(self, *args, **options):
+        aplicar = options['aplicar']
+        modelos = modelos_con_imagen()
+
+        self.stdout.write(self.style.MIGRATE_HEADING("1. Imágenes en base64 sin migrar"))
+        pendientes_total = self.informar_base64(modelos)
+        if aplicar and pendientes_total:
+            call_command('migrar_imagenes', lote=options['lote'], stdout=self.stdout, stderr=self.stderr)
+
+        self.stdout.write(self.style.MIGRATE_HEADING("2. Fotos repetidas en un mismo punto"))
+        self.duplicados_por_punto(modelos, aplicar)
+
+        self.stdout.write(self.style.MIGRATE_HEADING("3. Contadores de referencias"))
+        referencias = self.contar_referencias(modelos)
+        self.recontar(referencias, aplicar)
+
+        self.stdout.write(self.style.MIGRATE_HEADING("4. Blobs sin referencias"))
+        self.huerfanos(referencias, options['horas'], aplicar)
+
+        if not aplicar:
+            self.stdout.write(self.style.WARNING("Solo informe: ejecutar con --aplicar para recuperar el espacio"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Deduplicación terminada"))
+
+    def informar_base64(self, modelos):
+        total = 0
+        for modelo in modelos:
+            pendientes = (
+                modelo.objects.filter(imagen_sha256='')
+                .exclude(imagen_base64__isnull=True).exclude(imagen_base64='')
+                .aggregate(filas=Count('pk'), bytes=Sum(Length('imagen_base64')))
+            )
+            if pendientes['filas']:
+                total += pendientes['filas']
+                self.stdout.write(
+                    f"  {modelo.__name__}: {pendientes['filas']} filas, "
+                    f"{formato_bytes(pendientes['bytes'] or 0)} en base64"
+                )
+        if not total:
+            self.stdout.write("  Nada pendiente")
+        return total
+
+    def duplicados_por_punto(self, modelos, aplicar):
+        total = 0
+        for modelo in modelos:
+            if not any(f.name == 'punto' for f in modelo._meta.fields):
+                continue
+            grupos = (
+                modelo.objects.exclude(imagen_sha256='')
+                .values('punto_id', 'imagen_sha256')
+                .annotate(n=Count('pk'), primera=Min('pk'))
+                .filter(n__gt=1)
+            )
+            sobrantes = 0
+            for grupo in grupos:
+                sobrantes += grupo['n'] - 1
+                if aplicar:
+                    # Se conserva la primera; el borrado libera las referencias
+                    modelo.objects.filter(
+                        punto_id=grupo['punto_id'], imagen_sha256=grupo['imagen_sha256']
+                    ).exclude(pk=grupo['primera']).delete()
+            if sobrantes:
+                total += sobrantes
+                accion = "eliminadas" if aplicar else "sobrantes"
+                self.stdout.write(f"  {modelo.__name__}: {sobrantes} filas {accion}")
+        if not total:
+            self.stdout.write("  Sin repeticiones")
+
+    def contar_referencias(self, modelos):
+        """Referencias reales por hash y ahorro frente a guardar cada fila por separado"""
+        referencias = Counter()
+        tamanos = {}
+        for modelo in modelos:
+            filas = (
+                modelo.objects.exclude(imagen_sha256='')
+                .values_list('imagen_sha256', 'imagen_tamano')
+                .annotate(n=Count('pk'))
+            )
+            for sha256, tamano, n in filas:
+                referencias[sha256] += n
+                tamanos[sha256] = tamano or 0
+
+        logicos = sum(tamanos[sha256] * n for sha256, n in referencias.items())
+        fisicos = sum(tamanos.values())
+        self.stdout.write(
+            f"  {sum(referencias.values())} filas con imagen, {len(referencias)} blobs distintos"
+        )
+        self.stdout.write(
+            f"  {formato_bytes(logicos)} si cada fila tuviera su copia, "
+            f"{formato_bytes(fisicos)} guardados ({formato_bytes(logicos - fisicos)} ahorrados)"
+        )
+        return referencias
+
+    def recontar(self, referencias, aplicar):
+        guardadas = dict(ImagenCompartida.objects.values_list('sha256', 'referencias'))
+        desfasadas = {
+            sha256: n for sha256, n in referencias.items() if guardadas.get(sha256) != n
+        }
+        desfasadas.update({
+            sha256: 0 for sha256, n in guardadas.items() if n and sha256 not in referencias
+        })
+        if not desfasadas:
+            self.stdout.write("  Todos los contadores coinciden")
+            return
+
+        self.stdout.write(f"  {len(desfasadas)} contadores desfasados")
+        if not aplicar:
+            return
+        faltantes = set(desfasadas) - set(guardadas)
+        for sha256 in faltantes:
+            info = imagenes.info_imagen(sha256)
+            if info:
+                ImagenCompartida.sumar_referencia(info, cantidad=0)
+        for sha256, n in desfasadas.items():
+            ImagenCompartida.objects.filter(sha256=sha256).update(
+                referencias=n, fecha_actualizacion=timezone.now()
+            )
+
+    def huerfanos(self, referencias, horas, aplicar):
+        storage = imagenes.get_storage()
+        limite = timezone.now() - timedelta(hours=horas)
+        creadas = dict(ImagenCompartida.objects.values_list('sha256', 'fecha_creacion'))
+
+        huerfanos = recientes = 0
+        liberados = 0
+        for sha256, rutas in imagenes.listar_blobs().items():
+            if referencias[sha256]:
+                continue
+            # Un blob recién subido aún no tiene filas que lo usen: se respeta un margen
+            try:
+                fecha = storage.get_modified_time(imagenes.ruta_blob(sha256))
+            except (NotImplementedError, OSError):
+                fecha = creadas.get(sha256)
+            if fecha is None or fecha > limite:
+                recientes += 1
+                continue
+
+            huerfanos += 1
+            if aplicar:
+                # Se vuelve a comprobar justo antes de borrar por si alguien lo referenció
+                if ImagenCompartida.objects.filter(sha256=sha256, referencias__gt=0).exists():
+                    continue
+                ImagenCompartida.objects.filter(sha256=sha256).delete()
+            for ruta in rutas:
+                liberados += storage.size(ruta)
+                if aplicar:
+                    storage.delete(ruta)
+
+        accion = "liberados" if aplicar else "recuperables"
+        self.stdout.write(f"  {huerfanos} blobs huérfanos, {formato_bytes(liberados)} {accion}")
+        if recientes:
+            self.stdout.write(f"  {recientes} blobs sin referencias más nuevos que {horas} h (se conservan)")
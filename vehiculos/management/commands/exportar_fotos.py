@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from vehiculos import exportar
+from vehiculos.models import Vehiculo
+
+
+class Command(BaseCommand):
+    help = (
+        "Escribe un ZIP con las fotos de un vehículo, un rango de fechas o una empresa, "
+        "organizado por numero_orden/sistema/punto. Usa memoria constante."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('salida', help='Ruta del ZIP a crear')
+        parser.add_argument('--vehiculo', type=int, help='Id del vehículo')
+        parser.add_argument('--desde', help='Fecha de registro desde (AAAA-MM-DD)')
+        parser.add_argument('--hasta', help='Fecha de registro hasta (AAAA-MM-DD)')
+        parser.add_argument('--empresa', type=int, help='Id de la empresa')
+
+    def handle(self, *args, **options):
+        fechas = {}
+        for opcion in ('desde', 'hasta'):
+            if options[opcion]:
+                try:
+                    fechas[opcion] = parse_date(options[opcion])
+                except ValueError:
+                    fechas[opcion] = None
+                if fechas[opcion] is None:
+                    raise CommandError(f"Fecha no válida: {options[opcion]}")
+
+        vehiculos = exportar.filtrar_vehiculos(
+            Vehiculo.objects.all(),
+            vehiculo_id=options['vehiculo'],
+            fecha_desde=fechas.get('desde'),
+            fecha_hasta=fechas.get('hasta'),
+            empresa_id=options['empresa'],
+        )
+
+        escritos = 0
+        with open(options['salida'], 'wb') as salida:
+            for bloque in exportar.generar_zip(vehiculos):
+                salida.write(bloque)
+                escritos += len(bloque)
+
+        self.stdout.write(self.style.SUCCESS(f"ZIP creado: {options['salida']} ({escritos / 1048576:.1f} MB)"))
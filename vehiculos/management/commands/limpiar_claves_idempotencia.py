@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from vehiculos.idempotencia import VIGENCIA, VIGENCIAS
+from vehiculos.models import ClaveIdempotencia
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las claves de idempotencia vencidas (vehiculos/idempotencia.py). "
+        "Pensado para ejecutarse a diario; un reenvío con una clave ya borrada "
+        "se trata como un envío nuevo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help='Solo contar, sin borrar')
+        parser.add_argument('--lote', type=int, default=1000, help='Claves por DELETE')
+
+    def handle(self, *args, **options):
+        ahora = timezone.now()
+        # Cada ámbito con vigencia propia por separado; el resto con la general.
+        # El filtro por fecha_creacion usa su índice
+        vencidas = Q(fecha_creacion__lt=ahora - VIGENCIA) & ~Q(ambito__in=VIGENCIAS)
+        for ambito, vigencia in VIGENCIAS.items():
+            vencidas |= Q(ambito=ambito, fecha_creacion__lt=ahora - vigencia)
+        claves = ClaveIdempotencia.objects.filter(vencidas)
+
+        if options['simular']:
+            self.stdout.write(f"{claves.count()} claves vencidas")
+            self.stdout.write(self.style.WARNING("Simulación: no se borró nada"))
+            return
+        borradas = 0
+        while True:
+            pks = list(claves.values_list('pk', flat=True)[:options['lote']])
+            if not pks:
+                break
+            borradas += ClaveIdempotencia.objects.filter(pk__in=pks).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"{borradas} claves vencidas borradas"))
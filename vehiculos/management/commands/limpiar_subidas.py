@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat as formato_bytes
+
+from vehiculos import subidas
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra los archivos parciales de subidas por partes abandonadas. También se "
+        "barren al empezar cada subida nueva; esto sirve para servidores sin subidas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horas', type=int, default=subidas.VIGENCIA_PARCIAL // 3600,
+            help='Horas sin partes nuevas para dar una subida por abandonada'
+        )
+
+    def handle(self, *args, **options):
+        archivos, liberados = subidas.limpiar_parciales(options['horas'] * 3600)
+        self.stdout.write(self.style.SUCCESS(f"{archivos} subidas abandonadas borradas ({formato_bytes(liberados)})"))
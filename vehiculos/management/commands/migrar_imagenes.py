@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from vehiculos import imagenes
+from vehiculos.models import ImagenCompartida, modelos_con_imagen
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve las imágenes guardadas en base64 al almacén de blobs por lotes. "
+        "Se puede interrumpir y volver a ejecutar: solo procesa filas sin hash. "
+        "Las fotos se copian tal cual; normalizar_imagenes las normaliza después."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=100, help='Filas por transacción')
+        parser.add_argument('--limite', type=int, default=None, help='Máximo de filas por modelo')
+        parser.add_argument('--modelo', action='append', help='Limitar a estos modelos (ej. ImagenPunto)')
+        parser.add_argument(
+            '--conservar-base64', action='store_true',
+            help='No vaciar imagen_base64 tras copiar el blob (migración en dos fases)'
+        )
+
+    def handle(self, *args, **options):
+        modelos = modelos_con_imagen()
+        if options['modelo']:
+            modelos = [m for m in modelos if m.__name__ in options['modelo']]
+
+        for modelo in modelos:
+            migradas, errores = self.migrar_modelo(modelo, options)
+            self.stdout.write(f"{modelo.__name__}: {migradas} migradas, {errores} con errores")
+
+        self.stdout.write(self.style.SUCCESS("Migración de imágenes terminada"))
+
+    def migrar_modelo(self, modelo, options):
+        pendientes = (
+            modelo.objects
+            .filter(imagen_sha256='')
+            .exclude(imagen_base64__isnull=True)
+            .exclude(imagen_base64='')
+            .order_by('pk')
+        )
+        ultimo_pk = 0
+        migradas = errores = 0
+        limite = options['limite']
+
+        while limite is None or migradas + errores < limite:
+            tamano_lote = options['lote']
+            if limite is not None:
+                tamano_lote = min(tamano_lote, limite - migradas - errores)
+            # Se avanza por pk para no volver a leer filas con errores
+            lote = list(
+                pendientes.filter(pk__gt=ultimo_pk).values_list('pk', 'imagen_base64')[:tamano_lote]
+            )
+            if not lote:
+                break
+
+            with transaction.atomic():
+                for pk, imagen_base64 in lote:
+                    ultimo_pk = pk
+                    info = imagenes.guardar_imagen_base64(imagen_base64)
+                    if info is None:
+                        errores += 1
+                        self.stderr.write(f"{modelo.__name__} #{pk}: base64 inválido, se omite")
+                        continue
+
+                    campos = {
+                        'imagen_sha256': info.sha256,
+                        'imagen_tamano': info.tamano,
+                        'imagen_mime': info.mime,
+                        'imagen_ancho': info.ancho,
+                        'imagen_alto': info.alto,
+                    }
+                    if not options['conservar_base64']:
+                        campos['imagen_base64'] = modelo._meta.get_field('imagen_base64').get_default()
+                    # El filtro por hash vacío evita pisar filas que la app ya actualizó
+                    if modelo.objects.filter(pk=pk, imagen_sha256='').update(**campos):
+                        ImagenCompartida.sumar_referencia(info)
+                        migradas += 1
+
+        return migradas, errores
@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from vehiculos import imagenes, normalizacion
+from vehiculos.models import EstadisticaImagenes, ImagenCompartida, modelos_con_imagen
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica a las fotos ya guardadas la misma normalización que a las nuevas "
+        "(tamaño máximo, orientación, sin EXIF, recompresión). El blob normalizado "
+        "se guarda con su propio hash y las filas pasan a usarlo; el original queda "
+        "como alias y dedupe_images lo borra. También recoge las fotos que quedaron "
+        "sin normalizar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=20, help='Imágenes que se leen por consulta')
+        parser.add_argument('--limite', type=int, default=None, help='Máximo de imágenes a revisar')
+        parser.add_argument('--simular', action='store_true', help='Solo calcular el ahorro, sin cambiar nada')
+
+    def handle(self, *args, **options):
+        procesos = imagenes.get_normalizacion()['PROCESOS']
+        modelos = modelos_con_imagen()
+        pendientes = ImagenCompartida.objects.filter(referencias__gt=0).order_by('sha256')
+        normalizar = partial(imagenes.normalizar_blob, reemplazar=not options['simular'])
+        ultimo = ''
+        revisadas = normalizadas = 0
+        bytes_antes = bytes_despues = 0
+
+        # Cada hilo espera su imagen en el pool de procesos: así el lote se normaliza en paralelo
+        with ThreadPoolExecutor(max_workers=max(procesos, 1)) as hilos:
+            while options['limite'] is None or revisadas < options['limite']:
+                tamano_lote = options['lote']
+                if options['limite'] is not None:
+                    tamano_lote = min(tamano_lote, options['limite'] - revisadas)
+                lote = list(pendientes.filter(sha256__gt=ultimo).values_list('sha256', flat=True)[:tamano_lote])
+                if not lote:
+                    break
+                ultimo = lote[-1]
+                revisadas += len(lote)
+
+                for sha256, info in zip(lote, hilos.map(normalizar, lote)):
+                    if info is None:
+                        continue
+                    normalizadas += 1
+                    bytes_antes += info.tamano_original
+                    bytes_despues += info.tamano
+                    if not options['simular']:
+                        self.registrar(modelos, sha256, info)
+
+        self.stdout.write(f"{revisadas} imágenes revisadas, {normalizadas} normalizadas")
+        self.stdout.write(f"{bytes_antes / 1048576:.1f} MB -> {bytes_despues / 1048576:.1f} MB")
+        if options['simular']:
+            self.stdout.write(self.style.WARNING("Simulación: no se cambió nada"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Normalización terminada"))
+
+    def registrar(self, modelos, sha256, info):
+        """Pasa al blob normalizado las filas que usan ``sha256`` y suma el ahorro a cada empresa.
+
+        Son fotos que ya estaban guardadas: cuentan los bytes, no las imágenes.
+        """
+        with transaction.atomic():
+            for modelo in modelos:
+                if any(f.name == 'usuario' for f in modelo._meta.fields):
+                    filas = modelo.objects.filter(imagen_sha256=sha256)
+                    por_empresa = filas.values('usuario__perfilusuario__empresa').annotate(n=Count('pk'))
+                    for grupo in por_empresa:
+                        EstadisticaImagenes.registrar(
+                            grupo['usuario__perfilusuario__empresa'], [info] * grupo['n'], nuevas=False,
+                        )
+            normalizacion.reapuntar(sha256, info)
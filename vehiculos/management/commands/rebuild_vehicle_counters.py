@@ -0,0 +1,118 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+from django.db.models import Count, Max
+
+from vehiculos.models import CONTADORES_ESTADO, Inspeccion, PuntoInspeccion, Vehiculo
+
+
+CAMPOS = list(CONTADORES_ESTADO.values()) + ['sistemas_revisados', 'ultima_inspeccion', 'tiene_rechazados']
+
+
+def calcular_contadores(ids):
+    """Contadores reales de los vehículos, agregando sus inspecciones y puntos"""
+    reales = {pk: dict.fromkeys(CONTADORES_ESTADO.values(), 0) for pk in ids}
+
+    puntos = (
+        PuntoInspeccion.objects.filter(detalle__vehiculo__in=ids)
+        .values('detalle__vehiculo', 'estado').annotate(n=Count('pk'))
+        .values_list('detalle__vehiculo', 'estado', 'n').order_by()
+    )
+    for pk, estado, n in puntos:
+        if estado in CONTADORES_ESTADO:
+            reales[pk][CONTADORES_ESTADO[estado]] = n
+
+    ultimos_puntos = dict(
+        PuntoInspeccion.objects.filter(detalle__vehiculo__in=ids)
+        .values('detalle__vehiculo').annotate(ultima=Max('fecha_registro'))
+        .values_list('detalle__vehiculo', 'ultima').order_by()
+    )
+    inspecciones = (
+        Inspeccion.objects.filter(vehiculo__in=ids)
+        .values('vehiculo').annotate(n=Count('pk'), ultima=Max('fecha_revision'))
+        .values_list('vehiculo', 'n', 'ultima').order_by()
+    )
+    sistemas = {pk: (n, ultima) for pk, n, ultima in inspecciones}
+
+    for pk, contadores in reales.items():
+        n, ultima = sistemas.get(pk, (0, None))
+        fechas = [f for f in (ultima, ultimos_puntos.get(pk)) if f]
+        contadores['sistemas_revisados'] = n
+        contadores['ultima_inspeccion'] = max(fechas) if fechas else None
+        contadores['tiene_rechazados'] = contadores['puntos_rechazados'] > 0
+    return reales
+
+
+def reconstruir_lote(ids, aplicar):
+    """Compara y corrige los contadores de un lote; devuelve (revisados, corregidos, desvíos por campo).
+
+    Las filas quedan bloqueadas mientras se recalculan, así que un punto que
+    se guarde a la vez espera y su incremento se aplica sobre el valor corregido.
+    """
+    desvios = Counter()
+    corregir = []
+    with transaction.atomic():
+        vehiculos = list(Vehiculo.objects.select_for_update().filter(pk__in=ids).only(*CAMPOS))
+        reales = calcular_contadores([v.pk for v in vehiculos])
+        for vehiculo in vehiculos:
+            distintos = [c for c in CAMPOS if getattr(vehiculo, c) != reales[vehiculo.pk][c]]
+            if distintos:
+                desvios.update(distintos)
+                for campo in distintos:
+                    setattr(vehiculo, campo, reales[vehiculo.pk][campo])
+                corregir.append(vehiculo)
+        if aplicar and corregir:
+            Vehiculo.objects.bulk_update(corregir, CAMPOS)
+    return len(vehiculos), len(corregir), desvios
+
+
+def inicializar_proceso():
+    # Con spawn el proceso arranca sin Django; con fork ya está listo y no hace nada
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los contadores de inspección de cada vehículo (puntos por estado, "
+        "sistemas revisados, última inspección, rechazados) por lotes en un pool de "
+        "procesos, informa los desvíos y los corrige."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Vehículos por lote')
+        parser.add_argument('--procesos', type=int, default=2, help='Procesos en paralelo (0 = en este proceso)')
+        parser.add_argument('--simular', action='store_true', help='Solo informar los desvíos, sin corregir')
+
+    def handle(self, *args, **options):
+        ids = list(Vehiculo.objects.order_by('pk').values_list('pk', flat=True))
+        lotes = [ids[i:i + options['lote']] for i in range(0, len(ids), options['lote'])]
+        aplicar = not options['simular']
+
+        procesos = options['procesos']
+        if procesos and connection.vendor == 'sqlite':
+            # SQLite admite un solo escritor: en paralelo los lotes se bloquearían entre sí
+            self.stdout.write("SQLite: los lotes se procesan en este proceso")
+            procesos = 0
+
+        if procesos and len(lotes) > 1:
+            # Los procesos hijos no deben heredar la conexión abierta de este
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=procesos, initializer=inicializar_proceso) as pool:
+                resultados = list(pool.map(reconstruir_lote, lotes, [aplicar] * len(lotes)))
+        else:
+            resultados = [reconstruir_lote(lote, aplicar) for lote in lotes]
+
+        revisados = sum(r[0] for r in resultados)
+        corregidos = sum(r[1] for r in resultados)
+        desvios = sum((r[2] for r in resultados), Counter())
+
+        self.stdout.write(f"{revisados} vehículos revisados en {len(lotes)} lotes, {corregidos} con desvío")
+        for campo, n in desvios.most_common():
+            self.stdout.write(f"  {campo}: {n}")
+        if not aplicar:
+            self.stdout.write(self.style.WARNING("Simulación: no se cambió nada"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Contadores al día"))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from vehiculos.busqueda import terminos, usa_texto_completo
+from vehiculos.models import PuntoInspeccion, TerminoObservacion
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el índice invertido de las observaciones (TerminoObservacion) "
+        "que usa el buscador en motores sin búsqueda de texto. En PostgreSQL no "
+        "hace falta: el índice GIN lo mantiene la base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Puntos por lote')
+
+    def handle(self, *args, **options):
+        if usa_texto_completo(connection.alias):
+            self.stdout.write("PostgreSQL: las observaciones se indexan con to_tsvector, nada que hacer")
+            return
+
+        puntos = (
+            PuntoInspeccion.objects.exclude(observacion=None).exclude(observacion='')
+            .order_by('pk').values_list('pk', 'observacion')
+        )
+        indexados = 0
+        with transaction.atomic():
+            TerminoObservacion.objects.all().delete()
+            lote = []
+            for pk, observacion in puntos.iterator(chunk_size=options['lote']):
+                lote.extend(
+                    TerminoObservacion(punto_id=pk, termino=termino, frecuencia=n)
+                    for termino, n in terminos(observacion).items()
+                )
+                indexados += 1
+                if len(lote) >= options['lote']:
+                    TerminoObservacion.objects.bulk_create(lote)
+                    lote = []
+            TerminoObservacion.objects.bulk_create(lote)
+
+        self.stdout.write(self.style.SUCCESS(f"{indexados} observaciones indexadas"))
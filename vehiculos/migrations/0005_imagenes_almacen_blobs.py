@@ -0,0 +1,278 @@
+# Generated by Django 4.2.16 on 2026-10-17 22:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0004_alter_puntocarroceria_estado_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagentexto',
+            name='imagen_alto',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagentexto',
+            name='imagen_ancho',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagentexto',
+            name='imagen_mime',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='imagentexto',
+            name='imagen_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='imagentexto',
+            name='imagen_tamano',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntocarroceriaimagen',
+            name='imagen_alto',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntocarroceriaimagen',
+            name='imagen_ancho',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntocarroceriaimagen',
+            name='imagen_mime',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='puntocarroceriaimagen',
+            name='imagen_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='puntocarroceriaimagen',
+            name='imagen_tamano',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntodireccionsuspensionimagen',
+            name='imagen_alto',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntodireccionsuspensionimagen',
+            name='imagen_ancho',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntodireccionsuspensionimagen',
+            name='imagen_mime',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='puntodireccionsuspensionimagen',
+            name='imagen_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='puntodireccionsuspensionimagen',
+            name='imagen_tamano',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntofrenosimagen',
+            name='imagen_alto',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntofrenosimagen',
+            name='imagen_ancho',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntofrenosimagen',
+            name='imagen_mime',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='puntofrenosimagen',
+            name='imagen_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='puntofrenosimagen',
+            name='imagen_tamano',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntointeriorimagen',
+            name='imagen_alto',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntointeriorimagen',
+            name='imagen_ancho',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntointeriorimagen',
+            name='imagen_mime',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='puntointeriorimagen',
+            name='imagen_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='puntointeriorimagen',
+            name='imagen_tamano',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntomotorimagen',
+            name='imagen_alto',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntomotorimagen',
+            name='imagen_ancho',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntomotorimagen',
+            name='imagen_mime',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='puntomotorimagen',
+            name='imagen_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='puntomotorimagen',
+            name='imagen_tamano',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntorevisiongeneralimagen',
+            name='imagen_alto',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntorevisiongeneralimagen',
+            name='imagen_ancho',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntorevisiongeneralimagen',
+            name='imagen_mime',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='puntorevisiongeneralimagen',
+            name='imagen_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='puntorevisiongeneralimagen',
+            name='imagen_tamano',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntotransmisionimagen',
+            name='imagen_alto',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntotransmisionimagen',
+            name='imagen_ancho',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='puntotransmisionimagen',
+            name='imagen_mime',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='puntotransmisionimagen',
+            name='imagen_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='puntotransmisionimagen',
+            name='imagen_tamano',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='imagen_alto',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='imagen_ancho',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='imagen_mime',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='imagen_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='imagen_tamano',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='imagentexto',
+            name='imagen_base64',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='puntocarroceriaimagen',
+            name='imagen_base64',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='puntodireccionsuspensionimagen',
+            name='imagen_base64',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='puntofrenosimagen',
+            name='imagen_base64',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='puntointeriorimagen',
+            name='imagen_base64',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='puntomotorimagen',
+            name='imagen_base64',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='puntorevisiongeneralimagen',
+            name='imagen_base64',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='puntotransmisionimagen',
+            name='imagen_base64',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
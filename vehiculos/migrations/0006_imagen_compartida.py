@@ -0,0 +1,62 @@
+# Generated by Django 4.2.16 on 2026-10-17 22:25
+
+from django.db import migrations, models
+
+
+MODELOS_CON_IMAGEN = [
+    'Vehiculo', 'ImagenTexto',
+    'PuntoMotorImagen', 'PuntoTransmisionImagen', 'PuntoFrenosImagen',
+    'PuntoDireccionSuspensionImagen', 'PuntoCarroceriaImagen',
+    'PuntoRevisionGeneralImagen', 'PuntoInteriorImagen',
+]
+
+
+def contar_referencias(apps, schema_editor):
+    """Crea una ImagenCompartida por hash ya migrado, con sus referencias actuales"""
+    ImagenCompartida = apps.get_model('vehiculos', 'ImagenCompartida')
+    compartidas = {}
+    for nombre in MODELOS_CON_IMAGEN:
+        modelo = apps.get_model('vehiculos', nombre)
+        filas = (
+            modelo.objects.exclude(imagen_sha256='')
+            .values('imagen_sha256', 'imagen_tamano', 'imagen_mime', 'imagen_ancho', 'imagen_alto')
+            .annotate(n=models.Count('pk'))
+        )
+        for fila in filas:
+            compartida = compartidas.setdefault(fila['imagen_sha256'], ImagenCompartida(
+                sha256=fila['imagen_sha256'],
+                tamano=fila['imagen_tamano'],
+                mime=fila['imagen_mime'],
+                ancho=fila['imagen_ancho'],
+                alto=fila['imagen_alto'],
+            ))
+            compartida.referencias += fila['n']
+    ImagenCompartida.objects.bulk_create(compartidas.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0005_imagenes_almacen_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImagenCompartida',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('tamano', models.PositiveIntegerField(blank=True, null=True)),
+                ('mime', models.CharField(blank=True, default='', max_length=50)),
+                ('ancho', models.PositiveIntegerField(blank=True, null=True)),
+                ('alto', models.PositiveIntegerField(blank=True, null=True)),
+                ('referencias', models.PositiveIntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Imagen compartida',
+                'verbose_name_plural': 'Imágenes compartidas',
+            },
+        ),
+        migrations.RunPython(contar_referencias, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-17 22:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0006_imagen_compartida'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaImagenes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('imagenes', models.PositiveIntegerField(default=0)),
+                ('bytes_originales', models.PositiveBigIntegerField(default=0)),
+                ('bytes_guardados', models.PositiveBigIntegerField(default=0)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('empresa', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='estadistica_imagenes', to='vehiculos.empresa')),
+            ],
+            options={
+                'verbose_name': 'Estadística de imágenes',
+                'verbose_name_plural': 'Estadísticas de imágenes',
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.16 on 2026-10-17 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0007_estadistica_imagenes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlobImagen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ruta', models.CharField(max_length=100, unique=True)),
+                ('datos', models.BinaryField()),
+                ('tamano', models.PositiveIntegerField()),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Blob de imagen',
+                'verbose_name_plural': 'Blobs de imagen',
+            },
+        ),
+    ]
@@ -0,0 +1,684 @@
+# Generated by Django 4.2.16 on 2026-10-17 22:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# (sistema, detalle, punto, imagen) de las tablas por sistema que se unifican
+SISTEMAS_ANTERIORES = [
+    ('motor', 'DetalleMotor', 'PuntoMotor', 'PuntoMotorImagen'),
+    ('transmision', 'DetalleTransmision', 'PuntoTransmision', 'PuntoTransmisionImagen'),
+    ('frenos', 'DetalleFrenos', 'PuntoFrenos', 'PuntoFrenosImagen'),
+    ('direccion_suspension', 'DetalleDireccionSuspension', 'PuntoDireccionSuspension', 'PuntoDireccionSuspensionImagen'),
+    ('carroceria', 'DetalleCarroceria', 'PuntoCarroceria', 'PuntoCarroceriaImagen'),
+    ('revision_general', 'DetalleRevisionGeneral', 'PuntoRevisionGeneral', 'PuntoRevisionGeneralImagen'),
+    ('interior', 'DetalleInterior', 'PuntoInterior', 'PuntoInteriorImagen'),
+]
+CAMPOS_PUNTO = ['nombre', 'estado', 'observacion', 'usuario_id', 'fecha_registro']
+CAMPOS_IMAGEN = [
+    'imagen_sha256', 'imagen_tamano', 'imagen_mime', 'imagen_ancho', 'imagen_alto',
+    'imagen_base64', 'usuario_id', 'fecha_subida',
+]
+LOTE = 500
+
+
+def conservar_fechas(*modelos):
+    """Desactiva auto_now_add en los modelos históricos para copiar las fechas tal cual"""
+    for modelo in modelos:
+        for campo in modelo._meta.fields:
+            if getattr(campo, 'auto_now_add', False):
+                campo.auto_now_add = False
+
+
+def copiar_filas(queryset, destino, convertir):
+    """Copia las filas por lotes con bulk_create; devuelve {pk_origen: pk_destino}"""
+    mapa = {}
+    lote = []
+    for fila in queryset.order_by('pk').iterator(chunk_size=LOTE):
+        lote.append((fila.pk, convertir(fila)))
+        if len(lote) >= LOTE:
+            volcar_lote(lote, destino, mapa)
+            lote = []
+    volcar_lote(lote, destino, mapa)
+    return mapa
+
+
+def volcar_lote(lote, destino, mapa):
+    creados = destino.objects.bulk_create([obj for _, obj in lote])
+    for (pk, _), obj in zip(lote, creados):
+        mapa[pk] = obj.pk
+
+
+def copiar_a_inspecciones(apps, schema_editor):
+    """Pasa las 21 tablas por sistema a Inspeccion / PuntoInspeccion / ImagenPunto.
+
+    Las imágenes conservan su hash, así que las referencias de ImagenCompartida
+    siguen siendo válidas.
+    """
+    Inspeccion = apps.get_model('vehiculos', 'Inspeccion')
+    PuntoInspeccion = apps.get_model('vehiculos', 'PuntoInspeccion')
+    ImagenPunto = apps.get_model('vehiculos', 'ImagenPunto')
+    conservar_fechas(Inspeccion, PuntoInspeccion, ImagenPunto)
+
+    for sistema, detalle, punto, imagen in SISTEMAS_ANTERIORES:
+        detalles = copiar_filas(
+            apps.get_model('vehiculos', detalle).objects.all(), Inspeccion,
+            lambda fila: Inspeccion(
+                vehiculo_id=fila.vehiculo_id, sistema=sistema,
+                usuario_id=fila.usuario_id, fecha_revision=fila.fecha_revision,
+            ),
+        )
+        puntos = copiar_filas(
+            apps.get_model('vehiculos', punto).objects.all(), PuntoInspeccion,
+            lambda fila: PuntoInspeccion(
+                detalle_id=detalles[fila.detalle_id], sistema=sistema,
+                **{campo: getattr(fila, campo) for campo in CAMPOS_PUNTO},
+            ),
+        )
+        copiar_filas(
+            apps.get_model('vehiculos', imagen).objects.all(), ImagenPunto,
+            lambda fila: ImagenPunto(
+                punto_id=puntos[fila.punto_id],
+                **{campo: getattr(fila, campo) for campo in CAMPOS_IMAGEN},
+            ),
+        )
+
+
+def copiar_a_tablas_por_sistema(apps, schema_editor):
+    """Operación inversa: reparte las inspecciones en las tablas de cada sistema"""
+    Inspeccion = apps.get_model('vehiculos', 'Inspeccion')
+    PuntoInspeccion = apps.get_model('vehiculos', 'PuntoInspeccion')
+    ImagenPunto = apps.get_model('vehiculos', 'ImagenPunto')
+
+    for sistema, detalle, punto, imagen in SISTEMAS_ANTERIORES:
+        Detalle = apps.get_model('vehiculos', detalle)
+        Punto = apps.get_model('vehiculos', punto)
+        Imagen = apps.get_model('vehiculos', imagen)
+        conservar_fechas(Detalle, Punto, Imagen)
+
+        detalles = copiar_filas(
+            Inspeccion.objects.filter(sistema=sistema), Detalle,
+            lambda fila: Detalle(
+                vehiculo_id=fila.vehiculo_id, usuario_id=fila.usuario_id,
+                fecha_revision=fila.fecha_revision,
+            ),
+        )
+        puntos = copiar_filas(
+            PuntoInspeccion.objects.filter(detalle__sistema=sistema), Punto,
+            lambda fila: Punto(
+                detalle_id=detalles[fila.detalle_id],
+                **{campo: getattr(fila, campo) for campo in CAMPOS_PUNTO},
+            ),
+        )
+        copiar_filas(
+            ImagenPunto.objects.filter(punto__detalle__sistema=sistema), Imagen,
+            lambda fila: Imagen(
+                punto_id=puntos[fila.punto_id],
+                **{campo: getattr(fila, campo) for campo in CAMPOS_IMAGEN},
+            ),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('vehiculos', '0008_blob_imagen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImagenPunto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('imagen_sha256', models.CharField(blank=True, db_index=True, default='', max_length=64)),
+                ('imagen_tamano', models.PositiveIntegerField(blank=True, null=True)),
+                ('imagen_mime', models.CharField(blank=True, default='', max_length=50)),
+                ('imagen_ancho', models.PositiveIntegerField(blank=True, null=True)),
+                ('imagen_alto', models.PositiveIntegerField(blank=True, null=True)),
+                ('imagen_base64', models.TextField(blank=True, default='')),
+                ('fecha_subida', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Imagen de punto',
+                'verbose_name_plural': 'Imágenes de puntos',
+            },
+        ),
+        migrations.CreateModel(
+            name='Inspeccion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sistema', models.CharField(choices=[('motor', 'Motor'), ('transmision', 'Transmisión'), ('frenos', 'Frenos'), ('direccion_suspension', 'Dirección/Suspensión'), ('carroceria', 'Carrocería'), ('revision_general', 'Revisión General'), ('interior', 'Interior')], max_length=30)),
+                ('fecha_revision', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inspecciones_registradas', to=settings.AUTH_USER_MODEL)),
+                ('vehiculo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inspecciones', to='vehiculos.vehiculo')),
+            ],
+            options={
+                'verbose_name': 'Inspección',
+                'verbose_name_plural': 'Inspecciones',
+            },
+        ),
+        migrations.CreateModel(
+            name='PuntoInspeccion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sistema', models.CharField(choices=[('motor', 'Motor'), ('transmision', 'Transmisión'), ('frenos', 'Frenos'), ('direccion_suspension', 'Dirección/Suspensión'), ('carroceria', 'Carrocería'), ('revision_general', 'Revisión General'), ('interior', 'Interior')], max_length=30)),
+                ('nombre', models.CharField(choices=[('ruidos', 'Presencia de ruidos anormales en motor'), ('fugas', 'Fugas presentes en motor'), ('respuesta', 'Respuesta del motor'), ('paso_marchas', 'Paso de marchas'), ('fugas_caja', 'Fugas presentes en caja'), ('estado_embrague', 'Estado de embrague'), ('frenado_correcto', 'Frenado correcto a distancia adecuada'), ('sonidos_frenar', 'Sonidos al momento de frenar'), ('olgura_freno_mano', 'Olgura de freno de mano'), ('amortiguadores', 'Amortiguadores en buen estado'), ('alineacion', 'Alineación'), ('balanceo', 'Balanceo'), ('ruidos_tren_delantero', 'Ruidos en tren delantero'), ('ruidos_tren_trasero', 'Ruidos en tren trasero'), ('estado_pintura', 'Estado de pintura'), ('abolladuras', 'Abolladuras o daños en carrocería'), ('estado_vidrios', 'Estado de vidrios'), ('alineacion_piezas', 'Alineación de piezas de carrocería'), ('estado_luces', 'Estado de luces'), ('nivel_liquidos', 'Nivel de líquidos'), ('kit_emergencia', 'Existencia de kit de emergencia'), ('bateria_alternador', 'Estado de batería y alternador'), ('presencia_dtc', 'Presencia de DTC'), ('estado_ruedas', 'Estado de rueda y profundidad'), ('rueda_repuesto', 'Rueda de repuesto'), ('estado_tapiz_butacas', 'Estado de tapiz y butacas'), ('funcionamiento_radio', 'Funcionamiento de radio'), ('desgaste_plasticos', 'Desgaste de plásticos'), ('accesorios_electricos', 'Estado de accesorios eléctricos'), ('estado_maleta', 'Estado de maleta')], max_length=50)),
+                ('estado', models.CharField(choices=[('BUENO', 'Bueno'), ('OBSERVACION', 'Con Observación'), ('RECHAZADO', 'Rechazado')], default='REVISION', max_length=15)),
+                ('observacion', models.TextField(blank=True, null=True)),
+                ('fecha_registro', models.DateTimeField(auto_now_add=True)),
+                ('detalle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='puntos', to='vehiculos.inspeccion')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='puntos_registrados', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Punto de inspección',
+                'verbose_name_plural': 'Puntos de inspección',
+            },
+        ),
+        migrations.AddField(
+            model_name='imagenpunto',
+            name='punto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imagenes', to='vehiculos.puntoinspeccion'),
+        ),
+        migrations.AddField(
+            model_name='imagenpunto',
+            name='usuario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='puntoinspeccion',
+            index=models.Index(fields=['estado', 'sistema'], name='punto_estado_sistema_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='puntoinspeccion',
+            unique_together={('detalle', 'nombre')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='inspeccion',
+            unique_together={('vehiculo', 'sistema')},
+        ),
+        migrations.RunPython(copiar_a_inspecciones, copiar_a_tablas_por_sistema),
+        migrations.RemoveField(
+            model_name='detalledireccionsuspension',
+            name='usuario',
+        ),
+        migrations.RemoveField(
+            model_name='detalledireccionsuspension',
+            name='vehiculo',
+        ),
+        migrations.RemoveField(
+            model_name='detallefrenos',
+            name='usuario',
+        ),
+        migrations.RemoveField(
+            model_name='detallefrenos',
+            name='vehiculo',
+        ),
+        migrations.RemoveField(
+            model_name='detalleinterior',
+            name='usuario',
+        ),
+        migrations.RemoveField(
+            model_name='detalleinterior',
+            name='vehiculo',
+        ),
+        migrations.RemoveField(
+            model_name='detallemotor',
+            name='usuario',
+        ),
+        migrations.RemoveField(
+            model_name='detallemotor',
+            name='vehiculo',
+        ),
+        migrations.RemoveField(
+            model_name='detallerevisiongeneral',
+            name='usuario',
+        ),
+        migrations.RemoveField(
+            model_name='detallerevisiongeneral',
+            name='vehiculo',
+        ),
+        migrations.RemoveField(
+            model_name='detalletransmision',
+            name='usuario',
+        ),
+        migrations.RemoveField(
+            model_name='detalletransmision',
+            name='vehiculo',
+        ),
+        migrations.AlterUniqueTogether(
+            name='puntocarroceria',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='puntocarroceria',
+            name='detalle',
+        ),
+        migrations.RemoveField(
+            model_name='puntocarroceria',
+            name='usuario',
+        ),
+        migrations.RemoveField(
+            model_name='puntocarroceriaimagen',
+            name='punto',
+        ),
+        migrations.RemoveField(
+            model_name='puntocarroceriaimagen',
+            name='usuario',
+        ),
+        migrations.AlterUniqueTogether(
+            name='puntodireccionsuspension',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='puntodireccionsuspension',
+            name='detalle',
+        ),
+        migrations.RemoveField(
+            model_name='puntodireccionsuspension',
+            name='usuario',
+        ),
+        migrations.RemoveField(
+            model_name='puntodireccionsuspensionimagen',
+            name='punto',
+        ),
+        migrations.RemoveField(
+            model_name='puntodireccionsuspensionimagen',
+            name='usuario',
+        ),
+        migrations.AlterUniqueTogether(
+            name='puntofrenos',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='puntofrenos',
+            name='detalle',
+        ),
+        migrations.RemoveField(
+            model_name='puntofrenos',
+            name='usuario',
+        ),
+        migrations.RemoveField(
+            model_name='puntofrenosimagen',
+            name='punto',
+        ),
+        migrations.RemoveField(
+            model_name='puntofrenosimagen',
+            name='usuario',
+        ),
+        migrations.AlterUniqueTogether(
+            name='puntointerior',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='puntointerior',
+            name='detalle',
+        ),
+        migrations.RemoveField(
+            model_name='puntointerior',
+            name='usuario',
+        ),
+        migrations.RemoveField(
+            model_name='puntointeriorimagen',
+            name='punto',
+        ),
+        migrations.RemoveField(
+            model_name='puntointeriorimagen',
+            name='usuario',
+        ),
+        migrations.AlterUniqueTogether(
+            name='puntomotor',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='puntomotor',
+            name='detalle',
+        ),
+        migrations.RemoveField(
+            model_name='puntomotor',
+            name='usuario',
+        ),
+        migrations.RemoveField(
+            model_name='puntomotorimagen',
+            name='punto',
+        ),
+        migrations.RemoveField(
+            model_name='puntomotorimagen',
+            name='usuario',
+        ),
+        migrations.AlterUniqueTogether(
+            name='puntorevisiongeneral',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='puntorevisiongeneral',
+            name='detalle',
+        ),
+        migrations.RemoveField(
+            model_name='puntorevisiongeneral',
+            name='usuario',
+        ),
+        migrations.RemoveField(
+            model_name='puntorevisiongeneralimagen',
+            name='punto',
+        ),
+        migrations.RemoveField(
+            model_name='puntorevisiongeneralimagen',
+            name='usuario',
+        ),
+        migrations.AlterUniqueTogether(
+            name='puntotransmision',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='puntotransmision',
+            name='detalle',
+        ),
+        migrations.RemoveField(
+            model_name='puntotransmision',
+            name='usuario',
+        ),
+        migrations.RemoveField(
+            model_name='puntotransmisionimagen',
+            name='punto',
+        ),
+        migrations.RemoveField(
+            model_name='puntotransmisionimagen',
+            name='usuario',
+        ),
+        migrations.DeleteModel(
+            name='DetalleCarroceria',
+        ),
+        migrations.DeleteModel(
+            name='DetalleDireccionSuspension',
+        ),
+        migrations.DeleteModel(
+            name='DetalleFrenos',
+        ),
+        migrations.DeleteModel(
+            name='DetalleInterior',
+        ),
+        migrations.DeleteModel(
+            name='DetalleMotor',
+        ),
+        migrations.DeleteModel(
+            name='DetalleRevisionGeneral',
+        ),
+        migrations.DeleteModel(
+            name='DetalleTransmision',
+        ),
+        migrations.DeleteModel(
+            name='PuntoCarroceria',
+        ),
+        migrations.DeleteModel(
+            name='PuntoCarroceriaImagen',
+        ),
+        migrations.DeleteModel(
+            name='PuntoDireccionSuspension',
+        ),
+        migrations.DeleteModel(
+            name='PuntoDireccionSuspensionImagen',
+        ),
+        migrations.DeleteModel(
+            name='PuntoFrenos',
+        ),
+        migrations.DeleteModel(
+            name='PuntoFrenosImagen',
+        ),
+        migrations.DeleteModel(
+            name='PuntoInterior',
+        ),
+        migrations.DeleteModel(
+            name='PuntoInteriorImagen',
+        ),
+        migrations.DeleteModel(
+            name='PuntoMotor',
+        ),
+        migrations.DeleteModel(
+            name='PuntoMotorImagen',
+        ),
+        migrations.DeleteModel(
+            name='PuntoRevisionGeneral',
+        ),
+        migrations.DeleteModel(
+            name='PuntoRevisionGeneralImagen',
+        ),
+        migrations.DeleteModel(
+            name='PuntoTransmision',
+        ),
+        migrations.DeleteModel(
+            name='PuntoTransmisionImagen',
+        ),
+        migrations.CreateModel(
+            name='DetalleCarroceria',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.inspeccion',),
+        ),
+        migrations.CreateModel(
+            name='DetalleDireccionSuspension',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.inspeccion',),
+        ),
+        migrations.CreateModel(
+            name='DetalleFrenos',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.inspeccion',),
+        ),
+        migrations.CreateModel(
+            name='DetalleInterior',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.inspeccion',),
+        ),
+        migrations.CreateModel(
+            name='DetalleMotor',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.inspeccion',),
+        ),
+        migrations.CreateModel(
+            name='DetalleRevisionGeneral',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.inspeccion',),
+        ),
+        migrations.CreateModel(
+            name='DetalleTransmision',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.inspeccion',),
+        ),
+        migrations.CreateModel(
+            name='PuntoCarroceria',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.puntoinspeccion',),
+        ),
+        migrations.CreateModel(
+            name='PuntoCarroceriaImagen',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.imagenpunto',),
+        ),
+        migrations.CreateModel(
+            name='PuntoDireccionSuspension',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.puntoinspeccion',),
+        ),
+        migrations.CreateModel(
+            name='PuntoDireccionSuspensionImagen',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.imagenpunto',),
+        ),
+        migrations.CreateModel(
+            name='PuntoFrenos',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.puntoinspeccion',),
+        ),
+        migrations.CreateModel(
+            name='PuntoFrenosImagen',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.imagenpunto',),
+        ),
+        migrations.CreateModel(
+            name='PuntoInterior',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.puntoinspeccion',),
+        ),
+        migrations.CreateModel(
+            name='PuntoInteriorImagen',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.imagenpunto',),
+        ),
+        migrations.CreateModel(
+            name='PuntoMotor',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.puntoinspeccion',),
+        ),
+        migrations.CreateModel(
+            name='PuntoMotorImagen',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.imagenpunto',),
+        ),
+        migrations.CreateModel(
+            name='PuntoRevisionGeneral',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.puntoinspeccion',),
+        ),
+        migrations.CreateModel(
+            name='PuntoRevisionGeneralImagen',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.imagenpunto',),
+        ),
+        migrations.CreateModel(
+            name='PuntoTransmision',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.puntoinspeccion',),
+        ),
+        migrations.CreateModel(
+            name='PuntoTransmisionImagen',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('vehiculos.imagenpunto',),
+        ),
+    ]
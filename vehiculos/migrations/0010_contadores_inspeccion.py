@@ -0,0 +1,88 @@
+# Generated by Django 4.2.16 on 2026-10-17 22:43
+
+from django.db import migrations, models
+
+
+CONTADORES_ESTADO = {
+    'BUENO': 'puntos_buenos',
+    'OBSERVACION': 'puntos_observacion',
+    'REVISION': 'puntos_revision',
+    'RECHAZADO': 'puntos_rechazados',
+}
+
+
+def calcular_contadores(apps, schema_editor):
+    """Llena los contadores nuevos a partir de las inspecciones existentes"""
+    Vehiculo = apps.get_model('vehiculos', 'Vehiculo')
+    Inspeccion = apps.get_model('vehiculos', 'Inspeccion')
+    PuntoInspeccion = apps.get_model('vehiculos', 'PuntoInspeccion')
+    contadores = {}
+
+    puntos = (
+        PuntoInspeccion.objects.values('detalle__vehiculo', 'estado')
+        .annotate(n=models.Count('pk'), ultima=models.Max('fecha_registro')).order_by()
+    )
+    for fila in puntos:
+        vehiculo = contadores.setdefault(fila['detalle__vehiculo'], {})
+        if fila['estado'] in CONTADORES_ESTADO:
+            vehiculo[CONTADORES_ESTADO[fila['estado']]] = fila['n']
+        vehiculo['ultima_inspeccion'] = max(filter(None, [vehiculo.get('ultima_inspeccion'), fila['ultima']]))
+
+    inspecciones = (
+        Inspeccion.objects.values('vehiculo')
+        .annotate(n=models.Count('pk'), ultima=models.Max('fecha_revision')).order_by()
+    )
+    for fila in inspecciones:
+        vehiculo = contadores.setdefault(fila['vehiculo'], {})
+        vehiculo['sistemas_revisados'] = fila['n']
+        vehiculo['ultima_inspeccion'] = max(filter(None, [vehiculo.get('ultima_inspeccion'), fila['ultima']]))
+
+    for pk, campos in contadores.items():
+        campos['tiene_rechazados'] = campos.get('puntos_rechazados', 0) > 0
+        Vehiculo.objects.filter(pk=pk).update(**campos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0009_inspeccion_unificada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehiculo',
+            name='puntos_buenos',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='puntos_observacion',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='puntos_rechazados',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='puntos_revision',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='sistemas_revisados',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='tiene_rechazados',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='ultima_inspeccion',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(calcular_contadores, migrations.RunPython.noop),
+    ]
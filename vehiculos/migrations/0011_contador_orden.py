@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-17 22:46
+
+from django.db import migrations, models
+
+
+def iniciar_contador(apps, schema_editor):
+    """El contador parte del mayor numero_orden ya asignado"""
+    ContadorOrden = apps.get_model('vehiculos', 'ContadorOrden')
+    Vehiculo = apps.get_model('vehiculos', 'Vehiculo')
+    maximo = Vehiculo.objects.aggregate(maximo=models.Max('numero_orden'))['maximo'] or 0
+    ContadorOrden.objects.create(nombre='vehiculo', valor=maximo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0010_contadores_inspeccion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorOrden',
+            fields=[
+                ('nombre', models.CharField(max_length=30, primary_key=True, serialize=False)),
+                ('valor', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador de órdenes',
+                'verbose_name_plural': 'Contadores de órdenes',
+            },
+        ),
+        migrations.RunPython(iniciar_contador, migrations.RunPython.noop),
+    ]
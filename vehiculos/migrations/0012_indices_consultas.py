@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-17 22:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0011_contador_orden'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='puntoinspeccion',
+            index=models.Index(condition=models.Q(('estado', 'RECHAZADO')), fields=['detalle'], name='punto_rechazado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['usuario', '-fecha_registro'], name='vehiculo_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['-fecha_registro'], name='vehiculo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(condition=models.Q(('tiene_rechazados', True)), fields=['usuario', 'fecha_registro'], name='vehiculo_rechazados_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-17 22:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0012_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehiculo',
+            name='empresa',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vehiculos', to='vehiculos.empresa'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['empresa', '-fecha_registro'], name='vehiculo_empresa_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-17 22:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0013_empresa_vehiculo'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='vehiculo',
+            name='vehiculo_usuario_fecha_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='vehiculo',
+            name='vehiculo_fecha_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='vehiculo',
+            name='vehiculo_empresa_fecha_idx',
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['usuario', '-fecha_registro', '-id'], name='vehiculo_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['-fecha_registro', '-id'], name='vehiculo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['empresa', '-fecha_registro', '-id'], name='vehiculo_empresa_fecha_idx'),
+        ),
+    ]
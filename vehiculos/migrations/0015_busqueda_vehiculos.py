@@ -0,0 +1,72 @@
+# Generated by Django 4.2.16 on 2026-10-17 22:53
+
+import re
+
+from django.db import migrations, models
+
+
+LOTE = 1000
+
+# icontains en PostgreSQL compara UPPER(columna) LIKE UPPER('%texto%'); un
+# índice GIN de trigramas sobre esa misma expresión evita recorrer la tabla.
+# SQLite no tiene trigramas: allí el texto libre sigue siendo un recorrido.
+INDICES_TRIGRAMAS = [
+    ('vehiculo_marca_trgm_idx', 'marca'),
+    ('vehiculo_modelo_trgm_idx', 'modelo'),
+]
+
+
+def normalizar_patente(patente):
+    return re.sub(r'[^A-Z0-9]', '', (patente or '').upper())
+
+
+def llenar_patente_normalizada(apps, schema_editor):
+    Vehiculo = apps.get_model('vehiculos', 'Vehiculo')
+    lote = []
+    for vehiculo in Vehiculo.objects.exclude(patente=None).only('pk', 'patente').order_by('pk').iterator(chunk_size=LOTE):
+        vehiculo.patente_normalizada = normalizar_patente(vehiculo.patente)
+        lote.append(vehiculo)
+        if len(lote) == LOTE:
+            Vehiculo.objects.bulk_update(lote, ['patente_normalizada'])
+            lote = []
+    if lote:
+        Vehiculo.objects.bulk_update(lote, ['patente_normalizada'])
+
+
+def crear_indices_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nombre, columna in INDICES_TRIGRAMAS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {nombre} ON vehiculos_vehiculo '
+            f'USING gin (UPPER({columna}) gin_trgm_ops)'
+        )
+
+
+def borrar_indices_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre, _ in INDICES_TRIGRAMAS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nombre}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0014_indices_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehiculo',
+            name='patente_normalizada',
+            field=models.CharField(blank=True, default='', editable=False, max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['patente_normalizada'], name='vehiculo_patente_norm_idx'),
+        ),
+        migrations.RunPython(llenar_patente_normalizada, migrations.RunPython.noop),
+        migrations.RunPython(crear_indices_trigramas, borrar_indices_trigramas),
+    ]
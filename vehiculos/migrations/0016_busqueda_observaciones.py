@@ -0,0 +1,49 @@
+# Generated by Django 4.2.16 on 2026-10-17 22:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Debe ser la misma expresión que genera SearchVector('observacion', config='spanish')
+# en busqueda.buscar_observaciones(), o PostgreSQL no usará el índice.
+# En los demás motores la tabla TerminoObservacion hace de índice; para
+# llenarla con los puntos existentes: manage.py reindexar_observaciones
+INDICE_OBSERVACIONES = (
+    "CREATE INDEX IF NOT EXISTS punto_observacion_fts_idx ON vehiculos_puntoinspeccion "
+    "USING gin (to_tsvector('spanish'::regconfig, COALESCE(observacion, '')))"
+)
+
+
+def crear_indice_observaciones(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(INDICE_OBSERVACIONES)
+
+
+def borrar_indice_observaciones(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS punto_observacion_fts_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0015_busqueda_vehiculos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoObservacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=40)),
+                ('frecuencia', models.PositiveSmallIntegerField(default=1)),
+                ('punto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos', to='vehiculos.puntoinspeccion')),
+            ],
+            options={
+                'verbose_name': 'Término de observación',
+                'verbose_name_plural': 'Términos de observaciones',
+                'unique_together': {('termino', 'punto')},
+            },
+        ),
+        migrations.RunPython(crear_indice_observaciones, borrar_indice_observaciones),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def llenar_fecha_modificacion(apps, schema_editor):
+    # Las filas existentes toman su fecha de registro en vez de la de la migración
+    for modelo in ('Vehiculo', 'PuntoInspeccion'):
+        apps.get_model('vehiculos', modelo).objects.update(fecha_modificacion=models.F('fecha_registro'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('vehiculos', '0016_busqueda_observaciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ambito', models.CharField(max_length=30)),
+                ('clave', models.CharField(max_length=64)),
+                ('respuesta', models.JSONField(default=dict)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Clave de idempotencia',
+                'verbose_name_plural': 'Claves de idempotencia',
+            },
+        ),
+        migrations.AddField(
+            model_name='puntoinspeccion',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(llenar_fecha_modificacion, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='puntoinspeccion',
+            index=models.Index(fields=['fecha_modificacion', 'id'], name='punto_modificacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['fecha_modificacion', 'id'], name='vehiculo_modificacion_idx'),
+        ),
+        migrations.AddField(
+            model_name='claveidempotencia',
+            name='usuario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='claves_idempotencia', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='claveidempotencia',
+            unique_together={('usuario', 'ambito', 'clave')},
+        ),
+    ]
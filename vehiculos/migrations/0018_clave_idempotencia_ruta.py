@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0017_sincronizacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='claveidempotencia',
+            name='ruta',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
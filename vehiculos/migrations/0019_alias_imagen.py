@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0018_clave_idempotencia_ruta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AliasImagen',
+            fields=[
+                ('sha256_recibido', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Alias de imagen',
+                'verbose_name_plural': 'Alias de imágenes',
+            },
+        ),
+    ]
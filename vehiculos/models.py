@@ -1,8 +1,17 @@
-from django.db import models
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete
+from django.dispatch import Signal
 from django.conf import settings
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.contrib.auth.models import User
 
+from .busqueda import filtro_busqueda, normalizar_patente, terminos, usa_texto_completo
+
 
 class Empresa(models.Model):
     nombre = models.CharField(max_length=100)
@@ -26,6 +35,50 @@ class PerfilUsuario(models.Model):
         return f"{self.usuario.username} - {self.empresa}"
 
 
+class EstadisticaImagenes(models.Model):
+    """Bytes recibidos y guardados tras normalizar las fotos, por empresa"""
+    empresa = models.OneToOneField(
+        Empresa,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='estadistica_imagenes'
+    )
+    imagenes = models.PositiveIntegerField(default=0)
+    bytes_originales = models.PositiveBigIntegerField(default=0)
+    bytes_guardados = models.PositiveBigIntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Estadística de imágenes'
+        verbose_name_plural = 'Estadísticas de imágenes'
+
+    def __str__(self):
+        return f"Imágenes de {self.empresa or 'Sin empresa'}"
+
+    @property
+    def bytes_ahorrados(self):
+        return self.bytes_originales - self.bytes_guardados
+
+    @classmethod
+    def registrar(cls, empresa_id, infos, nuevas=True):
+        """Suma al contador de la empresa las imágenes recién normalizadas.
+
+        Con ``nuevas=False`` (normalizar_imagenes sobre fotos ya guardadas) solo
+        suma los bytes: esas fotos no son imágenes recibidas ahora.
+        """
+        infos = [info for info in infos if info and info.tamano_original is not None]
+        if not infos:
+            return
+        cls.objects.get_or_create(empresa_id=empresa_id)
+        cls.objects.filter(empresa_id=empresa_id).update(
+            imagenes=models.F('imagenes') + (len(infos) if nuevas else 0),
+            bytes_originales=models.F('bytes_originales') + sum(i.tamano_original for i in infos),
+            bytes_guardados=models.F('bytes_guardados') + sum(i.tamano for i in infos),
+            fecha_actualizacion=timezone.now(),
+        )
+
+
 ESTADOS = [
     ('BUENO', 'Bueno'),
     ('OBSERVACION', 'Con Observación'),
@@ -33,8 +86,488 @@ ESTADOS = [
 ]
 
 
-class Vehiculo(models.Model):
+# --------------------------------------------
+# QuerySet y Manager que no cargan el payload de la imagen
+# --------------------------------------------
+class ImagenQuerySet(models.QuerySet):
+    def with_image(self):
+        """Vuelve a cargar imagen_base64 (solo para quien realmente lo necesita)"""
+        return self.defer(None)
+
+    def image_meta_only(self):
+        """Deja fuera el payload y marca en SQL si la fila aún tiene base64 sin migrar"""
+        return self.defer('imagen_base64').annotate(
+            imagen_pendiente=models.Case(
+                models.When(
+                    models.Q(imagen_base64__isnull=True) | models.Q(imagen_base64=''),
+                    then=models.Value(False)
+                ),
+                default=models.Value(True),
+                output_field=models.BooleanField(),
+            )
+        )
+
+
+class ImagenManager(models.Manager.from_queryset(ImagenQuerySet)):
+    def get_queryset(self):
+        # Por defecto nunca se trae imagen_base64; se carga bajo demanda al accederlo
+        return super().get_queryset().defer('imagen_base64')
+
+
+# --------------------------------------------
+# Mixin para modelos con imagen en el almacén de blobs
+# --------------------------------------------
+class ImagenAlmacenadaMixin(models.Model):
+    """Metadatos de una imagen guardada en el almacén direccionado por contenido.
+
+    Mientras una fila no se haya migrado, la imagen sigue en ``imagen_base64``.
+    """
+    imagen_sha256 = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    imagen_tamano = models.PositiveIntegerField(null=True, blank=True)
+    imagen_mime = models.CharField(max_length=50, blank=True, default='')
+    imagen_ancho = models.PositiveIntegerField(null=True, blank=True)
+    imagen_alto = models.PositiveIntegerField(null=True, blank=True)
+
+    objects = ImagenManager()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Hash con el que se leyó la fila, para ajustar las referencias al guardar
+        instancia._sha256_guardado = instancia.__dict__.get('imagen_sha256')
+        return instancia
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            anterior = ''
+        elif getattr(self, '_sha256_guardado', None) is not None:
+            anterior = self._sha256_guardado
+        else:
+            anterior = type(self)._base_manager.filter(pk=self.pk).values_list('imagen_sha256', flat=True).first() or ''
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if anterior != self.imagen_sha256:
+                if self.imagen_sha256:
+                    ImagenCompartida.sumar_referencia(self)
+                if anterior:
+                    ImagenCompartida.restar_referencia(anterior)
+        self._sha256_guardado = self.imagen_sha256
+
+    @property
+    def tiene_imagen(self):
+        if self.imagen_sha256:
+            return True
+        # Con image_meta_only() se sabe sin traer el payload
+        if 'imagen_pendiente' in self.__dict__:
+            return self.imagen_pendiente
+        return bool(self.imagen_base64)
+
+    def get_imagen_url(self, variante='full'):
+        """URL de la variante pedida; nunca incrusta el contenido en el HTML.
+
+        Las filas migradas apuntan al hash (cache inmutable); las que no, a su id.
+        """
+        if self.imagen_sha256:
+            if variante == 'full':
+                return reverse('ver_imagen', args=[self.imagen_sha256])
+            return reverse('ver_imagen_variante', args=[self.imagen_sha256, variante])
+        if self.pk is None:
+            return ''
+        if variante == 'full':
+            return reverse('ver_imagen_fila', args=[self._meta.model_name, self.pk])
+        return reverse('ver_imagen_fila_variante', args=[self._meta.model_name, self.pk, variante])
+
+    @property
+    def imagen_src(self):
+        return self.get_imagen_url()
+
+    def asignar_imagen(self, info):
+        """Asigna los metadatos de un InfoImagen y libera el base64"""
+        self.imagen_sha256 = info.sha256
+        self.imagen_tamano = info.tamano
+        self.imagen_mime = info.mime
+        self.imagen_ancho = info.ancho
+        self.imagen_alto = info.alto
+        self.imagen_base64 = self._meta.get_field('imagen_base64').get_default()
+
+
+def modelos_con_imagen():
+    """Modelos concretos que guardan su imagen en el almacén de blobs"""
+    from django.apps import apps
+    return [
+        m for m in apps.get_app_config('vehiculos').get_models()
+        if issubclass(m, ImagenAlmacenadaMixin) and not m._meta.proxy
+    ]
+
+
+# --------------------------------------------
+# Imagen compartida (una fila por contenido, con contador de referencias)
+# --------------------------------------------
+class ImagenCompartida(models.Model):
+    """Un blob del almacén y cuántas filas de imagen lo usan.
+
+    Los bytes se guardan una sola vez aunque la misma foto aparezca en varios
+    puntos, sistemas o vehículos. Un blob sin referencias puede eliminarse
+    con ``manage.py dedupe_images --aplicar``.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    tamano = models.PositiveIntegerField(null=True, blank=True)
+    mime = models.CharField(max_length=50, blank=True, default='')
+    ancho = models.PositiveIntegerField(null=True, blank=True)
+    alto = models.PositiveIntegerField(null=True, blank=True)
+    referencias = models.PositiveIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Imagen compartida'
+        verbose_name_plural = 'Imágenes compartidas'
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.referencias} ref.)"
+
+    @staticmethod
+    def datos_origen(origen):
+        """(sha256, metadatos) de una fila con imagen o de un InfoImagen"""
+        sha256 = getattr(origen, 'imagen_sha256', None) or origen.sha256
+        return sha256, {
+            'tamano': getattr(origen, 'imagen_tamano', getattr(origen, 'tamano', None)),
+            'mime': getattr(origen, 'imagen_mime', getattr(origen, 'mime', '')) or '',
+            'ancho': getattr(origen, 'imagen_ancho', getattr(origen, 'ancho', None)),
+            'alto': getattr(origen, 'imagen_alto', getattr(origen, 'alto', None)),
+        }
+
+    @classmethod
+    def sumar_referencia(cls, origen, cantidad=1):
+        """Suma referencias al hash de ``origen`` (fila con imagen o InfoImagen)"""
+        sha256, metadatos = cls.datos_origen(origen)
+        cls.objects.get_or_create(sha256=sha256, defaults=metadatos)
+        cls.objects.filter(sha256=sha256).update(
+            referencias=models.F('referencias') + cantidad,
+            fecha_actualizacion=timezone.now(),
+        )
+
+    @classmethod
+    def sumar_referencias(cls, origenes):
+        """sumar_referencia() para varias filas: un INSERT para los hashes nuevos
+        y un UPDATE por cada cantidad distinta (casi siempre uno)"""
+        cantidades = {}
+        metadatos = {}
+        for origen in origenes:
+            sha256, datos = cls.datos_origen(origen)
+            cantidades[sha256] = cantidades.get(sha256, 0) + 1
+            metadatos.setdefault(sha256, datos)
+        if not cantidades:
+            return
+        cls.objects.bulk_create(
+            [cls(sha256=sha256, **datos) for sha256, datos in metadatos.items()],
+            ignore_conflicts=True,
+        )
+        por_cantidad = {}
+        for sha256, cantidad in cantidades.items():
+            por_cantidad.setdefault(cantidad, []).append(sha256)
+        ahora = timezone.now()
+        for cantidad, hashes in por_cantidad.items():
+            cls.objects.filter(sha256__in=hashes).update(
+                referencias=models.F('referencias') + cantidad,
+                fecha_actualizacion=ahora,
+            )
+
+    @classmethod
+    def restar_referencia(cls, sha256):
+        cls.objects.filter(sha256=sha256, referencias__gt=0).update(
+            referencias=models.F('referencias') - 1,
+            fecha_actualizacion=timezone.now(),
+        )
+
+    @classmethod
+    def mover_referencias(cls, sha256, destino, cantidad):
+        """Pasa ``cantidad`` referencias del hash ``sha256`` al de ``destino`` (InfoImagen)"""
+        cls.sumar_referencia(destino, cantidad=cantidad)
+        cls.objects.filter(sha256=sha256).update(
+            referencias=Greatest(models.F('referencias') - cantidad, 0),
+            fecha_actualizacion=timezone.now(),
+        )
+
+
+class AliasImagen(models.Model):
+    """Hash de una foto recibida cuyas filas ya usan su versión normalizada.
+
+    La normalización guarda el resultado con su propio hash: así el contenido
+    de cada hash nunca cambia y se puede cachear para siempre. El alias lleva
+    al blob normalizado a quien vuelva a subir los mismos bytes o use el hash
+    que recibió al subirlos; el blob recibido queda sin referencias hasta que
+    ``dedupe_images --aplicar`` lo borra.
+    """
+    sha256_recibido = models.CharField(max_length=64, primary_key=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Alias de imagen'
+        verbose_name_plural = 'Alias de imágenes'
+
+    def __str__(self):
+        return f"{self.sha256_recibido[:12]} -> {self.sha256[:12]}"
+
+    @classmethod
+    def vigentes(cls, hashes):
+        """{hash: hash del blob que lo reemplaza, o el mismo} con una consulta"""
+        alias = dict(cls.objects.filter(sha256_recibido__in=hashes).values_list('sha256_recibido', 'sha256'))
+        return {sha256: alias.get(sha256, sha256) for sha256 in hashes}
+
+    @classmethod
+    def registrar(cls, sha256_recibido, sha256):
+        cls.objects.update_or_create(sha256_recibido=sha256_recibido, defaults={'sha256': sha256})
+        # El recibido pudo ser antes el destino de otros alias (una foto normalizada dos veces)
+        cls.objects.filter(sha256=sha256_recibido).update(sha256=sha256)
+
+
+class BlobImagen(models.Model):
+    """Bytes de un blob del almacén cuando se usa el backend en base de datos.
+
+    Solo lo usa vehiculos.almacenamiento.AlmacenamientoBaseDatos, pensado para
+    despliegues sin disco persistente (Railway). Guarda los bytes tal cual,
+    sin base64, en una tabla aparte de las filas de imagen.
+    """
+    ruta = models.CharField(max_length=100, unique=True)
+    datos = models.BinaryField()
+    tamano = models.PositiveIntegerField()
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Blob de imagen'
+        verbose_name_plural = 'Blobs de imagen'
+
+    def __str__(self):
+        return self.ruta
+
+
+def liberar_imagen_compartida(sender, instance, **kwargs):
+    """Al borrar una fila con imagen (también en cascada) se libera su referencia.
+
+    Se conecta en conectar_senales() a cada modelo con imagen.
+    """
+    if instance.__dict__.get('imagen_sha256'):
+        ImagenCompartida.restar_referencia(instance.imagen_sha256)
+
+
+# --------------------------------------------
+# Contadores de inspección por vehículo
+# --------------------------------------------
+# Vehiculo guarda los conteos de puntos por estado, los sistemas revisados,
+# la fecha de la última inspección y si tiene algún punto rechazado. Se
+# ajustan con F() al crear o cambiar de estado un punto (sin leer la fila);
+# rebuild_vehicle_counters los recalcula y corrige cualquier desvío.
+CONTADORES_ESTADO = {
+    'BUENO': 'puntos_buenos',
+    'OBSERVACION': 'puntos_observacion',
+    'REVISION': 'puntos_revision',
+    'RECHAZADO': 'puntos_rechazados',
+}
+
+
+def inicio_del_dia(fecha):
+    """Primer instante del día en la zona horaria actual, como datetime aware"""
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+class VehiculoQuerySet(ImagenQuerySet):
+    def with_inspection_stats(self):
+        """Anota el total de puntos y el % de aprobación a partir de los contadores.
+
+        Sirve para filtrar u ordenar en SQL; en Python basta con los métodos del modelo.
+        """
+        total = sum((models.F(campo) for campo in CONTADORES_ESTADO.values()), models.Value(0))
+        return self.annotate(puntos_total=total).annotate(
+            aprobacion=models.Case(
+                models.When(puntos_total=0, then=models.Value(0.0)),
+                default=models.F('puntos_buenos') * 100.0 / models.F('puntos_total'),
+                output_field=models.FloatField(),
+            )
+        )
+
+    def visible_to(self, user):
+        """Vehículos que el usuario puede ver: todos, los de su empresa o solo los suyos"""
+        if user.is_superuser:
+            return self.all()
+        perfil = getattr(user, 'perfilusuario', None)
+        if perfil is None:
+            return self.none()
+        if perfil.cargo == 'TECNICO':
+            return self.filter(usuario=user)
+        if perfil.cargo in ['JEFE', 'GERENTE']:
+            # filter(empresa_id=None) sería IS NULL: vería todos los vehículos sin empresa
+            if perfil.empresa_id is None:
+                return self.none()
+            return self.filter(empresa_id=perfil.empresa_id)
+        return self.none()
+
+    def registrados_entre(self, desde=None, hasta=None):
+        """Filtra por fecha local de registro (ambos extremos incluidos).
+
+        Compara fecha_registro contra un rango de timestamps en vez de usar
+        __date, que convierte cada fila y no puede usar el índice.
+        """
+        queryset = self
+        if desde:
+            queryset = queryset.filter(fecha_registro__gte=inicio_del_dia(desde))
+        if hasta:
+            queryset = queryset.filter(fecha_registro__lt=inicio_del_dia(hasta + timedelta(days=1)))
+        return queryset
+
+    def buscar(self, texto):
+        """Filtra por el texto del buscador (ver vehiculos/busqueda.py)"""
+        filtro = filtro_busqueda(texto)
+        return self if filtro is None else self.filter(filtro)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Asigna numero_orden a los vehículos que no lo traen con una sola reserva en bloque"""
+        objs = list(objs)
+        for vehiculo in objs:
+            vehiculo.patente_normalizada = normalizar_patente(vehiculo.patente)
+        sin_numero = [vehiculo for vehiculo in objs if vehiculo.numero_orden is None]
+        with transaction.atomic(using=self.db):
+            if sin_numero:
+                for vehiculo, numero in zip(sin_numero, ContadorOrden.reservar(len(sin_numero))):
+                    vehiculo.numero_orden = numero
+            return super().bulk_create(objs, *args, **kwargs)
+
+    def ajustar_contadores(self, estado_anterior=None, estado_nuevo=None, sistemas=0, fecha=None,
+                           cambios_estado=()):
+        """Aplica a los contadores el alta o cambio de estado de un punto (o el alta
+        o baja de una inspección) con un solo UPDATE de incrementos atómicos.
+
+        ``cambios_estado`` admite varios pares (anterior, nuevo) a la vez, para
+        los guardados por lote.
+        """
+        deltas = {}
+        for anterior, nuevo in [(estado_anterior, estado_nuevo), *cambios_estado]:
+            if anterior in CONTADORES_ESTADO:
+                campo = CONTADORES_ESTADO[anterior]
+                deltas[campo] = deltas.get(campo, 0) - 1
+            if nuevo in CONTADORES_ESTADO:
+                campo = CONTADORES_ESTADO[nuevo]
+                deltas[campo] = deltas.get(campo, 0) + 1
+        if sistemas:
+            deltas['sistemas_revisados'] = sistemas
+
+        cambios = {campo: models.F(campo) + delta for campo, delta in deltas.items() if delta}
+        rechazados = deltas.get('puntos_rechazados', 0)
+        if rechazados:
+            # En el UPDATE, F('puntos_rechazados') es todavía el valor anterior
+            cambios['tiene_rechazados'] = models.Case(
+                models.When(puntos_rechazados__gt=-rechazados, then=models.Value(True)),
+                default=models.Value(False),
+            )
+        if fecha:
+            cambios['ultima_inspeccion'] = fecha
+        if cambios:
+            self.update(**cambios)
+
+
+class ContadorOrden(models.Model):
+    """Último numero_orden entregado.
+
+    reservar() incrementa la fila con un UPDATE antes de leerla: ese UPDATE
+    toma el bloqueo de la fila (de la base completa en SQLite), así que dos
+    ingresos simultáneos no pueden recibir el mismo número, y no hace falta
+    leer el índice de Vehiculo para saber cuál sigue.
+    """
+    nombre = models.CharField(max_length=30, primary_key=True)
+    valor = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Contador de órdenes'
+        verbose_name_plural = 'Contadores de órdenes'
+
+    def __str__(self):
+        return f"{self.nombre}: {self.valor}"
+
+    @classmethod
+    def reservar(cls, cantidad=1, nombre='vehiculo'):
+        """Reserva ``cantidad`` números consecutivos y los devuelve como range.
+
+        El bloqueo dura hasta el fin de la transacción que lo llama: conviene
+        reservar justo antes de insertar, no al principio de una transacción larga.
+        """
+        with transaction.atomic():
+            actualizadas = cls.objects.filter(nombre=nombre).update(valor=models.F('valor') + cantidad)
+            if not actualizadas:
+                cls.crear(nombre)
+                cls.objects.filter(nombre=nombre).update(valor=models.F('valor') + cantidad)
+            ultimo = cls.objects.filter(nombre=nombre).values_list('valor', flat=True).get()
+        return range(ultimo - cantidad + 1, ultimo + 1)
+
+    @classmethod
+    def crear(cls, nombre):
+        """Crea el contador partiendo del mayor numero_orden existente"""
+        inicial = Vehiculo.objects.aggregate(maximo=models.Max('numero_orden'))['maximo'] or 0
+        try:
+            with transaction.atomic():
+                cls.objects.create(nombre=nombre, valor=inicial)
+        except IntegrityError:
+            # Otro proceso lo creó al mismo tiempo
+            pass
+
+
+class VehiculoManager(ImagenManager.from_queryset(VehiculoQuerySet)):
+    pass
+
+
+# (sistema, nombre, ícono) en el orden en que se muestran
+SISTEMAS_INFO = [
+    ('motor', 'Motor', 'gear'),
+    ('transmision', 'Transmisión', 'gear-wide-connected'),
+    ('frenos', 'Frenos', 'stop-circle'),
+    ('direccion_suspension', 'Dirección/Suspensión', 'sliders'),
+    ('carroceria', 'Carrocería', 'car-front'),
+    ('revision_general', 'Revisión General', 'clipboard-check'),
+    ('interior', 'Interior', 'cup-hot'),
+]
+
+COLORES_ESTADO_SISTEMA = {
+    'Aprobado': 'success',
+    'En revisión': 'warning',
+    'Rechazado': 'danger',
+    'No revisado': 'secondary'
+}
+
+
+class ResumenInspeccion:
+    """Inspecciones de un vehículo con sus puntos ya en memoria"""
+
+    def __init__(self, inspecciones):
+        self.inspecciones = {}
+        self.puntos = {}
+        for inspeccion in inspecciones:
+            self.inspecciones[inspeccion.sistema] = inspeccion
+            self.puntos[inspeccion.sistema] = list(inspeccion.puntos.all())
+
+    def estado_sistema(self, sistema):
+        """Aprobado si todos los puntos están buenos, Rechazado si alguno lo está"""
+        estados = {p.estado for p in self.puntos.get(sistema, [])}
+        if not estados:
+            return 'No revisado'
+        if estados == {'BUENO'}:
+            return 'Aprobado'
+        if 'RECHAZADO' in estados:
+            return 'Rechazado'
+        return 'En revisión'
+
+
+def _inspeccion(sistema):
+    return property(lambda self: self.get_inspeccion(sistema))
+
+
+class Vehiculo(ImagenAlmacenadaMixin):
     patente = models.CharField(max_length=10, unique=False, blank=True, null=True)
+    # Patente en mayúsculas y sin guiones ni espacios, para buscar por prefijo
+    patente_normalizada = models.CharField(max_length=10, blank=True, default='', editable=False)
     numero_orden = models.PositiveIntegerField(unique=True, editable=False, null=True)
     marca = models.CharField(max_length=100)
     modelo = models.CharField(max_length=100, default='Sin modelo')
@@ -51,29 +584,106 @@ class Vehiculo(models.Model):
         related_name='vehiculos_registrados'
     )
     fecha_registro = models.DateTimeField(default=timezone.now)
+    # Último cambio de los datos (no de los contadores), para la sincronización
+    fecha_modificacion = models.DateTimeField(auto_now=True)
+    # Empresa del técnico al momento del registro; no cambia si el técnico se va a otra
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='vehiculos'
+    )
+
+    # Contadores de inspección (ver VehiculoQuerySet.ajustar_contadores)
+    puntos_buenos = models.PositiveIntegerField(default=0, editable=False)
+    puntos_observacion = models.PositiveIntegerField(default=0, editable=False)
+    puntos_revision = models.PositiveIntegerField(default=0, editable=False)
+    puntos_rechazados = models.PositiveIntegerField(default=0, editable=False)
+    sistemas_revisados = models.PositiveSmallIntegerField(default=0, editable=False)
+    ultima_inspeccion = models.DateTimeField(null=True, blank=True, editable=False)
+    tiene_rechazados = models.BooleanField(default=False, editable=False)
+
+    objects = VehiculoManager()
+
+    class Meta:
+        indexes = [
+            # Listado y gráfico de un técnico: WHERE usuario = ? ORDER BY fecha_registro DESC, id DESC.
+            # El id desempata el cursor de la paginación (vehiculos/paginacion.py)
+            models.Index(fields=['usuario', '-fecha_registro', '-id'], name='vehiculo_usuario_fecha_idx'),
+            # Listado completo y rangos de fechas
+            models.Index(fields=['-fecha_registro', '-id'], name='vehiculo_fecha_idx'),
+            # Listado y dashboard de jefes y gerentes: WHERE empresa = ? ORDER BY fecha_registro DESC, id DESC
+            models.Index(fields=['empresa', '-fecha_registro', '-id'], name='vehiculo_empresa_fecha_idx'),
+            # Buscador: prefijo de patente como rango (vehiculos/busqueda.py)
+            models.Index(fields=['patente_normalizada'], name='vehiculo_patente_norm_idx'),
+            # Cambios desde un cursor (vehiculos/sincronizacion.py)
+            models.Index(fields=['fecha_modificacion', 'id'], name='vehiculo_modificacion_idx'),
+            # Mantenimientos pendientes del dashboard: solo las filas con rechazos
+            models.Index(
+                fields=['usuario', 'fecha_registro'],
+                condition=models.Q(tiene_rechazados=True),
+                name='vehiculo_rechazados_idx',
+            ),
+        ]
 
     def save(self, *args, **kwargs):
+        self.patente_normalizada = normalizar_patente(self.patente)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            agregados = {'fecha_modificacion'}
+            if 'patente' in update_fields:
+                agregados.add('patente_normalizada')
+            kwargs['update_fields'] = {*update_fields, *agregados}
+        if self._state.adding and self.empresa_id is None and self.usuario_id:
+            self.empresa_id = (
+                PerfilUsuario.objects.filter(usuario_id=self.usuario_id)
+                .values_list('empresa_id', flat=True).first()
+            )
         if self.numero_orden is None:
-            last = Vehiculo.objects.order_by('-numero_orden').first()
-            self.numero_orden = (last.numero_orden + 1) if last else 1
-        super().save(*args, **kwargs)
+            # El número se toma en la misma transacción que el INSERT: si este
+            # falla, el contador vuelve atrás y no quedan huecos
+            with transaction.atomic():
+                self.numero_orden = ContadorOrden.reservar()[0]
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"#{self.numero_orden} - {self.marca} {self.modelo}"
 
+    # Compatibilidad: vehiculo.detalle_motor, vehiculo.detalle_frenos, ...
+    detalle_motor = _inspeccion('motor')
+    detalle_transmision = _inspeccion('transmision')
+    detalle_frenos = _inspeccion('frenos')
+    detalle_direccion_suspension = _inspeccion('direccion_suspension')
+    detalle_carroceria = _inspeccion('carroceria')
+    detalle_revision_general = _inspeccion('revision_general')
+    detalle_interior = _inspeccion('interior')
+
+    @cached_property
+    def resumen_inspeccion(self):
+        """Inspecciones y puntos del vehículo, cargados una sola vez por instancia.
+
+        Usa las inspecciones precargadas (reporte_queryset) si las hay; si no,
+        cuesta dos consultas. Se descarta con invalidar_resumen().
+        """
+        inspecciones = self.inspecciones.all()
+        if 'inspecciones' not in getattr(self, '_prefetched_objects_cache', {}):
+            inspecciones = inspecciones.prefetch_related('puntos')
+        return ResumenInspeccion(inspecciones)
+
+    def invalidar_resumen(self):
+        """Olvida el resumen y las inspecciones precargadas tras guardar puntos"""
+        self.__dict__.pop('resumen_inspeccion', None)
+        getattr(self, '_prefetched_objects_cache', {}).pop('inspecciones', None)
+
+    def get_inspeccion(self, sistema):
+        """Inspección del sistema o None"""
+        return self.resumen_inspeccion.inspecciones.get(sistema)
+
     def get_total_puntos(self):
-        total = 0
-        sistemas = [
-            'detalle_motor', 'detalle_transmision', 'detalle_frenos',
-            'detalle_direccion_suspension', 'detalle_carroceria',
-            'detalle_revision_general', 'detalle_interior'
-        ]
-        
-        for sistema in sistemas:
-            detalle = getattr(self, sistema, None)
-            if detalle and hasattr(detalle, 'puntos'):
-                total += detalle.puntos.count()
-        return total
+        return sum(getattr(self, campo) for campo in CONTADORES_ESTADO.values())
 
     def get_puntos_aprobados(self):
         return self._contar_puntos_por_estado('BUENO')
@@ -85,86 +695,34 @@ class Vehiculo(models.Model):
         return self._contar_puntos_por_estado('RECHAZADO')
 
     def _contar_puntos_por_estado(self, estado):
-        count = 0
-        sistemas = [
-            'detalle_motor', 'detalle_transmision', 'detalle_frenos',
-            'detalle_direccion_suspension', 'detalle_carroceria',
-            'detalle_revision_general', 'detalle_interior'
-        ]
-        
-        for sistema in sistemas:
-            detalle = getattr(self, sistema, None)
-            if detalle and hasattr(detalle, 'puntos'):
-                count += detalle.puntos.filter(estado=estado).count()
-        return count
+        return getattr(self, CONTADORES_ESTADO[estado])
 
     def get_sistemas(self):
-        sistemas_info = [
-            {'nombre': 'Motor', 'attr': 'detalle_motor', 'icono': 'gear'},
-            {'nombre': 'Transmisión', 'attr': 'detalle_transmision', 'icono': 'gear-wide-connected'},
-            {'nombre': 'Frenos', 'attr': 'detalle_frenos', 'icono': 'stop-circle'},
-            {'nombre': 'Dirección/Suspensión', 'attr': 'detalle_direccion_suspension', 'icono': 'sliders'},
-            {'nombre': 'Carrocería', 'attr': 'detalle_carroceria', 'icono': 'car-front'},
-            {'nombre': 'Revisión General', 'attr': 'detalle_revision_general', 'icono': 'clipboard-check'},
-            {'nombre': 'Interior', 'attr': 'detalle_interior', 'icono': 'cup-hot'}
-        ]
-        
+        resumen = self.resumen_inspeccion
         sistemas = []
-        for info in sistemas_info:
-            detalle = getattr(self, info['attr'], None)
-            if detalle:
+        for sistema, nombre, icono in SISTEMAS_INFO:
+            if sistema in resumen.inspecciones:
+                estado = resumen.estado_sistema(sistema)
                 sistemas.append({
-                    'nombre': info['nombre'],
-                    'estado': self._get_estado_general_sistema(detalle),
-                    'estado_color': self._get_color_estado_general(detalle),
-                    'icono': info['icono']
+                    'nombre': nombre,
+                    'estado': estado,
+                    'estado_color': COLORES_ESTADO_SISTEMA.get(estado, 'secondary'),
+                    'icono': icono
                 })
         return sistemas
 
     def get_sistemas_con_puntos(self):
-        sistemas_info = [
-            {'nombre': 'Motor', 'attr': 'detalle_motor', 'icono': 'gear'},
-            {'nombre': 'Transmisión', 'attr': 'detalle_transmision', 'icono': 'gear-wide-connected'},
-            {'nombre': 'Frenos', 'attr': 'detalle_frenos', 'icono': 'stop-circle'},
-            {'nombre': 'Dirección/Suspensión', 'attr': 'detalle_direccion_suspension', 'icono': 'sliders'},
-            {'nombre': 'Carrocería', 'attr': 'detalle_carroceria', 'icono': 'car-front'},
-            {'nombre': 'Revisión General', 'attr': 'detalle_revision_general', 'icono': 'clipboard-check'},
-            {'nombre': 'Interior', 'attr': 'detalle_interior', 'icono': 'cup-hot'}
-        ]
-        
+        resumen = self.resumen_inspeccion
         sistemas_con_puntos = []
-        for info in sistemas_info:
-            detalle = getattr(self, info['attr'], None)
-            if detalle and hasattr(detalle, 'puntos'):
+        for sistema, nombre, icono in SISTEMAS_INFO:
+            if sistema in resumen.inspecciones:
                 sistemas_con_puntos.append({
-                    'nombre': info['nombre'],
-                    'icono': info['icono'],
-                    'puntos': detalle.puntos.all()
+                    'nombre': nombre,
+                    'icono': icono,
+                    'puntos': resumen.puntos[sistema]
                 })
         return sistemas_con_puntos
 
-    def _get_estado_general_sistema(self, detalle):
-        if not hasattr(detalle, 'puntos'):
-            return 'No revisado'
-            
-        puntos = detalle.puntos.all()
-        if not puntos.exists():
-            return 'No revisado'
-        if all(p.estado == 'BUENO' for p in puntos):
-            return 'Aprobado'
-        if any(p.estado == 'RECHAZADO' for p in puntos):
-            return 'Rechazado'
-        return 'En revisión'
-
-    def _get_color_estado_general(self, detalle):
-        estado = self._get_estado_general_sistema(detalle)
-        return {
-            'Aprobado': 'success',
-            'En revisión': 'warning',
-            'Rechazado': 'danger',
-            'No revisado': 'secondary'
-        }.get(estado, 'secondary')
-
     @property
     def porcentaje_aprobacion(self):
         total = self.get_total_puntos()
@@ -173,9 +731,9 @@ class Vehiculo(models.Model):
         return (self.get_puntos_aprobados() / total) * 100
 
 
-class ImagenTexto(models.Model):
+class ImagenTexto(ImagenAlmacenadaMixin):
     nombre = models.CharField(max_length=100)
-    imagen_base64 = models.TextField()
+    imagen_base64 = models.TextField(blank=True, default='')
 
     def __str__(self):
         return self.nombre
@@ -184,8 +742,8 @@ class ImagenTexto(models.Model):
 # --------------------------------------------
 # Modelo Base Abstracto para Imágenes
 # --------------------------------------------
-class ImagenPuntoBase(models.Model):
-    imagen_base64 = models.TextField()
+class ImagenPuntoBase(ImagenAlmacenadaMixin):
+    imagen_base64 = models.TextField(blank=True, default='')
     fecha_subida = models.DateTimeField(auto_now_add=True)
     usuario = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -202,53 +760,222 @@ class ImagenPuntoBase(models.Model):
 
 
 # --------------------------------------------
-# Detalle Motor
+# Inspección unificada: una tabla para los siete sistemas
 # --------------------------------------------
-class DetalleMotor(models.Model):
-    vehiculo = models.OneToOneField(
+SISTEMAS = [
+    ('motor', 'Motor'),
+    ('transmision', 'Transmisión'),
+    ('frenos', 'Frenos'),
+    ('direccion_suspension', 'Dirección/Suspensión'),
+    ('carroceria', 'Carrocería'),
+    ('revision_general', 'Revisión General'),
+    ('interior', 'Interior'),
+]
+
+PUNTOS_POR_SISTEMA = {
+    'motor': [
+        ('ruidos', 'Presencia de ruidos anormales en motor'),
+        ('fugas', 'Fugas presentes en motor'),
+        ('respuesta', 'Respuesta del motor'),
+    ],
+    'transmision': [
+        ('paso_marchas', 'Paso de marchas'),
+        ('fugas_caja', 'Fugas presentes en caja'),
+        ('estado_embrague', 'Estado de embrague'),
+    ],
+    'frenos': [
+        ('frenado_correcto', 'Frenado correcto a distancia adecuada'),
+        ('sonidos_frenar', 'Sonidos al momento de frenar'),
+        ('olgura_freno_mano', 'Olgura de freno de mano'),
+    ],
+    'direccion_suspension': [
+        ('amortiguadores', 'Amortiguadores en buen estado'),
+        ('alineacion', 'Alineación'),
+        ('balanceo', 'Balanceo'),
+        ('ruidos_tren_delantero', 'Ruidos en tren delantero'),
+        ('ruidos_tren_trasero', 'Ruidos en tren trasero'),
+    ],
+    'carroceria': [
+        ('estado_pintura', 'Estado de pintura'),
+        ('abolladuras', 'Abolladuras o daños en carrocería'),
+        ('estado_vidrios', 'Estado de vidrios'),
+        ('alineacion_piezas', 'Alineación de piezas de carrocería'),
+    ],
+    'revision_general': [
+        ('estado_luces', 'Estado de luces'),
+        ('nivel_liquidos', 'Nivel de líquidos'),
+        ('kit_emergencia', 'Existencia de kit de emergencia'),
+        ('bateria_alternador', 'Estado de batería y alternador'),
+        ('presencia_dtc', 'Presencia de DTC'),
+        ('estado_ruedas', 'Estado de rueda y profundidad'),
+        ('rueda_repuesto', 'Rueda de repuesto'),
+    ],
+    'interior': [
+        ('estado_tapiz_butacas', 'Estado de tapiz y butacas'),
+        ('funcionamiento_radio', 'Funcionamiento de radio'),
+        ('desgaste_plasticos', 'Desgaste de plásticos'),
+        ('accesorios_electricos', 'Estado de accesorios eléctricos'),
+        ('estado_maleta', 'Estado de maleta'),
+    ],
+}
+
+NOMBRES_PUNTOS = [punto for puntos in PUNTOS_POR_SISTEMA.values() for punto in puntos]
+
+
+class Inspeccion(models.Model):
+    """Revisión de un sistema de un vehículo (antes DetalleMotor, DetalleFrenos, ...)"""
+    vehiculo = models.ForeignKey(
         Vehiculo,
         on_delete=models.CASCADE,
-        related_name='detalle_motor'
+        related_name='inspecciones'
     )
+    sistema = models.CharField(max_length=30, choices=SISTEMAS)
     usuario = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
-        related_name='detalle_motor_registrados'
+        related_name='inspecciones_registradas'
     )
     fecha_revision = models.DateTimeField(auto_now_add=True)
 
-    def __str__(self):
-        return f"Revisión motor de {self.vehiculo}"
+    class Meta:
+        unique_together = ('vehiculo', 'sistema')
+        verbose_name = 'Inspección'
+        verbose_name_plural = 'Inspecciones'
 
+    def save(self, *args, **kwargs):
+        # Los modelos proxy (DetalleMotor, ...) fijan su sistema al crearse
+        if not self.sistema:
+            self.sistema = getattr(self, 'SISTEMA', '')
+        nueva = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if nueva:
+                Vehiculo.objects.filter(pk=self.vehiculo_id).ajustar_contadores(
+                    sistemas=1, fecha=self.fecha_revision
+                )
+        # El vehículo en memoria ya no tiene al día sus inspecciones
+        if Inspeccion.vehiculo.is_cached(self):
+            self.vehiculo.invalidar_resumen()
+
+    def __str__(self):
+        return f"Revisión {self.get_sistema_display().lower()} de {self.vehiculo}"
 
-class PuntoMotor(models.Model):
-    NOMBRES_PUNTOS = [
-        ('ruidos', 'Presencia de ruidos anormales en motor'),
-        ('fugas', 'Fugas presentes en motor'),
-        ('respuesta', 'Respuesta del motor'),
-    ]
 
+class PuntoInspeccion(models.Model):
+    """Punto revisado dentro de una inspección; ``sistema`` se copia del detalle para filtrar sin join"""
     detalle = models.ForeignKey(
-        DetalleMotor,
+        Inspeccion,
         on_delete=models.CASCADE,
         related_name='puntos'
     )
-    nombre = models.CharField(max_length=20, choices=NOMBRES_PUNTOS)
-    estado = models.CharField(max_length=15, choices=ESTADOS, default='REVISION')  # Cambiado a 15
+    sistema = models.CharField(max_length=30, choices=SISTEMAS)
+    nombre = models.CharField(max_length=50, choices=NOMBRES_PUNTOS)
+    estado = models.CharField(max_length=15, choices=ESTADOS, default='REVISION')
     observacion = models.TextField(blank=True, null=True)
     usuario = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
-        related_name='puntos_motor_registrados'
+        related_name='puntos_registrados'
     )
     fecha_registro = models.DateTimeField(auto_now_add=True)
+    # Se renueva en cada escritura; no cuenta como cambio en cambios()
+    fecha_modificacion = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('detalle', 'nombre')
+        indexes = [
+            models.Index(fields=['estado', 'sistema'], name='punto_estado_sistema_idx'),
+            # Puntos rechazados por inspección (rebuild_vehicle_counters, reportes de fallas)
+            models.Index(
+                fields=['detalle'],
+                condition=models.Q(estado='RECHAZADO'),
+                name='punto_rechazado_idx',
+            ),
+            # Cambios desde un cursor (vehiculos/sincronizacion.py)
+            models.Index(fields=['fecha_modificacion', 'id'], name='punto_modificacion_idx'),
+        ]
+        verbose_name = 'Punto de inspección'
+        verbose_name_plural = 'Puntos de inspección'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia.marcar_guardado()
+        return instancia
+
+    def marcar_guardado(self):
+        """Toma los valores actuales como los guardados en la base (ver cambios())"""
+        self._valores_guardados = {
+            campo.attname: self.__dict__[campo.attname]
+            for campo in self._meta.concrete_fields
+            if not campo.primary_key and campo.attname in self.__dict__ and campo.attname != 'fecha_modificacion'
+        }
+
+    def cambios(self):
+        """{campo: (guardado, actual)} de los campos que difieren de la base.
+
+        None si la instancia no se leyó de la base (nueva o armada a mano).
+        """
+        guardados = getattr(self, '_valores_guardados', None)
+        if guardados is None:
+            return None
+        return {
+            campo: (valor, getattr(self, campo))
+            for campo, valor in guardados.items() if getattr(self, campo) != valor
+        }
+
+    def save(self, *args, **kwargs):
+        if not self.sistema:
+            self.sistema = getattr(self, 'SISTEMA', '') or self.detalle.sistema
+        nuevo = self._state.adding
+        cambios = None if nuevo else self.cambios()
+        if cambios is not None:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                pedidos = {self._meta.get_field(nombre).attname for nombre in update_fields}
+                cambios = {campo: valor for campo, valor in cambios.items() if campo in pedidos}
+            if not cambios:
+                # Reenvío sin cambios: no se reescribe la fila
+                return
+            kwargs['update_fields'] = [*cambios, 'fecha_modificacion']
+
+        if nuevo:
+            anterior = None
+        elif cambios and 'estado' in cambios:
+            anterior = cambios['estado'][0]
+        else:
+            anterior = self.estado
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if nuevo:
+                cambios = {
+                    campo.attname: (None, getattr(self, campo.attname))
+                    for campo in self._meta.concrete_fields if not campo.primary_key
+                }
+            if nuevo or anterior != self.estado:
+                Vehiculo.objects.filter(inspecciones=self.detalle_id).ajustar_contadores(
+                    estado_anterior=anterior, estado_nuevo=self.estado,
+                    fecha=self.fecha_registro if nuevo else None,
+                )
+            if cambios is None or 'observacion' in cambios:
+                self.indexar_observacion(reemplazar=not nuevo)
+            punto_modificado.send(sender=PuntoInspeccion, punto=self, cambios=cambios or {}, creado=nuevo)
+        if nuevo or cambios is None:
+            self.marcar_guardado()
+        else:
+            # Solo se escribió lo que cambió; lo que quedó fuera de update_fields sigue pendiente
+            self._valores_guardados.update({campo: actual for campo, (_, actual) in cambios.items()})
+
+    def indexar_observacion(self, reemplazar=True):
+        """Actualiza el índice invertido de respaldo con la observación actual.
+
+        En PostgreSQL no hace nada: el índice GIN lo mantiene la base.
+        """
+        TerminoObservacion.indexar([self], reemplazar=reemplazar)
 
     def __str__(self):
         return f"{self.get_nombre_display()} - {self.estado}"
@@ -260,409 +987,314 @@ class PuntoMotor(models.Model):
         return self.imagenes.count()
 
 
-class PuntoMotorImagen(ImagenPuntoBase):
+# Se envía dentro de la transacción, después de escribir un punto (save() o
+# inspecciones.guardar_puntos()), solo si algo cambió. Argumentos: ``punto``,
+# ``cambios`` ({attname: (antes, después)}, con antes=None al crearse) y
+# ``creado``; ``cambios`` queda vacío si la instancia no se leyó de la base y
+# no se sabe qué cambió. Un receptor que actualice algo fuera de la base
+# debería usar transaction.on_commit().
+punto_modificado = Signal()
+
+
+class TerminoObservacion(models.Model):
+    """Índice invertido de las observaciones para motores sin búsqueda de texto (ver busqueda.py)"""
+    termino = models.CharField(max_length=40)
+    punto = models.ForeignKey(
+        PuntoInspeccion,
+        on_delete=models.CASCADE,
+        related_name='terminos'
+    )
+    frecuencia = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('termino', 'punto')
+        verbose_name = 'Término de observación'
+        verbose_name_plural = 'Términos de observaciones'
+
+    def __str__(self):
+        return self.termino
+
+    @classmethod
+    def indexar(cls, puntos, reemplazar=True):
+        """Reescribe los términos de varios puntos con un DELETE y un INSERT"""
+        puntos = list(puntos)
+        if not puntos or usa_texto_completo(puntos[0]._state.db or 'default'):
+            return
+        if reemplazar:
+            cls.objects.filter(punto__in=puntos).delete()
+        cls.objects.bulk_create([
+            cls(punto=punto, termino=termino, frecuencia=n)
+            for punto in puntos
+            for termino, n in terminos(punto.observacion).items()
+        ])
+
+
+class ImagenPunto(ImagenPuntoBase):
     punto = models.ForeignKey(
-        PuntoMotor,
+        PuntoInspeccion,
         on_delete=models.CASCADE,
         related_name="imagenes"
     )
 
+    class Meta:
+        verbose_name = 'Imagen de punto'
+        verbose_name_plural = 'Imágenes de puntos'
+
     def __str__(self):
-        return f"Motor: {self.punto.get_nombre_display()}"
+        return f"{self.punto.get_sistema_display()}: {self.punto.get_nombre_display()}"
 
 
-# --------------------------------------------
-# Detalle Transmisión
-# --------------------------------------------
-class DetalleTransmision(models.Model):
-    vehiculo = models.OneToOneField(Vehiculo, on_delete=models.CASCADE, related_name='detalle_transmision')
-    usuario = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name='detalle_transmision_registrados'
-    )
-    fecha_revision = models.DateTimeField(auto_now_add=True)
+def descontar_inspeccion(sender, instance, origin=None, **kwargs):
+    """Al borrar puntos o inspecciones (también en cascada) se ajustan los contadores del vehículo.
 
-    def __str__(self):
-        return f'Revisión transmisión de {self.vehiculo}'
+    Si lo que se borra es el propio vehículo no hay contadores que ajustar.
+    """
+    if isinstance(origin, Vehiculo) or getattr(origin, 'model', None) is Vehiculo:
+        return
+    if isinstance(instance, PuntoInspeccion):
+        Vehiculo.objects.filter(inspecciones=instance.detalle_id).ajustar_contadores(
+            estado_anterior=instance.estado
+        )
+    elif isinstance(instance, Inspeccion):
+        Vehiculo.objects.filter(pk=instance.vehiculo_id).ajustar_contadores(sistemas=-1)
 
 
-class PuntoTransmision(models.Model):
-    NOMBRES_PUNTOS = [
-        ('paso_marchas', 'Paso de marchas'),
-        ('fugas_caja', 'Fugas presentes en caja'),
-        ('estado_embrague', 'Estado de embrague'),
-    ]
+# --------------------------------------------
+# Claves de idempotencia
+# --------------------------------------------
+class ClaveIdempotencia(models.Model):
+    """Operación ya aplicada, identificada por la clave que generó el cliente.
 
-    detalle = models.ForeignKey(DetalleTransmision, on_delete=models.CASCADE, related_name='puntos')
-    nombre = models.CharField(max_length=30, choices=NOMBRES_PUNTOS)
-    estado = models.CharField(max_length=15, choices=ESTADOS, default='REVISION')  # Cambiado a 15
-    observacion = models.TextField(blank=True, null=True)
+    Un reenvío con la misma clave (reintento tras un corte, doble toque)
+    recibe la respuesta guardada en vez de aplicarse otra vez.
+    """
     usuario = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name='puntos_transmision_registrados'
+        on_delete=models.CASCADE,
+        related_name='claves_idempotencia'
     )
-    fecha_registro = models.DateTimeField(auto_now_add=True)
+    # Dónde se usó la clave ('sincronizacion', ...); la misma clave puede repetirse en otro ámbito
+    ambito = models.CharField(max_length=30)
+    clave = models.CharField(max_length=64)
+    # Ruta de la petición que usó la clave: la misma clave en otra URL no repite esta respuesta
+    ruta = models.CharField(max_length=255, blank=True, default='')
+    # Vacía mientras la vista se ejecuta
+    respuesta = models.JSONField(default=dict)
+    fecha_creacion = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
-        unique_together = ('detalle', 'nombre')
+        unique_together = ('usuario', 'ambito', 'clave')
+        verbose_name = 'Clave de idempotencia'
+        verbose_name_plural = 'Claves de idempotencia'
 
     def __str__(self):
-        return f"{self.get_nombre_display()} - {self.estado}"
+        return f"{self.ambito}:{self.clave}"
 
-    def tiene_imagenes(self):
-        return self.imagenes.exists()
-    
-    def cantidad_imagenes(self):
-        return self.imagenes.count()
-
-
-class PuntoTransmisionImagen(ImagenPuntoBase):
-    punto = models.ForeignKey(
-        PuntoTransmision,
-        on_delete=models.CASCADE,
-        related_name="imagenes"
-    )
 
-    def __str__(self):
-        return f"Transmisión: {self.punto.get_nombre_display()}"
+# --------------------------------------------
+# Receptores de borrado
+# --------------------------------------------
+def conectar_senales():
+    """Conecta los receptores de post_delete solo a los modelos que les importan.
+
+    Un receptor sin sender haría que Django cargue en memoria las filas de
+    cualquier modelo antes de borrarlas (sin fast delete) para avisarle.
+    Se llama desde VehiculosConfig.ready(); los proxies envían la señal con su
+    propia clase, así que también se conectan.
+    """
+    from django.apps import apps
+    for modelo in apps.get_app_config('vehiculos').get_models():
+        if issubclass(modelo, ImagenAlmacenadaMixin):
+            post_delete.connect(liberar_imagen_compartida, sender=modelo)
+        if issubclass(modelo, (Inspeccion, PuntoInspeccion)):
+            post_delete.connect(descontar_inspeccion, sender=modelo)
 
 
 # --------------------------------------------
-# Detalle Frenos
+# Modelos por sistema (proxies de compatibilidad)
 # --------------------------------------------
-class DetalleFrenos(models.Model):
-    vehiculo = models.OneToOneField(Vehiculo, on_delete=models.CASCADE, related_name='detalle_frenos')
-    usuario = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name='detalle_frenos_registrados'
-    )
-    fecha_revision = models.DateTimeField(auto_now_add=True)
+# Mantienen los nombres que usan las vistas, el admin y las plantillas;
+# cada uno ve solo las filas de su sistema.
+class SistemaManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(sistema=self.model.SISTEMA)
 
-    def __str__(self):
-        return f'Revisión frenos de {self.vehiculo}'
 
+class ImagenSistemaManager(ImagenManager):
+    def get_queryset(self):
+        return super().get_queryset().filter(punto__sistema=self.model.SISTEMA)
 
-class PuntoFrenos(models.Model):
-    NOMBRES_PUNTOS = [
-        ('frenado_correcto', 'Frenado correcto a distancia adecuada'),
-        ('sonidos_frenar', 'Sonidos al momento de frenar'),
-        ('olgura_freno_mano', 'Olgura de freno de mano'),
-    ]
 
-    detalle = models.ForeignKey(DetalleFrenos, on_delete=models.CASCADE, related_name='puntos')
-    nombre = models.CharField(max_length=30, choices=NOMBRES_PUNTOS)
-    estado = models.CharField(max_length=15, choices=ESTADOS, default='REVISION')  # Cambiado a 15
-    observacion = models.TextField(blank=True, null=True)
-    usuario = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name='puntos_frenos_registrados'
-    )
-    fecha_registro = models.DateTimeField(auto_now_add=True)
+class DetalleMotor(Inspeccion):
+    SISTEMA = 'motor'
+    objects = SistemaManager()
 
     class Meta:
-        unique_together = ('detalle', 'nombre')
+        proxy = True
 
-    def __str__(self):
-        return f"{self.get_nombre_display()} - {self.estado}"
 
-    def tiene_imagenes(self):
-        return self.imagenes.exists()
-    
-    def cantidad_imagenes(self):
-        return self.imagenes.count()
+class PuntoMotor(PuntoInspeccion):
+    SISTEMA = 'motor'
+    NOMBRES_PUNTOS = PUNTOS_POR_SISTEMA['motor']
+    objects = SistemaManager()
 
+    class Meta:
+        proxy = True
 
-class PuntoFrenosImagen(ImagenPuntoBase):
-    punto = models.ForeignKey(
-        PuntoFrenos,
-        on_delete=models.CASCADE,
-        related_name="imagenes"
-    )
 
-    def __str__(self):
-        return f"Frenos: {self.punto.get_nombre_display()}"
+class PuntoMotorImagen(ImagenPunto):
+    SISTEMA = 'motor'
+    objects = ImagenSistemaManager()
 
+    class Meta:
+        proxy = True
 
-# --------------------------------------------
-# Detalle Dirección y Suspensión
-# --------------------------------------------
-class DetalleDireccionSuspension(models.Model):
-    vehiculo = models.OneToOneField(Vehiculo, on_delete=models.CASCADE, related_name='detalle_direccion_suspension')
-    usuario = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name='detalle_direccion_suspension_registrados'
-    )
-    fecha_revision = models.DateTimeField(auto_now_add=True)
 
-    def __str__(self):
-        return f"Revisión Dirección y Suspensión de {self.vehiculo}"
+class DetalleTransmision(Inspeccion):
+    SISTEMA = 'transmision'
+    objects = SistemaManager()
 
+    class Meta:
+        proxy = True
 
-class PuntoDireccionSuspension(models.Model):
-    NOMBRES_PUNTOS = [
-        ('amortiguadores', 'Amortiguadores en buen estado'),
-        ('alineacion', 'Alineación'),
-        ('balanceo', 'Balanceo'),
-        ('ruidos_tren_delantero', 'Ruidos en tren delantero'),
-        ('ruidos_tren_trasero', 'Ruidos en tren trasero'),
-    ]
 
-    detalle = models.ForeignKey(DetalleDireccionSuspension, on_delete=models.CASCADE, related_name='puntos')
-    nombre = models.CharField(max_length=50, choices=NOMBRES_PUNTOS)
-    estado = models.CharField(max_length=15, choices=ESTADOS, default='REVISION')  # Cambiado a 15
-    observacion = models.TextField(blank=True, null=True)
-    usuario = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name='puntos_direccion_suspension_registrados'
-    )
-    fecha_registro = models.DateTimeField(auto_now_add=True)
+class PuntoTransmision(PuntoInspeccion):
+    SISTEMA = 'transmision'
+    NOMBRES_PUNTOS = PUNTOS_POR_SISTEMA['transmision']
+    objects = SistemaManager()
 
     class Meta:
-        unique_together = ('detalle', 'nombre')
+        proxy = True
 
-    def __str__(self):
-        return f"{self.get_nombre_display()} - {self.estado}"
 
-    def tiene_imagenes(self):
-        return self.imagenes.exists()
-    
-    def cantidad_imagenes(self):
-        return self.imagenes.count()
+class PuntoTransmisionImagen(ImagenPunto):
+    SISTEMA = 'transmision'
+    objects = ImagenSistemaManager()
 
+    class Meta:
+        proxy = True
 
-class PuntoDireccionSuspensionImagen(ImagenPuntoBase):
-    punto = models.ForeignKey(
-        PuntoDireccionSuspension,
-        on_delete=models.CASCADE,
-        related_name="imagenes"
-    )
 
-    def __str__(self):
-        return f"Dirección/Suspensión: {self.punto.get_nombre_display()}"
+class DetalleFrenos(Inspeccion):
+    SISTEMA = 'frenos'
+    objects = SistemaManager()
 
+    class Meta:
+        proxy = True
 
-# --------------------------------------------
-# Detalle Carrocería
-# --------------------------------------------
-class DetalleCarroceria(models.Model):
-    vehiculo = models.OneToOneField(Vehiculo, on_delete=models.CASCADE, related_name='detalle_carroceria')
-    usuario = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name='detalle_carroceria_registrados'
-    )
-    fecha_revision = models.DateTimeField(auto_now_add=True)
 
-    def __str__(self):
-        return f"Revisión carrocería de {self.vehiculo}"
+class PuntoFrenos(PuntoInspeccion):
+    SISTEMA = 'frenos'
+    NOMBRES_PUNTOS = PUNTOS_POR_SISTEMA['frenos']
+    objects = SistemaManager()
 
+    class Meta:
+        proxy = True
 
-class PuntoCarroceria(models.Model):
-    NOMBRES_PUNTOS = [
-        ('estado_pintura', 'Estado de pintura'),
-        ('abolladuras', 'Abolladuras o daños en carrocería'),
-        ('estado_vidrios', 'Estado de vidrios'),
-        ('alineacion_piezas', 'Alineación de piezas de carrocería'),
-    ]
 
-    detalle = models.ForeignKey(DetalleCarroceria, on_delete=models.CASCADE, related_name='puntos')
-    nombre = models.CharField(max_length=50, choices=NOMBRES_PUNTOS)
-    estado = models.CharField(max_length=15, choices=ESTADOS, default='REVISION')  # Cambiado a 15
-    observacion = models.TextField(blank=True, null=True)
-    usuario = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name='puntos_carroceria_registrados'
-    )
-    fecha_registro = models.DateTimeField(auto_now_add=True)
+class PuntoFrenosImagen(ImagenPunto):
+    SISTEMA = 'frenos'
+    objects = ImagenSistemaManager()
 
     class Meta:
-        unique_together = ('detalle', 'nombre')
+        proxy = True
 
-    def __str__(self):
-        return f"{self.get_nombre_display()} - {self.estado}"
 
-    def tiene_imagenes(self):
-        return self.imagenes.exists()
-    
-    def cantidad_imagenes(self):
-        return self.imagenes.count()
+class DetalleDireccionSuspension(Inspeccion):
+    SISTEMA = 'direccion_suspension'
+    objects = SistemaManager()
 
+    class Meta:
+        proxy = True
 
-class PuntoCarroceriaImagen(ImagenPuntoBase):
-    punto = models.ForeignKey(
-        PuntoCarroceria,
-        on_delete=models.CASCADE,
-        related_name="imagenes"
-    )
 
-    def __str__(self):
-        return f"Carrocería: {self.punto.get_nombre_display()}"
+class PuntoDireccionSuspension(PuntoInspeccion):
+    SISTEMA = 'direccion_suspension'
+    NOMBRES_PUNTOS = PUNTOS_POR_SISTEMA['direccion_suspension']
+    objects = SistemaManager()
 
+    class Meta:
+        proxy = True
 
-# --------------------------------------------
-# Detalle Revisión General
-# --------------------------------------------
-class DetalleRevisionGeneral(models.Model):
-    vehiculo = models.OneToOneField(
-        Vehiculo, 
-        on_delete=models.CASCADE, 
-        related_name='detalle_revision_general'
-    )
-    usuario = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name='revisiones_generales_registradas'
-    )
-    fecha_revision = models.DateTimeField(auto_now_add=True)
 
-    def __str__(self):
-        return f"Revisión General de {self.vehiculo}"
+class PuntoDireccionSuspensionImagen(ImagenPunto):
+    SISTEMA = 'direccion_suspension'
+    objects = ImagenSistemaManager()
 
+    class Meta:
+        proxy = True
 
-class PuntoRevisionGeneral(models.Model):
-    NOMBRES_PUNTOS = [
-        ('estado_luces', 'Estado de luces'),
-        ('nivel_liquidos', 'Nivel de líquidos'),
-        ('kit_emergencia', 'Existencia de kit de emergencia'),
-        ('bateria_alternador', 'Estado de batería y alternador'),
-        ('presencia_dtc', 'Presencia de DTC'),
-        ('estado_ruedas', 'Estado de rueda y profundidad'),
-        ('rueda_repuesto', 'Rueda de repuesto'),
-    ]
 
-    detalle = models.ForeignKey(
-        DetalleRevisionGeneral, 
-        on_delete=models.CASCADE, 
-        related_name='puntos'
-    )
-    nombre = models.CharField(max_length=50, choices=NOMBRES_PUNTOS)
-    estado = models.CharField(max_length=15, choices=ESTADOS, default='REVISION')  # Cambiado a 15
-    observacion = models.TextField(blank=True, null=True)
-    usuario = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name='puntos_revision_general_registrados'
-    )
-    fecha_registro = models.DateTimeField(auto_now_add=True)
+class DetalleCarroceria(Inspeccion):
+    SISTEMA = 'carroceria'
+    objects = SistemaManager()
 
     class Meta:
-        unique_together = ('detalle', 'nombre')
+        proxy = True
 
-    def __str__(self):
-        return f"{self.get_nombre_display()} - {self.estado}"
 
-    def tiene_imagenes(self):
-        return self.imagenes.exists()
-    
-    def cantidad_imagenes(self):
-        return self.imagenes.count()
+class PuntoCarroceria(PuntoInspeccion):
+    SISTEMA = 'carroceria'
+    NOMBRES_PUNTOS = PUNTOS_POR_SISTEMA['carroceria']
+    objects = SistemaManager()
 
+    class Meta:
+        proxy = True
 
-class PuntoRevisionGeneralImagen(ImagenPuntoBase):
-    punto = models.ForeignKey(
-        PuntoRevisionGeneral,
-        on_delete=models.CASCADE,
-        related_name="imagenes"
-    )
 
-    def __str__(self):
-        return f"Revisión General: {self.punto.get_nombre_display()}"
+class PuntoCarroceriaImagen(ImagenPunto):
+    SISTEMA = 'carroceria'
+    objects = ImagenSistemaManager()
 
+    class Meta:
+        proxy = True
 
-# --------------------------------------------
-# Detalle Interior
-# --------------------------------------------
-class DetalleInterior(models.Model):
-    vehiculo = models.OneToOneField(
-        Vehiculo, 
-        on_delete=models.CASCADE, 
-        related_name='detalle_interior'
-    )
-    usuario = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name='detalles_interior_registrados'
-    )
-    fecha_revision = models.DateTimeField(auto_now_add=True)
 
-    def __str__(self):
-        return f"Revisión Interior de {self.vehiculo}"
+class DetalleRevisionGeneral(Inspeccion):
+    SISTEMA = 'revision_general'
+    objects = SistemaManager()
 
+    class Meta:
+        proxy = True
 
-class PuntoInterior(models.Model):
-    NOMBRES_PUNTOS = [
-        ('estado_tapiz_butacas', 'Estado de tapiz y butacas'),
-        ('funcionamiento_radio', 'Funcionamiento de radio'),
-        ('desgaste_plasticos', 'Desgaste de plásticos'),
-        ('accesorios_electricos', 'Estado de accesorios eléctricos'),
-        ('estado_maleta', 'Estado de maleta'),
-    ]
 
-    detalle = models.ForeignKey(
-        DetalleInterior, 
-        on_delete=models.CASCADE, 
-        related_name='puntos'
-    )
-    nombre = models.CharField(max_length=50, choices=NOMBRES_PUNTOS)
-    estado = models.CharField(max_length=15, choices=ESTADOS, default='REVISION')  # Cambiado a 15
-    observacion = models.TextField(blank=True, null=True)
-    usuario = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name='puntos_interior_registrados'
-    )
-    fecha_registro = models.DateTimeField(auto_now_add=True)
+class PuntoRevisionGeneral(PuntoInspeccion):
+    SISTEMA = 'revision_general'
+    NOMBRES_PUNTOS = PUNTOS_POR_SISTEMA['revision_general']
+    objects = SistemaManager()
 
     class Meta:
-        unique_together = ('detalle', 'nombre')
+        proxy = True
 
-    def __str__(self):
-        return f"{self.get_nombre_display()} - {self.estado}"
 
-    def tiene_imagenes(self):
-        return self.imagenes.exists()
-    
-    def cantidad_imagenes(self):
-        return self.imagenes.count()
+class PuntoRevisionGeneralImagen(ImagenPunto):
+    SISTEMA = 'revision_general'
+    objects = ImagenSistemaManager()
 
+    class Meta:
+        proxy = True
 
-class PuntoInteriorImagen(ImagenPuntoBase):
-    punto = models.ForeignKey(
-        PuntoInterior,
-        on_delete=models.CASCADE,
-        related_name="imagenes"
-    )
 
-    def __str__(self):
-        return f"Interior: {self.punto.get_nombre_display()}"
\ No newline at end of file
+class DetalleInterior(Inspeccion):
+    SISTEMA = 'interior'
+    objects = SistemaManager()
+
+    class Meta:
+        proxy = True
+
+
+class PuntoInterior(PuntoInspeccion):
+    SISTEMA = 'interior'
+    NOMBRES_PUNTOS = PUNTOS_POR_SISTEMA['interior']
+    objects = SistemaManager()
+
+    class Meta:
+        proxy = True
+
+
+class PuntoInteriorImagen(ImagenPunto):
+    SISTEMA = 'interior'
+    objects = ImagenSistemaManager()
+
+    class Meta:
+        proxy = True
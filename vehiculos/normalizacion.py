@@ -0,0 +1,112 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import imagenes
+from .models import (
+    AliasImagen, EstadisticaImagenes, ImagenCompartida, ImagenPunto, PerfilUsuario, PuntoInspeccion,
+    modelos_con_imagen,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# --------------------------------------------
+# Normalización de las fotos fuera de la petición
+# --------------------------------------------
+# La petición guarda la foto tal como llega y responde sin esperar. Al
+# confirmarse la transacción, un hilo de este proceso la pasa por el pool de
+# procesos (imagenes.normalizar_blob), que guarda el resultado con su propio
+# hash; después las filas que usaban la foto recibida pasan al hash nuevo y se
+# actualizan las estadísticas de la empresa.
+#
+# El contenido de un hash no cambia nunca, así que /imagen/<sha256>/ se sigue
+# cacheando como inmutable: una página ya abierta muestra la foto recibida y
+# las siguientes, la normalizada.
+#
+# Si el proceso termina antes, la foto queda como llegó hasta el próximo
+# manage.py normalizar_imagenes. Con PROCESOS=0 todo se hace en el mismo hilo.
+
+_hilos = None
+
+
+def get_hilos():
+    global _hilos
+    if _hilos is None:
+        procesos = imagenes.get_normalizacion()['PROCESOS']
+        _hilos = ThreadPoolExecutor(max_workers=max(procesos, 1), thread_name_prefix='normalizacion')
+    return _hilos
+
+
+def programar(usuario, infos):
+    """Cuenta las fotos recibidas y agenda la normalización de las recién guardadas.
+
+    Las que ya estaban en el almacén cuentan al momento; las nuevas, cuando
+    termina su normalización. Las referencias a fotos subidas antes (sin
+    ``tamano_original``) no cuentan otra vez.
+    """
+    infos = [info for info in infos if info and info.tamano_original is not None]
+    if not infos:
+        return
+    empresa_id = PerfilUsuario.objects.filter(usuario=usuario).values_list('empresa_id', flat=True).first()
+    EstadisticaImagenes.registrar(empresa_id, [info for info in infos if not info.nueva])
+    for info in infos:
+        if info.nueva:
+            transaction.on_commit(partial(agendar, info, empresa_id))
+
+
+def agendar(info, empresa_id):
+    if imagenes.get_normalizacion()['PROCESOS']:
+        get_hilos().submit(normalizar_en_segundo_plano, info, empresa_id)
+    else:
+        normalizar(info, empresa_id)
+
+
+def normalizar_en_segundo_plano(info, empresa_id):
+    try:
+        normalizar(info, empresa_id)
+    except Exception:
+        logger.exception("No se pudo normalizar la imagen %s", info.sha256)
+    finally:
+        # El hilo abrió sus propias conexiones; Django no las cierra fuera de una petición
+        connections.close_all()
+
+
+def normalizar(info, empresa_id):
+    """Normaliza la foto recibida y la suma a las estadísticas de la empresa"""
+    normalizada = imagenes.normalizar_blob(info.sha256)
+    if normalizada is not None:
+        reapuntar(info.sha256, normalizada)
+    EstadisticaImagenes.registrar(empresa_id, [normalizada or info])
+
+
+def reapuntar(sha256, info):
+    """Pasa las filas que usan el blob ``sha256`` al blob normalizado ``info``.
+
+    Las referencias se mueven con ellas y ``sha256`` queda como alias; su blob,
+    sin referencias, lo borra más tarde dedupe_images.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        AliasImagen.registrar(sha256, info.sha256)
+        # La sincronización manda las fotos con su punto: que el cliente vea el hash nuevo
+        puntos = list(ImagenPunto.objects.filter(imagen_sha256=sha256).values_list('punto_id', flat=True))
+        movidas = 0
+        for modelo in modelos_con_imagen():
+            cambios = {
+                'imagen_sha256': info.sha256,
+                'imagen_tamano': info.tamano,
+                'imagen_mime': info.mime,
+                'imagen_ancho': info.ancho,
+                'imagen_alto': info.alto,
+            }
+            if any(f.name == 'fecha_modificacion' for f in modelo._meta.fields):
+                cambios['fecha_modificacion'] = ahora
+            movidas += modelo.objects.filter(imagen_sha256=sha256).update(**cambios)
+        if puntos:
+            PuntoInspeccion.objects.filter(pk__in=puntos).update(fecha_modificacion=ahora)
+        if movidas:
+            ImagenCompartida.mover_referencias(sha256, info, movidas)
@@ -0,0 +1,143 @@
+import json
+
+from django.core import signing
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+# --------------------------------------------
+# Paginación por cursor (keyset)
+# --------------------------------------------
+# El listado se ordena por (fecha_registro, id) descendente y cada página
+# continúa desde la última fila de la anterior con un WHERE sobre esa clave,
+# en lugar de OFFSET. Así una página profunda cuesta lo mismo que la primera
+# y no hace falta un COUNT(*) exacto del listado filtrado.
+#
+# Los cursores son tokens firmados y opacos: contienen la clave de la fila
+# de borde, la dirección y el total estimado en la primera página, para no
+# volver a contar en cada paso.
+
+SAL_CURSOR = 'vehiculos.paginacion'
+# Hasta aquí se cuenta exacto; por encima se usa la estimación del planificador
+TOPE_CONTEO = 1000
+
+SIGUIENTE = 's'
+ANTERIOR = 'a'
+
+
+def estimar_total(queryset, tope=TOPE_CONTEO):
+    """Total de filas del queryset: (total, exacto).
+
+    Cuenta como mucho ``tope + 1`` filas. Si hay más, en PostgreSQL se toma
+    la estimación de EXPLAIN; en otros motores se devuelve ``tope`` como cota.
+    """
+    # Solo la clave: las columnas anotadas (image_meta_only) obligarían a leer
+    # cada fila de la tabla en vez de contar sobre un índice
+    queryset = queryset.order_by().values('pk')
+    total = queryset[:tope + 1].count()
+    if total <= tope:
+        return total, True
+
+    if connections[queryset.db].vendor == 'postgresql':
+        plan = json.loads(queryset.explain(format='json'))
+        return max(int(plan[0]['Plan']['Plan Rows']), total), False
+    return tope, False
+
+
+class PaginaCursor:
+    """Una página del listado con los cursores para moverse a las vecinas"""
+
+    def __init__(self, object_list, cursor_siguiente, cursor_anterior, total, total_exacto):
+        self.object_list = object_list
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+        self.total = total
+        self.total_exacto = total_exacto
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    @property
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+
+class PaginadorCursor:
+    """Pagina un queryset de Vehiculo por (fecha_registro, id) descendente.
+
+    Un cursor inválido o manipulado se trata como la primera página.
+    """
+
+    def __init__(self, queryset, por_pagina):
+        self.queryset = queryset
+        self.por_pagina = por_pagina
+
+    def codificar(self, fila, direccion, total, exacto):
+        return signing.dumps(
+            {'f': fila.fecha_registro.isoformat(), 'i': fila.pk, 'd': direccion, 't': total, 'e': exacto},
+            salt=SAL_CURSOR, compress=True,
+        )
+
+    def decodificar(self, cursor):
+        if not cursor:
+            return None
+        try:
+            datos = signing.loads(cursor, salt=SAL_CURSOR)
+            fecha = parse_datetime(datos['f'])
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            return None
+        if fecha is None or datos.get('d') not in (SIGUIENTE, ANTERIOR):
+            return None
+        return datos | {'f': fecha}
+
+    def pagina(self, cursor=None):
+        datos = self.decodificar(cursor)
+        if datos is None:
+            total, exacto = estimar_total(self.queryset)
+        else:
+            total, exacto = datos['t'], datos['e']
+        n = self.por_pagina
+
+        if datos is None:
+            filas = list(self.queryset.order_by('-fecha_registro', '-pk')[:n + 1])
+            hay_mas, hay_menos = len(filas) > n, False
+            filas = filas[:n]
+        elif datos['d'] == SIGUIENTE:
+            # Filas posteriores en el listado: más antiguas que el borde.
+            # El rango sobre fecha_registro deja que el índice acote la búsqueda.
+            filas = list(
+                self.queryset
+                .filter(Q(fecha_registro__lt=datos['f']) | Q(fecha_registro=datos['f'], pk__lt=datos['i']),
+                        fecha_registro__lte=datos['f'])
+                .order_by('-fecha_registro', '-pk')[:n + 1]
+            )
+            hay_mas, hay_menos = len(filas) > n, True
+            filas = filas[:n]
+        else:
+            # Hacia atrás se recorre el índice en sentido inverso y se da vuelta la página
+            filas = list(
+                self.queryset
+                .filter(Q(fecha_registro__gt=datos['f']) | Q(fecha_registro=datos['f'], pk__gt=datos['i']),
+                        fecha_registro__gte=datos['f'])
+                .order_by('fecha_registro', 'pk')[:n + 1]
+            )
+            hay_mas, hay_menos = True, len(filas) > n
+            filas = filas[:n][::-1]
+
+        siguiente = anterior = None
+        if filas and hay_mas:
+            siguiente = self.codificar(filas[-1], SIGUIENTE, total, exacto)
+        if filas and hay_menos:
+            anterior = self.codificar(filas[0], ANTERIOR, total, exacto)
+        return PaginaCursor(filas, siguiente, anterior, total, exacto)
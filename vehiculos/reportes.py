@@ -0,0 +1,112 @@
+from dataclasses import dataclass, field
+
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
+
+from .models import Vehiculo, Inspeccion, PuntoInspeccion, ImagenPunto
+
+
+# --------------------------------------------
+# Carga del reporte de un vehículo
+# --------------------------------------------
+# Todo el reporte se arma con un número fijo de consultas: el vehículo, sus
+# inspecciones, los puntos de todas ellas y los metadatos de sus imágenes
+# (Prefetch). Las plantillas reciben objetos ya cargados y no vuelven a
+# consultar la base de datos.
+
+# (atributo en Vehiculo, nombre, ícono, clave de puntos en el contexto, sistema)
+SISTEMAS = [
+    ('detalle_motor', 'Motor', 'gear', 'puntos_motor', 'motor'),
+    ('detalle_transmision', 'Transmisión', 'gear-wide-connected', 'puntos_transmision', 'transmision'),
+    ('detalle_frenos', 'Frenos', 'stop-circle', 'puntos_frenos', 'frenos'),
+    ('detalle_direccion_suspension', 'Dirección/Suspensión', 'sliders', 'puntos_direccion_suspension',
+     'direccion_suspension'),
+    ('detalle_carroceria', 'Carrocería', 'car-front', 'puntos_carroceria', 'carroceria'),
+    ('detalle_revision_general', 'Revisión General', 'clipboard-check', 'puntos_revision_general',
+     'revision_general'),
+    ('detalle_interior', 'Interior', 'cup-hot', 'puntos_interior', 'interior'),
+]
+
+# vehículo + inspecciones + puntos + imágenes, sin importar cuántos haya
+CONSULTAS_MAXIMAS = 4
+
+
+@dataclass
+class SistemaReporte:
+    attr: str
+    nombre: str
+    icono: str
+    detalle: object
+    puntos: list = field(default_factory=list)
+
+    @property
+    def puntos_por_nombre(self):
+        return {p.nombre: p for p in self.puntos}
+
+
+@dataclass
+class Reporte:
+    vehiculo: Vehiculo
+    sistemas: list
+
+    @property
+    def puntos(self):
+        return [p for sistema in self.sistemas for p in sistema.puntos]
+
+    @property
+    def sistemas_evaluados(self):
+        return [sistema for sistema in self.sistemas if sistema.detalle]
+
+    @property
+    def sistemas_con_puntos(self):
+        return [sistema for sistema in self.sistemas if sistema.puntos]
+
+    def contar(self, estado):
+        return sum(1 for p in self.puntos if p.estado == estado)
+
+    def contexto(self):
+        """Variables que espera ver_reporte.html"""
+        contexto = {
+            'vehiculo': self.vehiculo,
+            'reporte': self,
+            'sistemas': self.sistemas,
+            'sistemas_evaluados': self.sistemas_evaluados,
+            'sistemas_con_puntos': self.sistemas_con_puntos,
+            'total_puntos': len(self.puntos),
+            'puntos_buenos': self.contar('BUENO'),
+            'puntos_observacion': self.contar('OBSERVACION'),
+            'puntos_rechazados': self.contar('RECHAZADO'),
+        }
+        for sistema, (_, _, _, clave_puntos, _) in zip(self.sistemas, SISTEMAS):
+            contexto[sistema.attr] = sistema.detalle
+            contexto[clave_puntos] = sistema.puntos_por_nombre
+        return contexto
+
+
+def reporte_queryset(queryset=None):
+    """Vehículos con todo lo necesario para el reporte ya unido o precargado"""
+    queryset = queryset if queryset is not None else Vehiculo.objects.all()
+    puntos = PuntoInspeccion.objects.select_related('usuario').prefetch_related(
+        Prefetch('imagenes', queryset=ImagenPunto.objects.order_by('pk'))
+    )
+    inspecciones = Inspeccion.objects.select_related('usuario').prefetch_related(
+        Prefetch('puntos', queryset=puntos)
+    )
+    return queryset.image_meta_only().select_related('usuario').prefetch_related(
+        Prefetch('inspecciones', queryset=inspecciones)
+    )
+
+
+def armar_reporte(vehiculo):
+    """Arma el Reporte a partir de un vehículo cargado con reporte_queryset()"""
+    sistemas = []
+    for attr, nombre, icono, _, sistema in SISTEMAS:
+        detalle = vehiculo.get_inspeccion(sistema)
+        puntos = list(detalle.puntos.all()) if detalle else []
+        sistemas.append(SistemaReporte(attr=attr, nombre=nombre, icono=icono, detalle=detalle, puntos=puntos))
+    return Reporte(vehiculo=vehiculo, sistemas=sistemas)
+
+
+def cargar_reporte(vehiculo_id, queryset=None):
+    """Reporte completo de un vehículo (404 si no existe o no está en el queryset)"""
+    return armar_reporte(get_object_or_404(reporte_queryset(queryset), id=vehiculo_id))
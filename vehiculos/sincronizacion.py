@@ -0,0 +1,355 @@
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import imagenes
+from .inspecciones import DatosPunto, ErrorInspeccion, guardar_inspecciones, leer_inspeccion
+from .models import ClaveIdempotencia, ImagenCompartida, ImagenPunto, PerfilUsuario, PuntoInspeccion, Vehiculo
+
+
+# --------------------------------------------
+# Sincronización por lotes (captura sin conexión)
+# --------------------------------------------
+# La app del técnico guarda lo que captura sin señal y lo envía por lotes a
+# /sincronizar/:
+#
+#   {"operaciones": [
+#        {"clave": "<uuid>", "tipo": "vehiculo",
+#         "datos": {"patente": "...", "marca": "...", ..., "imagen": "<sha256>"}},
+#        {"clave": "<uuid>", "tipo": "puntos", "vehiculo": 15 | "<clave de un 'vehiculo'>",
+#         "sistemas": {...formato de inspecciones.leer_inspeccion()...}}],
+#    "imagenes": ["<sha256>", ...],
+#    "desde": "<cursor de la sincronización anterior>"}
+#
+# - Cada operación trae una clave generada por el cliente. Las aplicadas
+#   quedan en ClaveIdempotencia y un reenvío recibe la respuesta guardada
+#   (estado "repetida") sin escribir nada: un lote cortado se reintenta entero.
+# - Un vehículo creado sin conexión aún no tiene id; las operaciones de puntos
+#   lo nombran con la clave de su operación "vehiculo", de este lote o de uno anterior.
+# - Las fotos se suben aparte (/imagenes/subir/, reanudable por partes) y aquí
+#   solo viajan sus hashes. "imagenes" pregunta cuáles faltan en el almacén,
+#   para no volver a subir las que ya están.
+# - Las operaciones válidas se aplican juntas en una transacción: un
+#   bulk_create de vehículos y un solo guardado por lote de todos los puntos.
+#   Las inválidas vuelven con sus errores y no se registran, así el cliente
+#   puede corregirlas y reenviarlas con la misma clave.
+# - La respuesta trae los vehículos y puntos que cambiaron en el servidor desde
+#   "desde", y el cursor para la próxima vez. Solo se entregan filas con más de
+#   MARGEN_CAMBIOS de antigüedad, para no saltarse las de transacciones que aún
+#   no terminaban. Las eliminaciones no se informan.
+
+AMBITO = 'sincronizacion'
+SAL_CURSOR = 'vehiculos.sincronizacion'
+MAX_OPERACIONES = 100
+MAX_IMAGENES = 500
+LIMITE_CAMBIOS = 500
+MARGEN_CAMBIOS = timedelta(seconds=10)
+LARGO_CLAVE = 64
+
+VEHICULO = 'vehiculo'
+PUNTOS = 'puntos'
+
+CAMPOS_VEHICULO = ('patente', 'marca', 'modelo', 'color', 'tipo_bencina', 'numero_motor')
+
+
+class ErrorSincronizacion(Exception):
+    pass
+
+
+class ConflictoSincronizacion(ErrorSincronizacion):
+    """Otro envío con alguna de las mismas claves se aplicó al mismo tiempo"""
+
+
+@dataclass
+class Lote:
+    operaciones: list = field(default_factory=list)
+    imagenes: list = field(default_factory=list)
+    desde: str = None
+
+
+def leer_lote(cuerpo):
+    """Valida la forma general del lote; cada operación se valida al aplicarla"""
+    if not isinstance(cuerpo, dict):
+        raise ErrorSincronizacion("Se esperaba un objeto")
+    operaciones = cuerpo.get('operaciones', [])
+    hashes = cuerpo.get('imagenes', [])
+    desde = cuerpo.get('desde')
+    if not isinstance(operaciones, list):
+        raise ErrorSincronizacion("'operaciones' debe ser una lista")
+    if len(operaciones) > MAX_OPERACIONES:
+        raise ErrorSincronizacion(f"Como máximo {MAX_OPERACIONES} operaciones por lote")
+    if not isinstance(hashes, list) or not all(isinstance(h, str) and imagenes.es_sha256(h) for h in hashes):
+        raise ErrorSincronizacion("'imagenes' debe ser una lista de hashes SHA-256")
+    if len(hashes) > MAX_IMAGENES:
+        raise ErrorSincronizacion(f"Como máximo {MAX_IMAGENES} hashes por lote")
+    if desde is not None and not isinstance(desde, str):
+        raise ErrorSincronizacion("'desde' debe ser el cursor recibido")
+    return Lote(operaciones=operaciones, imagenes=hashes, desde=desde)
+
+
+def imagenes_faltantes(hashes):
+    """Hashes que el cliente todavía tiene que subir"""
+    vigentes = imagenes.hashes_vigentes(list(dict.fromkeys(hashes)))
+    return [sha256 for sha256, vigente in vigentes.items() if not imagenes.existe_imagen(vigente)]
+
+
+# --------------------------------------------
+# Aplicar operaciones
+# --------------------------------------------
+def leer_vehiculo(datos):
+    """Valida los datos de una operación "vehiculo"; devuelve (campos, InfoImagen)"""
+    if not isinstance(datos, dict):
+        raise ErrorInspeccion({'datos': "Se esperaba un objeto"})
+    errores = {}
+    campos = {}
+    for campo in CAMPOS_VEHICULO:
+        valor = datos.get(campo)
+        if valor is None:
+            continue
+        if not isinstance(valor, str):
+            errores[campo] = "Debe ser texto"
+        elif len(valor) > Vehiculo._meta.get_field(campo).max_length:
+            errores[campo] = "Demasiado largo"
+        else:
+            campos[campo] = valor
+    if not campos.get('marca', '').strip():
+        errores['marca'] = "Obligatorio"
+
+    sha256 = datos.get('imagen')
+    info = imagenes.info_imagen(sha256) if isinstance(sha256, str) else None
+    if info is None:
+        errores['imagen'] = "Imagen no subida" if sha256 else "Obligatoria"
+    if errores:
+        raise ErrorInspeccion(errores)
+    return campos, info
+
+
+def fusionar(destino, por_sistema):
+    """Suma a ``destino`` los puntos de otra operación; lo más reciente prevalece"""
+    for sistema, puntos in por_sistema.items():
+        for clave, dato in puntos.items():
+            anterior = destino.setdefault(sistema, {}).get(clave)
+            if anterior is None:
+                destino[sistema][clave] = DatosPunto(dato.estado, dato.observacion, list(dato.imagenes))
+                continue
+            if dato.estado:
+                anterior.estado = dato.estado
+            if dato.observacion is not None:
+                anterior.observacion = dato.observacion
+            anterior.imagenes.extend(dato.imagenes)
+
+
+def aplicar_operaciones(operaciones, usuario):
+    """Aplica el lote y devuelve un resultado por operación, en el mismo orden.
+
+    Cada resultado trae ``clave``, ``estado`` ("aplicada", "repetida" o
+    "error") y la respuesta de la operación o sus ``errores``.
+    """
+    resultados = [None] * len(operaciones)
+    claves = {}
+    for i, operacion in enumerate(operaciones):
+        clave = operacion.get('clave') if isinstance(operacion, dict) else None
+        if not isinstance(clave, str) or not 0 < len(clave) <= LARGO_CLAVE:
+            resultados[i] = {'clave': None, 'estado': 'error', 'error': "Falta la clave de la operación"}
+        elif operacion.get('tipo') not in (VEHICULO, PUNTOS):
+            resultados[i] = {'clave': clave, 'estado': 'error', 'error': "Tipo de operación desconocido"}
+        else:
+            claves.setdefault(clave, i)
+
+    referidas = {
+        operaciones[i]['vehiculo'] for i in claves.values()
+        if operaciones[i]['tipo'] == PUNTOS and isinstance(operaciones[i].get('vehiculo'), str)
+    }
+    registradas = {
+        registro.clave: registro.respuesta
+        for registro in ClaveIdempotencia.objects.filter(
+            usuario=usuario, ambito=AMBITO, clave__in=set(claves) | referidas,
+        )
+    }
+
+    # Validación, sin escribir nada todavía
+    vehiculos_nuevos = {}
+    puntos_nuevos = {}
+    for clave, i in claves.items():
+        operacion = operaciones[i]
+        if clave in registradas:
+            resultados[i] = {'clave': clave, 'estado': 'repetida', **registradas[clave]}
+            continue
+        try:
+            if operacion['tipo'] == VEHICULO:
+                vehiculos_nuevos[clave] = leer_vehiculo(operacion.get('datos'))
+            else:
+                puntos_nuevos[clave] = leer_inspeccion(operacion)
+        except ErrorInspeccion as e:
+            resultados[i] = {'clave': clave, 'estado': 'error', 'error': "La operación tiene errores", 'errores': e.errores}
+
+    # Vehículo de cada operación de puntos: un id, o la clave de una operación "vehiculo"
+    destinos = {}
+    ids = set()
+    for clave in list(puntos_nuevos):
+        referencia = operaciones[claves[clave]].get('vehiculo')
+        if isinstance(referencia, str) and referencia in registradas:
+            referencia = registradas[referencia].get('vehiculo')
+        if isinstance(referencia, int) and not isinstance(referencia, bool):
+            ids.add(referencia)
+        # Una lista u objeto no se puede buscar en el dict
+        elif not isinstance(referencia, str) or referencia not in vehiculos_nuevos:
+            del puntos_nuevos[clave]
+            resultados[claves[clave]] = {'clave': clave, 'estado': 'error', 'error': "Vehículo desconocido"}
+            continue
+        destinos[clave] = referencia
+    visibles = {v.pk: v for v in Vehiculo.objects.visible_to(usuario).filter(pk__in=ids).only('pk')} if ids else {}
+
+    try:
+        with transaction.atomic():
+            creados = crear_vehiculos(vehiculos_nuevos, usuario)
+            respuestas = {
+                clave: {'vehiculo': vehiculo.pk, 'numero_orden': vehiculo.numero_orden}
+                for clave, vehiculo in creados.items()
+            }
+
+            por_vehiculo = {}
+            for clave, por_sistema in puntos_nuevos.items():
+                referencia = destinos[clave]
+                vehiculo = creados.get(referencia) if isinstance(referencia, str) else visibles.get(referencia)
+                if vehiculo is None:
+                    resultados[claves[clave]] = {'clave': clave, 'estado': 'error', 'error': "Vehículo desconocido"}
+                    continue
+                destinos[clave] = vehiculo
+                fusionar(por_vehiculo.setdefault(vehiculo, {}), por_sistema)
+            guardados = guardar_inspecciones(por_vehiculo, usuario) if por_vehiculo else {}
+            for clave, por_sistema in puntos_nuevos.items():
+                if resultados[claves[clave]] is not None:
+                    continue
+                vehiculo = destinos[clave]
+                # Solo lo que guardar_inspecciones devolvió: un punto sin datos no se guarda
+                del_vehiculo = guardados.get(vehiculo.pk, {})
+                respuestas[clave] = {'vehiculo': vehiculo.pk, 'puntos': {
+                    sistema: {
+                        punto: del_vehiculo[sistema][punto].pk
+                        for punto in puntos if punto in del_vehiculo.get(sistema, {})
+                    }
+                    for sistema, puntos in por_sistema.items()
+                }}
+
+            ClaveIdempotencia.objects.bulk_create([
+                ClaveIdempotencia(usuario=usuario, ambito=AMBITO, clave=clave, respuesta=respuesta)
+                for clave, respuesta in respuestas.items()
+            ])
+    except IntegrityError:
+        raise ConflictoSincronizacion("Otro envío con las mismas operaciones se está aplicando; reintente")
+
+    for clave, respuesta in respuestas.items():
+        resultados[claves[clave]] = {'clave': clave, 'estado': 'aplicada', **respuesta}
+    # Una clave repetida dentro del mismo lote recibe el resultado de la primera
+    for i, operacion in enumerate(operaciones):
+        if resultados[i] is None:
+            primera = resultados[claves[operacion['clave']]]
+            resultados[i] = (primera | {'estado': 'repetida'}) if primera['estado'] != 'error' else primera
+    return resultados
+
+
+def crear_vehiculos(nuevos, usuario):
+    """Crea con un bulk_create los vehículos ``{clave: (campos, InfoImagen)}``"""
+    if not nuevos:
+        return {}
+    # Lo mismo que hace Vehiculo.save(), que bulk_create no llama
+    empresa_id = PerfilUsuario.objects.filter(usuario=usuario).values_list('empresa_id', flat=True).first()
+    creados = {}
+    for clave, (campos, info) in nuevos.items():
+        vehiculo = Vehiculo(usuario=usuario, empresa_id=empresa_id, **campos)
+        vehiculo.asignar_imagen(info)
+        creados[clave] = vehiculo
+    Vehiculo.objects.bulk_create(creados.values())
+    ImagenCompartida.sumar_referencias(creados.values())
+    return creados
+
+
+# --------------------------------------------
+# Cambios del servidor desde un cursor
+# --------------------------------------------
+def codificar_cursor(bordes):
+    return signing.dumps(
+        {tabla: [fecha.isoformat(), pk] if fecha else None for tabla, (fecha, pk) in bordes.items()},
+        salt=SAL_CURSOR,
+    )
+
+
+def decodificar_cursor(cursor):
+    """{'vehiculos': (fecha, id), 'puntos': (fecha, id)}; sin cursor (o inválido) desde el principio"""
+    bordes = {'vehiculos': (None, None), 'puntos': (None, None)}
+    if not cursor:
+        return bordes
+    try:
+        datos = signing.loads(cursor, salt=SAL_CURSOR)
+        for tabla in bordes:
+            if datos.get(tabla):
+                fecha, pk = datos[tabla]
+                if parse_datetime(fecha) is not None and isinstance(pk, int):
+                    bordes[tabla] = (parse_datetime(fecha), pk)
+    except (signing.BadSignature, AttributeError, TypeError, ValueError):
+        pass
+    return bordes
+
+
+def siguientes(queryset, borde, hasta, limite):
+    """Filas del queryset posteriores al borde (fecha_modificacion, id), a lo más ``limite``"""
+    queryset = queryset.filter(fecha_modificacion__lte=hasta)
+    fecha, pk = borde
+    if fecha:
+        queryset = queryset.filter(
+            Q(fecha_modificacion__gt=fecha) | Q(fecha_modificacion=fecha, pk__gt=pk),
+            fecha_modificacion__gte=fecha,
+        )
+    filas = list(queryset.order_by('fecha_modificacion', 'pk')[:limite + 1])
+    return filas[:limite], len(filas) > limite
+
+
+def cambios_desde(usuario, cursor=None, limite=LIMITE_CAMBIOS):
+    """Vehículos y puntos visibles para el usuario que cambiaron desde el cursor.
+
+    Si ``mas`` es verdadero quedan cambios: se piden de nuevo con el cursor devuelto.
+    """
+    bordes = decodificar_cursor(cursor)
+    hasta = timezone.now() - MARGEN_CAMBIOS
+    visibles = Vehiculo.objects.visible_to(usuario)
+
+    vehiculos, mas_vehiculos = siguientes(
+        visibles.values(
+            'id', 'numero_orden', *CAMPOS_VEHICULO, 'imagen_sha256', 'fecha_registro', 'fecha_modificacion',
+        ),
+        bordes['vehiculos'], hasta, limite,
+    )
+    puntos, mas_puntos = siguientes(
+        PuntoInspeccion.objects.filter(detalle__vehiculo__in=visibles).values(
+            'id', 'sistema', 'nombre', 'estado', 'observacion', 'fecha_modificacion',
+            vehiculo=F('detalle__vehiculo_id'),
+        ),
+        bordes['puntos'], hasta, limite,
+    )
+
+    fotos = {}
+    if puntos:
+        for punto_id, sha256 in (
+            ImagenPunto.objects.filter(punto__in=[p['id'] for p in puntos])
+            .exclude(imagen_sha256='').order_by('pk').values_list('punto_id', 'imagen_sha256')
+        ):
+            fotos.setdefault(punto_id, []).append(sha256)
+    for punto in puntos:
+        punto['imagenes'] = fotos.get(punto['id'], [])
+
+    if vehiculos:
+        bordes['vehiculos'] = (vehiculos[-1]['fecha_modificacion'], vehiculos[-1]['id'])
+    if puntos:
+        bordes['puntos'] = (puntos[-1]['fecha_modificacion'], puntos[-1]['id'])
+    return {
+        'vehiculos': vehiculos,
+        'puntos': puntos,
+        'cursor': codificar_cursor(bordes),
+        'mas': mas_vehiculos or mas_puntos,
+    }
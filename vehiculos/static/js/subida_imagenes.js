@@ -0,0 +1,140 @@
+// Subida binaria de imágenes al almacén.
+// Las imágenes pequeñas se envían juntas en un solo multipart; las grandes
+// se envían por partes y, si la conexión se corta, se reanuda desde el
+// último byte que el servidor confirmó.
+(function (global) {
+    const TAMANO_PARTE = 512 * 1024;
+    const LIMITE_LOTE = 4 * 1024 * 1024;
+    const MAX_REINTENTOS = 5;
+
+    function csrfToken() {
+        const input = document.querySelector('[name=csrfmiddlewaretoken]');
+        return input ? input.value : '';
+    }
+
+    function nuevoId() {
+        if (global.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        const b = crypto.getRandomValues(new Uint8Array(16));
+        b[6] = (b[6] & 0x0f) | 0x40;
+        b[8] = (b[8] & 0x3f) | 0x80;
+        const h = Array.from(b, x => x.toString(16).padStart(2, '0')).join('');
+        return `${h.slice(0, 8)}-${h.slice(8, 12)}-${h.slice(12, 16)}-${h.slice(16, 20)}-${h.slice(20)}`;
+    }
+
+    function esperar(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+
+    async function subirLote(url, blobs) {
+        const datos = new FormData();
+        blobs.forEach((blob, i) => datos.append('imagenes', blob, blob.name || `imagen_${i}.jpg`));
+        // Con la misma clave, un reintento cuya respuesta sí llegó al servidor
+        // recibe la respuesta guardada en vez de procesar las fotos otra vez
+        const clave = nuevoId();
+        let intentos = 0;
+
+        while (true) {
+            let resp;
+            try {
+                resp = await fetch(url, {
+                    method: 'POST',
+                    headers: { 'X-CSRFToken': csrfToken(), 'Idempotency-Key': clave },
+                    credentials: 'same-origin',
+                    body: datos
+                });
+            } catch (err) {
+                if (++intentos > MAX_REINTENTOS) {
+                    throw err;
+                }
+                await esperar(1000 * intentos);
+                continue;
+            }
+            const json = await resp.json();
+            if (!resp.ok || !json.success) {
+                throw new Error(json.error || 'Error al subir imágenes');
+            }
+            return json.imagenes;
+        }
+    }
+
+    async function subirPorPartes(url, blob) {
+        const urlSubida = `${url}${nuevoId()}/`;
+        let offset = 0;
+        let intentos = 0;
+
+        while (true) {
+            const fin = Math.min(offset + TAMANO_PARTE, blob.size);
+            try {
+                const resp = await fetch(urlSubida, {
+                    method: 'POST',
+                    headers: {
+                        'X-CSRFToken': csrfToken(),
+                        'Content-Type': 'application/octet-stream',
+                        'Content-Range': `bytes ${offset}-${fin - 1}/${blob.size}`
+                    },
+                    credentials: 'same-origin',
+                    body: blob.slice(offset, fin)
+                });
+                const json = await resp.json();
+                if (resp.status === 409) {
+                    // El servidor tiene otra cantidad de bytes: seguir desde ahí
+                    offset = json.offset;
+                    continue;
+                }
+                if (!resp.ok) {
+                    throw new Error(json.error || 'Error al subir imagen');
+                }
+                if (json.completa) {
+                    return json.imagen;
+                }
+                offset = json.offset;
+                intentos = 0;
+            } catch (err) {
+                if (++intentos > MAX_REINTENTOS) {
+                    throw err;
+                }
+                await esperar(1000 * intentos);
+                try {
+                    const estado = await fetch(urlSubida, { credentials: 'same-origin' }).then(r => r.json());
+                    offset = estado.offset;
+                } catch (e) {
+                    // Sin conexión todavía: se reintenta la misma parte
+                }
+            }
+        }
+    }
+
+    // Sube los blobs y devuelve sus metadatos ({sha256, tamano, ...}) en el mismo orden
+    async function subir(blobs, url) {
+        const resultados = new Array(blobs.length);
+        let lote = [];
+        let bytesLote = 0;
+
+        async function enviarLote() {
+            if (!lote.length) return;
+            const subidas = await subirLote(url, lote.map(item => item.blob));
+            subidas.forEach((info, i) => { resultados[lote[i].indice] = info; });
+            lote = [];
+            bytesLote = 0;
+        }
+
+        for (let i = 0; i < blobs.length; i++) {
+            const blob = blobs[i];
+            if (blob.size > LIMITE_LOTE) {
+                resultados[i] = await subirPorPartes(url, blob);
+                continue;
+            }
+            if (bytesLote + blob.size > LIMITE_LOTE) {
+                await enviarLote();
+            }
+            lote.push({ blob: blob, indice: i });
+            bytesLote += blob.size;
+        }
+        await enviarLote();
+        return resultados;
+    }
+
+    global.SubidaImagenes = { subir: subir };
+})(window);
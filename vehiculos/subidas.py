@@ -0,0 +1,129 @@
+import os
+import re
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files import File
+
+from . import imagenes
+
+
+# --------------------------------------------
+# Subidas por partes reanudables
+# --------------------------------------------
+# Cada subida se acumula en un archivo temporal identificado por usuario y
+# upload_id. El cliente envía partes con Content-Range y, si se corta, pregunta
+# cuántos bytes hay guardados para continuar desde ahí.
+
+TAMANO_MAXIMO = 25 * 1024 * 1024
+# Una subida sin partes nuevas en este tiempo se da por abandonada
+VIGENCIA_PARCIAL = 24 * 60 * 60
+RANGO_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class ErrorSubida(Exception):
+    pass
+
+
+class DesfaseSubida(ErrorSubida):
+    """La parte no empieza donde termina lo ya guardado"""
+    def __init__(self, offset):
+        super().__init__(f"Se esperaba offset {offset}")
+        self.offset = offset
+
+
+def get_tamano_maximo():
+    return getattr(settings, 'IMAGENES_TAMANO_MAXIMO', TAMANO_MAXIMO)
+
+
+def validar_tamano(archivos):
+    """ErrorSubida si algún archivo supera el tamaño máximo"""
+    for archivo in archivos:
+        if archivo.size > get_tamano_maximo():
+            raise ErrorSubida(f'"{archivo.name}" es demasiado grande')
+
+
+def directorio_parciales():
+    base = getattr(settings, 'FILE_UPLOAD_TEMP_DIR', None) or tempfile.gettempdir()
+    directorio = os.path.join(base, 'registrocheck_subidas')
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+
+def ruta_parcial(usuario_id, upload_id):
+    return os.path.join(directorio_parciales(), f"{usuario_id}_{upload_id}.part")
+
+
+def limpiar_parciales(vigencia=VIGENCIA_PARCIAL):
+    """Borra los .part sin modificar hace más de ``vigencia`` segundos; devuelve (archivos, bytes)"""
+    limite = time.time() - vigencia
+    archivos = liberados = 0
+    with os.scandir(directorio_parciales()) as entradas:
+        for entrada in entradas:
+            if not entrada.name.endswith('.part'):
+                continue
+            try:
+                estado = entrada.stat()
+                if estado.st_mtime < limite:
+                    os.remove(entrada.path)
+                    archivos += 1
+                    liberados += estado.st_size
+            except FileNotFoundError:
+                # Terminó o se limpió al mismo tiempo
+                pass
+    return archivos, liberados
+
+
+def offset_actual(usuario_id, upload_id):
+    try:
+        return os.path.getsize(ruta_parcial(usuario_id, upload_id))
+    except FileNotFoundError:
+        return 0
+
+
+def parsear_rango(cabecera):
+    """Devuelve (inicio, fin, total) de un Content-Range 'bytes a-b/total'"""
+    match = RANGO_RE.match(cabecera or '')
+    if not match:
+        raise ErrorSubida("Content-Range inválido")
+    inicio, fin, total = (int(g) for g in match.groups())
+    if fin < inicio or fin >= total:
+        raise ErrorSubida("Content-Range inválido")
+    if total > get_tamano_maximo():
+        raise ErrorSubida("La imagen supera el tamaño máximo permitido")
+    return inicio, fin, total
+
+
+def agregar_parte(usuario_id, upload_id, inicio, fin, flujo):
+    """Escribe la parte al final del archivo parcial leyendo el flujo por bloques"""
+    ruta = ruta_parcial(usuario_id, upload_id)
+    actual = offset_actual(usuario_id, upload_id)
+    if inicio != actual:
+        raise DesfaseSubida(actual)
+    if inicio == 0:
+        # Al empezar una subida se barren las abandonadas
+        limpiar_parciales()
+
+    restante = fin - inicio + 1
+    with open(ruta, 'ab') as destino:
+        while restante > 0:
+            bloque = flujo.read(min(64 * 1024, restante))
+            if not bloque:
+                break
+            destino.write(bloque)
+            restante -= len(bloque)
+        return destino.tell()
+
+
+def finalizar(usuario_id, upload_id):
+    """Pasa el archivo completo al almacén de imágenes y borra el temporal"""
+    ruta = ruta_parcial(usuario_id, upload_id)
+    try:
+        with open(ruta, 'rb') as archivo:
+            mime, _, _ = imagenes.analizar_archivo(archivo)
+            if not mime.startswith('image/'):
+                raise ErrorSubida("El archivo no es una imagen válida")
+            return imagenes.guardar_archivo(File(archivo))
+    finally:
+        os.remove(ruta)
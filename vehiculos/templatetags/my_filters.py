@@ -1,4 +1,7 @@
 from django import template
+from django.utils.html import format_html
+
+from vehiculos import idempotencia
 
 register = template.Library()
 
@@ -32,4 +35,20 @@ def percentage(value, total):
     try:
         return (float(value) / float(total)) * 100
     except (ValueError, ZeroDivisionError):
-        return 0
\ No newline at end of file
+        return 0
+
+@register.filter
+def imagen_url(obj, variante='full'):
+    """Uso: {{ vehiculo|imagen_url:'thumb' }}"""
+    try:
+        return obj.get_imagen_url(variante)
+    except AttributeError:
+        return ''
+
+@register.simple_tag
+def campo_idempotencia():
+    """Uso: {% campo_idempotencia %} dentro del <form>; ver vehiculos/idempotencia.py"""
+    return format_html(
+        '<input type="hidden" name="{}" value="{}">',
+        idempotencia.CAMPO_FORMULARIO, idempotencia.nueva_clave()
+    )
@@ -1,3 +1,666 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import re
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection, connections, transaction
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import redirect
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import idempotencia, imagenes, inspecciones, normalizacion, reportes, sincronizacion
+from .management.commands.rebuild_vehicle_counters import CAMPOS as CAMPOS_CONTADORES, calcular_contadores
+from .models import (
+    ESTADOS, SISTEMAS, PUNTOS_POR_SISTEMA, AliasImagen, ClaveIdempotencia, ContadorOrden, Empresa,
+    ImagenCompartida, ImagenPunto, Inspeccion, PerfilUsuario, PuntoInspeccion, Vehiculo, punto_modificado,
+)
+
+
+def crear_inspeccion(vehiculo, sistemas, puntos_por_sistema=None, imagenes_por_punto=0):
+    """Inspecciona ``sistemas`` del vehículo con sus primeros puntos y fotos falsas"""
+    for sistema in sistemas:
+        detalle = Inspeccion.objects.create(vehiculo=vehiculo, sistema=sistema, usuario=vehiculo.usuario)
+        for clave, _ in PUNTOS_POR_SISTEMA[sistema][:puntos_por_sistema]:
+            punto = PuntoInspeccion.objects.create(
+                detalle=detalle, nombre=clave, estado='BUENO', usuario=vehiculo.usuario,
+            )
+            for i in range(imagenes_por_punto):
+                ImagenPunto.objects.create(punto=punto, imagen_sha256=f"{punto.pk:032x}{i:032x}")
+
+
+# --------------------------------------------
+# Reporte del vehículo (vehiculos/reportes.py)
+# --------------------------------------------
+# Sin el manifiesto de collectstatic, que no existe al correr las pruebas
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ReporteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('tecnico')
+
+    def assertConsultasReporte(self, vehiculo):
+        """Carga y dibuja el reporte completo dentro del presupuesto de consultas"""
+        with self.assertNumQueries(reportes.CONSULTAS_MAXIMAS):
+            reporte = reportes.cargar_reporte(vehiculo.pk)
+            html = render_to_string('vehiculos/ver_reporte.html', reporte.contexto())
+            for punto in reporte.puntos:
+                for imagen in punto.imagenes.all():
+                    imagen.get_imagen_url('thumb')
+        return reporte, html
+
+    def test_consultas_no_dependen_de_puntos_ni_imagenes(self):
+        casos = [
+            (['motor'], 1, 0),
+            (['motor', 'frenos'], None, 1),
+            ([sistema for sistema, _ in SISTEMAS], None, 3),
+        ]
+        for sistemas, puntos, imagenes in casos:
+            with self.subTest(sistemas=len(sistemas), puntos=puntos, imagenes=imagenes):
+                vehiculo = Vehiculo.objects.create(marca='Kia', usuario=self.usuario)
+                crear_inspeccion(vehiculo, sistemas, puntos, imagenes)
+                reporte, _ = self.assertConsultasReporte(vehiculo)
+                self.assertEqual(len(reporte.sistemas_evaluados), len(sistemas))
+                self.assertEqual(
+                    sum(len(punto.imagenes.all()) for punto in reporte.puntos),
+                    PuntoInspeccion.objects.filter(detalle__vehiculo=vehiculo).count() * imagenes,
+                )
+
+
+# --------------------------------------------
+# numero_orden con ingresos simultáneos (ContadorOrden)
+# --------------------------------------------
+class IngresoAbortado(Exception):
+    pass
+
+
+class NumeroOrdenConcurrenteTests(TransactionTestCase):
+    HILOS = 8
+    VEHICULOS_POR_HILO = 250
+    # Cada hilo intercala importaciones en bloque con bulk_create
+    BLOQUES_POR_HILO = 2
+    TAMANO_BLOQUE = 25
+
+    def ingresar(self, usuario_id, errores):
+        # Con la empresa indicada save() no lee el perfil. En SQLite esa lectura,
+        # dentro de la transacción del ingreso abortado y antes del UPDATE del
+        # contador, choca con los otros hilos ("database is locked")
+        datos = {'usuario_id': usuario_id, 'empresa_id': self.empresa.pk}
+        try:
+            for i in range(self.VEHICULOS_POR_HILO):
+                if i % (self.VEHICULOS_POR_HILO // self.BLOQUES_POR_HILO) == 0:
+                    Vehiculo.objects.bulk_create([
+                        Vehiculo(marca='Importado', **datos) for _ in range(self.TAMANO_BLOQUE)
+                    ])
+                if i == self.VEHICULOS_POR_HILO // 2:
+                    # Un ingreso que falla después de tomar su número no deja hueco
+                    try:
+                        with transaction.atomic():
+                            Vehiculo.objects.create(marca='Abortado', **datos)
+                            raise IngresoAbortado
+                    except IngresoAbortado:
+                        pass
+                Vehiculo.objects.create(marca='Kia', **datos)
+        except Exception as e:
+            errores.append(e)
+        finally:
+            connections.close_all()
+
+    def test_hilos_sin_repetidos_ni_huecos(self):
+        usuario = User.objects.create_user('tecnico')
+        self.empresa = Empresa.objects.create(nombre='Taller')
+        errores = []
+        hilos = [
+            threading.Thread(target=self.ingresar, args=(usuario.pk, errores))
+            for _ in range(self.HILOS)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        esperados = self.HILOS * (self.VEHICULOS_POR_HILO + self.BLOQUES_POR_HILO * self.TAMANO_BLOQUE)
+        numeros = sorted(Vehiculo.objects.values_list('numero_orden', flat=True))
+        self.assertEqual(numeros, list(range(1, esperados + 1)))
+        self.assertFalse(Vehiculo.objects.filter(marca='Abortado').exists())
+        self.assertEqual(ContadorOrden.objects.get(nombre='vehiculo').valor, esperados)
+
+
+# --------------------------------------------
+# Planes de las consultas del dashboard y el listado (índices de Vehiculo.Meta)
+# --------------------------------------------
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class PlanesConsultasTests(TestCase):
+    VEHICULOS_POR_USUARIO = 200
+    # Recorrido de la tabla completa. "SCAN ... USING INDEX" recorre un índice en
+    # orden (el listado completo con LIMIT, el conteo total de un superusuario) y se admite
+    RECORRIDO_COMPLETO = {
+        'sqlite': re.compile(r'SCAN vehiculos_vehiculo(?! USING)'),
+        'postgresql': re.compile(r'Seq Scan on vehiculos_vehiculo'),
+    }
+    # Un filtro por fecha_registro tiene que acotar la búsqueda en el índice, no
+    # revisarse fila por fila (lo que pasa con __date)
+    RANGO_EN_INDICE = {
+        'sqlite': re.compile(r'SEARCH vehiculos_vehiculo USING .*\(.*fecha_registro[<>]'),
+        'postgresql': re.compile(r'Index Cond: .*fecha_registro [<>]'),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre='Taller')
+        cls.tecnico = User.objects.create_user('tecnico')
+        cls.jefe = User.objects.create_user('jefe')
+        cls.admin = User.objects.create_superuser('admin')
+        PerfilUsuario.objects.create(usuario=cls.tecnico, empresa=cls.empresa, cargo='TECNICO')
+        PerfilUsuario.objects.create(usuario=cls.jefe, empresa=cls.empresa, cargo='JEFE')
+
+        ahora = timezone.now()
+        for usuario in (cls.tecnico, cls.jefe):
+            Vehiculo.objects.bulk_create([
+                Vehiculo(marca='Kia', usuario=usuario, empresa=cls.empresa, tiene_rechazados=i % 10 == 0)
+                for i in range(cls.VEHICULOS_POR_USUARIO)
+            ])
+        # Un registro cada 6 horas hacia atrás, para que haya rangos de fechas que filtrar
+        for i, pk in enumerate(Vehiculo.objects.order_by('pk').values_list('pk', flat=True)):
+            Vehiculo.objects.filter(pk=pk).update(fecha_registro=ahora - timedelta(hours=6 * i))
+
+    def planes(self, consultas):
+        """(sql, plan) de cada consulta a vehiculos_vehiculo capturada"""
+        planes = []
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Con tan pocas filas Postgres preferiría el Seq Scan aunque el índice sirva
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            explain = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+            for consulta in consultas:
+                sql = consulta['sql']
+                if sql.startswith('SELECT') and 'FROM "vehiculos_vehiculo"' in sql:
+                    cursor.execute(explain + sql)
+                    planes.append((sql, '\n'.join(str(fila[-1]) for fila in cursor.fetchall())))
+        return planes
+
+    def assertUsaIndices(self, usuario, ruta, parametros=None):
+        """Pide la página y revisa el plan de cada consulta a vehiculos_vehiculo"""
+        self.client.force_login(usuario)
+        with CaptureQueriesContext(connection) as capturadas:
+            respuesta = self.client.get(ruta, parametros, HTTP_HOST='localhost')
+        self.assertEqual(respuesta.status_code, 200)
+        planes = self.planes(capturadas.captured_queries)
+        self.assertTrue(planes)
+        for sql, plan in planes:
+            with self.subTest(usuario=usuario.username, ruta=ruta, parametros=parametros, sql=sql):
+                self.assertIsNone(self.RECORRIDO_COMPLETO[connection.vendor].search(plan), plan)
+                filtro = sql.partition(' WHERE ')[2].partition(' ORDER BY ')[0]
+                if 'fecha_registro' in filtro:
+                    self.assertRegex(plan, self.RANGO_EN_INDICE[connection.vendor])
+        return respuesta
+
+    def test_index_y_listado_usan_indices(self):
+        hoy = timezone.localdate()
+        rango = {'fecha_desde': str(hoy - timedelta(days=20)), 'fecha_hasta': str(hoy - timedelta(days=10))}
+        for usuario in (self.tecnico, self.jefe, self.admin):
+            # Gráfico de 7 días, revisiones de hoy y mantenimientos pendientes (tiene_rechazados)
+            self.assertUsaIndices(usuario, reverse('index'))
+            for parametros in ({}, rango):
+                respuesta = self.assertUsaIndices(usuario, reverse('listar_vehiculos'), parametros)
+                # Página siguiente: el WHERE del cursor sobre (fecha_registro, id)
+                cursor = respuesta.context['page_obj'].cursor_siguiente
+                self.assertIsNotNone(cursor)
+                self.assertUsaIndices(usuario, reverse('listar_vehiculos'), {**parametros, 'cursor': cursor})
+
+
+# --------------------------------------------
+# Normalización en segundo plano (vehiculos/normalizacion.py)
+# --------------------------------------------
+def foto_jpeg(lado, color='red'):
+    salida = io.BytesIO()
+    Image.new('RGB', (lado, lado * 2 // 3), color).save(salida, 'JPEG', quality=98)
+    return salida.getvalue()
+
+
+class AlmacenTemporalMixin:
+    """Blobs en un directorio temporal y normalización en el mismo hilo"""
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(
+            IMAGENES_STORAGE={
+                'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                'OPTIONS': {'location': directorio},
+            },
+            IMAGENES_NORMALIZACION={'PROCESOS': 0},
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        imagenes.get_storage.cache_clear()
+        self.addCleanup(imagenes.get_storage.cache_clear)
+
+
+class NormalizacionTests(AlmacenTemporalMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user('tecnico')
+        self.datos = foto_jpeg(3000)
+        self.recibido = hashlib.sha256(self.datos).hexdigest()
+
+    def agregar_vehiculo(self):
+        info = imagenes.guardar_imagen(self.datos)
+        vehiculo = Vehiculo(marca='Kia', usuario=self.usuario)
+        vehiculo.asignar_imagen(info)
+        with self.captureOnCommitCallbacks(execute=True):
+            vehiculo.save()
+            normalizacion.programar(self.usuario, [info])
+        vehiculo.refresh_from_db()
+        return vehiculo
+
+    def test_normalizada_con_su_propio_hash(self):
+        vehiculo = self.agregar_vehiculo()
+        normalizado = vehiculo.imagen_sha256
+        self.assertNotEqual(normalizado, self.recibido)
+        # El contenido de cada hash no cambia: ambos blobs coinciden con su nombre
+        for sha256 in (self.recibido, normalizado):
+            with imagenes.abrir_imagen(sha256) as archivo:
+                self.assertEqual(hashlib.sha256(archivo.read()).hexdigest(), sha256)
+        self.assertEqual(vehiculo.imagen_ancho, imagenes.get_normalizacion()['LADO_MAXIMO'])
+        self.assertEqual(ImagenCompartida.objects.get(sha256=self.recibido).referencias, 0)
+        self.assertEqual(ImagenCompartida.objects.get(sha256=normalizado).referencias, 1)
+        self.assertEqual(AliasImagen.objects.get(sha256_recibido=self.recibido).sha256, normalizado)
+
+        # Los mismos bytes, subidos otra vez o referidos por su hash, llevan al normalizado
+        self.assertEqual(imagenes.guardar_imagen(self.datos).sha256, normalizado)
+        self.assertEqual(imagenes.info_imagen(self.recibido).sha256, normalizado)
+
+    def test_hash_recibido_redirige_cuando_se_borra(self):
+        normalizado = self.agregar_vehiculo().imagen_sha256
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('ver_imagen', args=[self.recibido]), HTTP_HOST='localhost')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['ETag'], f'"{self.recibido}-full"')
+
+        # dedupe_images borra el blob recibido, que quedó sin referencias
+        imagenes.get_storage().delete(imagenes.ruta_blob(self.recibido))
+        for nombre, variante in (('ver_imagen', ()), ('ver_imagen_variante', ('thumb',))):
+            respuesta = self.client.get(reverse(nombre, args=[self.recibido, *variante]), HTTP_HOST='localhost')
+            self.assertRedirects(
+                respuesta, reverse(nombre, args=[normalizado, *variante]), fetch_redirect_response=False,
+            )
+
+
+# --------------------------------------------
+# Claves de idempotencia (vehiculos/idempotencia.py)
+# --------------------------------------------
+class VistaFalsa:
+    """Vista que cuenta sus ejecuciones y devuelve la respuesta indicada"""
+
+    def __init__(self, respuesta):
+        self.respuesta = respuesta
+        self.llamadas = 0
+
+    def __call__(self, request):
+        self.llamadas += 1
+        if isinstance(self.respuesta, Exception):
+            raise self.respuesta
+        return self.respuesta()
+
+
+class IdempotenciaTests(TestCase):
+    AMBITO = 'prueba'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('tecnico')
+
+    def enviar(self, vista, ruta='/vehiculo/agregar/', clave='clave-1'):
+        request = RequestFactory().post(ruta, HTTP_IDEMPOTENCY_KEY=clave)
+        request.user = self.usuario
+        return idempotencia.idempotente(self.AMBITO)(vista)(request)
+
+    def test_reenvio_repite_la_respuesta_guardada(self):
+        casos = [
+            ('redireccion', lambda: redirect('/vehiculo/7/reporte/')),
+            ('json', lambda: JsonResponse({'success': True, 'id': 7}, status=201)),
+        ]
+        for nombre, respuesta in casos:
+            with self.subTest(nombre):
+                vista = VistaFalsa(respuesta)
+                primera = self.enviar(vista, clave=nombre)
+                repetida = self.enviar(vista, clave=nombre)
+                self.assertEqual(vista.llamadas, 1)
+                self.assertFalse(primera.has_header('Idempotent-Replayed'))
+                self.assertEqual(repetida['Idempotent-Replayed'], 'true')
+                self.assertEqual(repetida.status_code, primera.status_code)
+                self.assertEqual(repetida.get('Location'), primera.get('Location'))
+                self.assertEqual(repetida.content, primera.content)
+
+    def test_misma_clave_en_otra_ruta(self):
+        vista = VistaFalsa(lambda: redirect('/vehiculo/7/reporte/'))
+        self.enviar(vista, ruta='/vehiculo/7/inspeccion/')
+        respuesta = self.enviar(vista, ruta='/vehiculo/8/inspeccion/')
+        self.assertEqual(respuesta.status_code, 422)
+        self.assertEqual(vista.llamadas, 1)
+
+    def test_clave_en_curso_y_abandonada(self):
+        clave = ClaveIdempotencia.objects.create(
+            usuario=self.usuario, ambito=self.AMBITO, clave='clave-1', ruta='/vehiculo/agregar/',
+        )
+        vista = VistaFalsa(lambda: redirect('/vehiculo/7/reporte/'))
+        self.assertEqual(self.enviar(vista).status_code, 409)
+        self.assertEqual(vista.llamadas, 0)
+
+        # La vista que la reservó no terminó (se reinició el proceso): un reenvío la retoma
+        ClaveIdempotencia.objects.filter(pk=clave.pk).update(
+            fecha_creacion=timezone.now() - idempotencia.EN_CURSO - timedelta(seconds=1),
+        )
+        self.assertEqual(self.enviar(vista).status_code, 302)
+        self.assertEqual(vista.llamadas, 1)
+        clave.refresh_from_db()
+        self.assertEqual(clave.respuesta['ubicacion'], '/vehiculo/7/reporte/')
+
+    def test_respuesta_no_guardable_libera_la_clave(self):
+        casos = [
+            ('formulario', lambda: HttpResponse('formulario con errores')),
+            ('error', lambda: JsonResponse({'success': False}, status=400)),
+            ('excepcion', ValueError('falla')),
+        ]
+        for nombre, respuesta in casos:
+            with self.subTest(nombre):
+                vista = VistaFalsa(respuesta)
+                for _ in range(2):
+                    if isinstance(respuesta, Exception):
+                        with self.assertRaises(ValueError):
+                            self.enviar(vista, clave=nombre)
+                    else:
+                        self.enviar(vista, clave=nombre)
+                self.assertEqual(vista.llamadas, 2)
+                self.assertFalse(ClaveIdempotencia.objects.filter(clave=nombre).exists())
+
+
+# --------------------------------------------
+# Sincronización por lotes (vehiculos/sincronizacion.py)
+# --------------------------------------------
+class SincronizacionTests(AlmacenTemporalMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user('tecnico')
+        PerfilUsuario.objects.create(usuario=self.usuario, empresa=Empresa.objects.create(nombre='Taller'), cargo='TECNICO')
+        self.foto = imagenes.guardar_imagen(foto_jpeg(300)).sha256
+        self.claves = [clave for clave, _ in PUNTOS_POR_SISTEMA['motor'][:2]]
+
+    def puntos(self, vehiculo, clave='p1', **punto):
+        datos = punto or {'estado': 'BUENO'}
+        return {'clave': clave, 'tipo': 'puntos', 'vehiculo': vehiculo, 'sistemas': {'motor': {self.claves[0]: datos}}}
+
+    def lote(self):
+        return [
+            {'clave': 'v1', 'tipo': 'vehiculo', 'datos': {'patente': 'AB1234', 'marca': 'Kia', 'imagen': self.foto}},
+            {'clave': 'p1', 'tipo': 'puntos', 'vehiculo': 'v1', 'sistemas': {'motor': {
+                self.claves[0]: {'estado': 'RECHAZADO', 'imagenes': [self.foto]},
+                self.claves[1]: {'estado': 'BUENO', 'observacion': 'Sin fugas'},
+            }}},
+        ]
+
+    def filas(self):
+        return Vehiculo.objects.count(), PuntoInspeccion.objects.count(), ImagenPunto.objects.count()
+
+    def test_reenvio_del_lote_no_crea_filas(self):
+        aplicado = sincronizacion.aplicar_operaciones(self.lote(), self.usuario)
+        self.assertEqual([r['estado'] for r in aplicado], ['aplicada', 'aplicada'])
+        filas = self.filas()
+        self.assertEqual(filas, (1, 2, 1))
+        vehiculo = Vehiculo.objects.get()
+
+        repetido = sincronizacion.aplicar_operaciones(self.lote(), self.usuario)
+        self.assertEqual([r['estado'] for r in repetido], ['repetida', 'repetida'])
+        self.assertEqual(self.filas(), filas)
+        for antes, despues in zip(aplicado, repetido):
+            self.assertEqual({**antes, 'estado': 'repetida'}, despues)
+        self.assertEqual(repetido[0]['numero_orden'], vehiculo.numero_orden)
+        vehiculo.refresh_from_db()
+        self.assertEqual((vehiculo.puntos_rechazados, vehiculo.puntos_buenos), (1, 1))
+
+        # Un lote posterior nombra al vehículo por la clave con que se creó
+        posterior = sincronizacion.aplicar_operaciones([self.puntos('v1', clave='p2')], self.usuario)
+        self.assertEqual(posterior[0]['estado'], 'aplicada')
+        self.assertEqual(posterior[0]['vehiculo'], vehiculo.pk)
+        self.assertEqual(self.filas(), filas)
+
+    def test_referencias_invalidas_no_abortan_el_lote(self):
+        existente = Vehiculo.objects.create(marca='Kia', usuario=self.usuario)
+        operaciones = [
+            self.puntos([existente.pk], clave='lista'),
+            self.puntos({'id': existente.pk}, clave='objeto'),
+            self.puntos('no-existe', clave='sin-crear'),
+            # Vehículo inválido: no se crea, y los puntos que lo nombran tampoco
+            {'clave': 'v-mal', 'tipo': 'vehiculo', 'datos': {'marca': 'Kia', 'imagen': '0' * 64}},
+            self.puntos('v-mal', clave='de-v-mal'),
+            # Punto sin datos: guardar_lote no lo guardaría
+            {'clave': 'vacio', 'tipo': 'puntos', 'vehiculo': existente.pk, 'sistemas': {'motor': {self.claves[0]: {}}}},
+            self.puntos(existente.pk, clave='valida'),
+        ]
+        resultados = sincronizacion.aplicar_operaciones(operaciones, self.usuario)
+        estados = {r['clave']: r['estado'] for r in resultados}
+        self.assertEqual(estados, {
+            'lista': 'error', 'objeto': 'error', 'sin-crear': 'error', 'v-mal': 'error',
+            'de-v-mal': 'error', 'vacio': 'error', 'valida': 'aplicada',
+        })
+        self.assertEqual(resultados[-1]['puntos'], {
+            'motor': {self.claves[0]: PuntoInspeccion.objects.get(detalle__vehiculo=existente).pk},
+        })
+        self.assertEqual(self.filas(), (1, 1, 0))
+        # Las operaciones con error no quedan registradas: se pueden corregir y reenviar
+        self.assertEqual(
+            set(ClaveIdempotencia.objects.values_list('clave', flat=True)), {'valida'},
+        )
+
+
+# --------------------------------------------
+# Reenvío de un formulario de detalle sin cambios (PuntoInspeccion.cambios)
+# --------------------------------------------
+ESCRITURA = re.compile(r'^(INSERT INTO|UPDATE|DELETE FROM) "vehiculos_')
+
+
+class ReenvioDetalleTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('tecnico')
+        self.vehiculo = Vehiculo.objects.create(marca='Kia', usuario=self.usuario)
+        self.claves = [clave for clave, _ in PUNTOS_POR_SISTEMA['motor']]
+        self.formulario = {}
+        for clave in self.claves:
+            self.formulario[f'estado_{clave}'] = 'BUENO'
+            self.formulario[f'observaciones_{clave}'] = f'Revisado {clave}'
+        self.client.force_login(self.usuario)
+        self.enviar()
+
+        self.eventos = []
+        receptor = lambda sender, cambios, **kwargs: self.eventos.append(cambios)
+        punto_modificado.connect(receptor)
+        self.addCleanup(punto_modificado.disconnect, receptor)
+
+    def enviar(self):
+        respuesta = self.client.post(
+            reverse('detalle_motor', args=[self.vehiculo.pk]), self.formulario, HTTP_HOST='localhost',
+        )
+        self.assertRedirects(
+            respuesta, reverse('ver_reporte_vehiculo', args=[self.vehiculo.pk]), fetch_redirect_response=False,
+        )
+
+    def test_reenvio_sin_cambios_no_escribe(self):
+        with CaptureQueriesContext(connection) as capturadas:
+            self.enviar()
+        self.assertEqual([q['sql'] for q in capturadas if ESCRITURA.match(q['sql'])], [])
+        self.assertEqual(self.eventos, [])
+
+        # En guardar_puntos: solo el bloqueo de la inspección y la lectura de los puntos
+        detalle = Inspeccion.objects.get(vehiculo=self.vehiculo, sistema='motor')
+        datos = {
+            clave: inspecciones.DatosPunto(estado='BUENO', observacion=f'Revisado {clave}')
+            for clave in self.claves
+        }
+        # (más SAVEPOINT y RELEASE, porque la prueba ya corre dentro de una transacción)
+        with self.assertNumQueries(2 + 2):
+            inspecciones.guardar_puntos(detalle, datos, self.usuario)
+        self.assertEqual(self.eventos, [])
+
+    def test_cambio_de_un_campo_escribe_solo_ese_campo(self):
+        punto = PuntoInspeccion.objects.get(detalle__vehiculo=self.vehiculo, nombre=self.claves[0])
+        punto.observacion = 'Fuga leve'
+        with CaptureQueriesContext(connection) as capturadas:
+            punto.save()
+        actualizaciones = [q['sql'] for q in capturadas if q['sql'].startswith('UPDATE "vehiculos_puntoinspeccion"')]
+        self.assertEqual(len(actualizaciones), 1)
+        asignados = re.findall(r'"(\w+)" = ', actualizaciones[0].partition(' SET ')[2].partition(' WHERE ')[0])
+        self.assertEqual(asignados, ['observacion', 'fecha_modificacion'])
+        self.assertEqual(self.eventos, [{'observacion': (f'Revisado {self.claves[0]}', 'Fuga leve')}])
+
+        # Sin cambios en los campos pedidos no se escribe nada
+        punto.estado = 'RECHAZADO'
+        with self.assertNumQueries(0):
+            punto.save(update_fields=['observacion'])
+        self.assertEqual(len(self.eventos), 1)
+
+
+# --------------------------------------------
+# Validación de la inspección en JSON (inspecciones.leer_inspeccion)
+# --------------------------------------------
+class LeerInspeccionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('tecnico')
+        PerfilUsuario.objects.create(usuario=cls.usuario, cargo='TECNICO')
+        cls.vehiculo = Vehiculo.objects.create(marca='Kia', usuario=cls.usuario)
+        cls.punto = PUNTOS_POR_SISTEMA['motor'][0][0]
+
+    def enviar(self, cuerpo):
+        self.client.force_login(self.usuario)
+        return self.client.post(
+            reverse('guardar_inspeccion', args=[self.vehiculo.pk]), json.dumps(cuerpo),
+            content_type='application/json', HTTP_HOST='localhost',
+        )
+
+    def test_cuerpos_invalidos_responden_400(self):
+        punto = self.punto
+        casos = [
+            ({}, 'sistemas'),
+            ({'sistemas': []}, 'sistemas'),
+            ({'sistemas': {}}, 'sistemas'),
+            ({'sistemas': {'nave': {punto: {'estado': 'BUENO'}}}}, 'nave'),
+            ({'sistemas': {'motor': ['ruidos']}}, 'motor'),
+            ({'sistemas': {'motor': {'inexistente': {'estado': 'BUENO'}}}}, 'motor.inexistente'),
+            ({'sistemas': {'motor': {punto: 'BUENO'}}}, f'motor.{punto}'),
+            # Un punto vacío crearía la inspección del sistema sin guardar nada
+            ({'sistemas': {'motor': {punto: {}}}}, f'motor.{punto}'),
+            ({'sistemas': {'motor': {punto: {'imagenes': []}}}}, f'motor.{punto}'),
+            # Estados que no son texto no se pueden buscar en el set de estados
+            ({'sistemas': {'motor': {punto: {'estado': ['BUENO']}}}}, f'motor.{punto}.estado'),
+            ({'sistemas': {'motor': {punto: {'estado': {'BUENO': 1}}}}}, f'motor.{punto}.estado'),
+            ({'sistemas': {'motor': {punto: {'estado': 1}}}}, f'motor.{punto}.estado'),
+            ({'sistemas': {'motor': {punto: {'estado': 'EXCELENTE'}}}}, f'motor.{punto}.estado'),
+            ({'sistemas': {'motor': {punto: {'observacion': 5}}}}, f'motor.{punto}.observacion'),
+            ({'sistemas': {'motor': {punto: {'imagenes': 'abc'}}}}, f'motor.{punto}.imagenes'),
+            ({'sistemas': {'motor': {punto: {'imagenes': ['0' * 64]}}}}, f'motor.{punto}.imagenes'),
+        ]
+        for cuerpo, ruta in casos:
+            with self.subTest(cuerpo=cuerpo):
+                respuesta = self.enviar(cuerpo)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertFalse(respuesta.json()['success'])
+                self.assertIn(ruta, respuesta.json()['errores'])
+        self.assertFalse(Inspeccion.objects.exists())
+
+    def test_errores_de_varios_puntos_juntos(self):
+        respuesta = self.enviar({'sistemas': {
+            'motor': {self.punto: {'estado': None}, 'inexistente': {'estado': 'BUENO'}},
+            'nave': {},
+        }})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(set(respuesta.json()['errores']), {f'motor.{self.punto}', 'motor.inexistente', 'nave'})
+
+    def test_cuerpo_valido(self):
+        respuesta = self.enviar({'sistemas': {'motor': {self.punto: {'estado': 'BUENO', 'observacion': ''}}}})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['sistemas']['motor'][self.punto]['estado'], 'BUENO')
+
+
+# --------------------------------------------
+# Guardado por lote de los puntos (inspecciones.guardar_lote)
+# --------------------------------------------
+class GuardarLoteTests(AlmacenTemporalMixin, TestCase):
+    # El sistema con más puntos: la diferencia con un punto solo es la mayor posible
+    SISTEMA = max(PUNTOS_POR_SISTEMA, key=lambda sistema: len(PUNTOS_POR_SISTEMA[sistema]))
+
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user('tecnico')
+        self.foto = imagenes.guardar_imagen(foto_jpeg(300))
+        self.claves = [clave for clave, _ in PUNTOS_POR_SISTEMA[self.SISTEMA]]
+
+    def guardar(self, vehiculo, estados):
+        """Guarda ``{clave: estado}`` con una foto por punto; devuelve (consultas, guardados)"""
+        detalle, _ = Inspeccion.objects.get_or_create(
+            vehiculo=vehiculo, sistema=self.SISTEMA, defaults={'usuario': self.usuario},
+        )
+        datos = {
+            clave: inspecciones.DatosPunto(estado=estado, observacion=f'Quedó {estado}', imagenes=[self.foto])
+            for clave, estado in estados.items()
+        }
+        with CaptureQueriesContext(connection) as capturadas:
+            guardados = inspecciones.guardar_puntos(detalle, datos, self.usuario)
+        return len(capturadas), guardados
+
+    def assertContadoresAlDia(self, vehiculo):
+        vehiculo.refresh_from_db()
+        reales = calcular_contadores([vehiculo.pk])[vehiculo.pk]
+        self.assertEqual({campo: getattr(vehiculo, campo) for campo in CAMPOS_CONTADORES}, reales)
+
+    def test_consultas_no_dependen_de_los_puntos(self):
+        uno = Vehiculo.objects.create(marca='Kia', usuario=self.usuario)
+        todos = Vehiculo.objects.create(marca='Kia', usuario=self.usuario)
+        for estado in ('BUENO', 'RECHAZADO'):
+            with self.subTest(estado=estado):
+                consultas_uno, _ = self.guardar(uno, {self.claves[0]: estado})
+                consultas_todos, guardados = self.guardar(todos, dict.fromkeys(self.claves, estado))
+                self.assertEqual(consultas_todos, consultas_uno)
+                self.assertEqual(len(guardados), len(self.claves))
+        self.assertEqual(PuntoInspeccion.objects.filter(detalle__vehiculo=todos).count(), len(self.claves))
+        self.assertEqual(ImagenPunto.objects.filter(punto__detalle__vehiculo=todos).count(), len(self.claves))
+
+    def test_actualizar_mantiene_numero_orden_y_contadores(self):
+        vehiculo = Vehiculo.objects.create(marca='Kia', usuario=self.usuario)
+        numero_orden = vehiculo.numero_orden
+        contador = ContadorOrden.objects.get(nombre='vehiculo').valor
+
+        _, creados = self.guardar(vehiculo, dict.fromkeys(self.claves, 'BUENO'))
+        self.assertContadoresAlDia(vehiculo)
+        ciclo = [estado for estado, _ in ESTADOS]
+        envios = [
+            {clave: ciclo[i % len(ciclo)] for i, clave in enumerate(self.claves)},
+            {clave: ciclo[(i + 1) % len(ciclo)] for i, clave in enumerate(self.claves)},
+            # Reenvío idéntico: no cambia nada
+            {clave: ciclo[(i + 1) % len(ciclo)] for i, clave in enumerate(self.claves)},
+        ]
+        for estados in envios:
+            _, guardados = self.guardar(vehiculo, estados)
+            # El upsert actualiza las filas existentes: mismos ids, ninguna nueva
+            self.assertEqual(
+                {clave: punto.pk for clave, punto in guardados.items()},
+                {clave: punto.pk for clave, punto in creados.items()},
+            )
+            self.assertEqual(
+                dict(PuntoInspeccion.objects.filter(detalle__vehiculo=vehiculo).values_list('nombre', 'estado')),
+                estados,
+            )
+            self.assertContadoresAlDia(vehiculo)
+        self.assertEqual(vehiculo.numero_orden, numero_orden)
+        self.assertEqual(ContadorOrden.objects.get(nombre='vehiculo').valor, contador)
@@ -1,4 +1,4 @@
-from django.urls import path
+from django.urls import path, re_path
 from django.contrib.auth import views as auth_views
 from . import views
 
@@ -9,8 +9,12 @@ urlpatterns = [
     
     path('vehiculo/agregar/', views.agregar_vehiculo, name='agregar_vehiculo'),
     path('vehiculos/', views.listar_vehiculos, name='listar_vehiculos'),
+    path('vehiculos/autocompletar/', views.autocompletar_vehiculos, name='autocompletar_vehiculos'),
+    path('vehiculos/observaciones/', views.buscar_observaciones, name='buscar_observaciones'),
+    path('vehiculos/exportar-fotos/', views.exportar_fotos, name='exportar_fotos'),
     path('vehiculo/<int:id>/detalle-motor/', views.agregar_detalle_motor, name='detalle_motor'),
 
+    path('vehiculo/<int:id>/inspeccion/', views.guardar_inspeccion, name='guardar_inspeccion'),
     path('vehiculo/<int:id>/reporte/', views.ver_reporte_vehiculo, name='ver_reporte_vehiculo'),
     path('vehiculo/<int:id>/detalle_transmision/', views.agregar_detalle_transmision, name='detalle_transmision'),
     path('vehiculo/<int:id>/detalle-frenos/', views.agregar_detalle_frenos, name='agregar_detalle_frenos'),
@@ -21,4 +25,12 @@ urlpatterns = [
     path('vehiculo/<int:id>/detalle_interior/', views.agregar_detalle_interior, name='detalle_interior'),
 
     path('send-pdf-email/', views.send_pdf_email, name='send_pdf_email'),
+    path('sincronizar/', views.sincronizar, name='sincronizar'),
+
+    path('imagenes/subir/', views.subir_imagenes, name='subir_imagenes'),
+    path('imagenes/subir/<uuid:upload_id>/', views.subir_imagen_por_partes, name='subir_imagen_por_partes'),
+    re_path(r'^imagen/(?P<sha256>[0-9a-f]{64})/$', views.ver_imagen, name='ver_imagen'),
+    re_path(r'^imagen/(?P<sha256>[0-9a-f]{64})/(?P<variante>[a-z]+)/$', views.ver_imagen, name='ver_imagen_variante'),
+    path('imagen/<str:modelo>/<int:id>/', views.ver_imagen_fila, name='ver_imagen_fila'),
+    path('imagen/<str:modelo>/<int:id>/<str:variante>/', views.ver_imagen_fila, name='ver_imagen_fila_variante'),
 ]
@@ -1,22 +1,35 @@
+import json
+from dataclasses import asdict
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.utils.dateparse import parse_date
 from django.contrib import messages
 from django.db.models.functions import TruncDate
-from django.db.models import Count, Q
+from django.db.models import Count
+from django.apps import apps
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http import (
+    FileResponse, HttpResponse, HttpResponseNotModified, Http404, JsonResponse, StreamingHttpResponse
+)
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.utils import timezone
 
 from .models import (
-    Vehiculo, DetalleMotor, PuntoMotor, PuntoMotorImagen,
-    DetalleTransmision, PuntoTransmision, PuntoTransmisionImagen,
-    DetalleFrenos, PuntoFrenos, PuntoFrenosImagen,
-    DetalleDireccionSuspension, PuntoDireccionSuspension, PuntoDireccionSuspensionImagen,
-    DetalleCarroceria, PuntoCarroceria, PuntoCarroceriaImagen,
-    DetalleRevisionGeneral, PuntoRevisionGeneral, PuntoRevisionGeneralImagen,
-    DetalleInterior, PuntoInterior, PuntoInteriorImagen
+    ImagenAlmacenadaMixin, ImagenPunto,
+    Vehiculo, PuntoInspeccion, DetalleMotor, PuntoMotorImagen,
+    DetalleTransmision, PuntoTransmisionImagen,
+    DetalleFrenos, PuntoFrenosImagen,
+    DetalleDireccionSuspension, PuntoDireccionSuspensionImagen,
+    DetalleCarroceria, PuntoCarroceriaImagen,
+    DetalleRevisionGeneral, PuntoRevisionGeneralImagen,
+    DetalleInterior, PuntoInteriorImagen
 )
+from . import busqueda, exportar, imagenes, inspecciones, normalizacion, reportes, sincronizacion, subidas
+from .idempotencia import idempotente
+from .paginacion import PaginadorCursor
 
 ESTADOS = [
     ('BUENO', 'Bueno'),
@@ -48,30 +61,15 @@ def login_view(request):
 @login_required
 def index(request):
     user = request.user
-    hoy = timezone.now().date()
+    hoy = timezone.localdate()
     
     # Obtener vehículos según permisos
-    if user.is_superuser:
-        vehiculos = Vehiculo.objects.all()
-    else:
-        try:
-            perfil = user.perfilusuario
-            
-            if perfil.cargo == 'TECNICO':
-                vehiculos = Vehiculo.objects.filter(usuario=user)
-            elif perfil.cargo in ['JEFE', 'GERENTE']:
-                vehiculos = Vehiculo.objects.filter(
-                    usuario__perfilusuario__empresa=perfil.empresa
-                )
-            else:
-                vehiculos = Vehiculo.objects.none()
-        except AttributeError:
-            vehiculos = Vehiculo.objects.none()
+    vehiculos = Vehiculo.objects.visible_to(user)
 
     # Datos para el gráfico (últimos 7 días)
     fecha_inicio = hoy - timezone.timedelta(days=6)
     registros_por_dia = (
-        vehiculos.filter(fecha_registro__date__gte=fecha_inicio)
+        vehiculos.registrados_entre(desde=fecha_inicio)
         .annotate(dia=TruncDate('fecha_registro'))
         .values('dia')
         .annotate(cantidad=Count('id'))
@@ -89,14 +87,9 @@ def index(request):
 
     # Calcular estadísticas
     total_vehiculos = vehiculos.count()
-    revisiones_hoy = vehiculos.filter(fecha_registro__date=hoy).count()
+    revisiones_hoy = vehiculos.registrados_entre(hoy, hoy).count()
     
-    mantenimientos_pendientes = vehiculos.filter(
-        Q(detalle_motor__puntos__estado='RECHAZADO') |
-        Q(detalle_transmision__puntos__estado='RECHAZADO') |
-        Q(detalle_frenos__puntos__estado='RECHAZADO') |
-        Q(detalle_direccion_suspension__puntos__estado='RECHAZADO')
-    ).distinct().count()
+    mantenimientos_pendientes = vehiculos.filter(tiene_rechazados=True).count()
 
     # Obtener información del perfil
     try:
@@ -124,9 +117,16 @@ def index(request):
 # Agregar vehículo
 # ------------------------------
 @login_required
+@idempotente('agregar_vehiculo')
 def agregar_vehiculo(request):
-    if request.method == 'POST' and request.POST.get('imagen_base64'):
-        imagen_base64 = request.POST['imagen_base64']
+    recibidas = []
+    if request.method == 'POST':
+        try:
+            recibidas = recibir_imagenes(request, 'imagen', 'imagen_sha256', 'imagen_base64')
+        except subidas.ErrorSubida as e:
+            messages.error(request, str(e))
+
+    if recibidas:
         patente = request.POST.get('patente')
         marca = request.POST['marca']
         modelo = request.POST['modelo']
@@ -134,20 +134,19 @@ def agregar_vehiculo(request):
         tipo_bencina = request.POST['tipo_bencina']
         numero_motor = request.POST['numero_motor']
 
-        ultimo = Vehiculo.objects.order_by('-numero_orden').first()
-        numero_orden = (ultimo.numero_orden + 1) if ultimo else 1
-
-        nuevo_vehiculo = Vehiculo.objects.create(
-            numero_orden=numero_orden,
+        # numero_orden lo asigna Vehiculo.save() con ContadorOrden
+        nuevo_vehiculo = Vehiculo(
             patente=patente,
             marca=marca,
             modelo=modelo,
             color=color,
             tipo_bencina=tipo_bencina,
             numero_motor=numero_motor,
-            imagen_base64=imagen_base64,
             usuario=request.user
         )
+        nuevo_vehiculo.asignar_imagen(recibidas[0])
+        nuevo_vehiculo.save()
+        normalizacion.programar(request.user, recibidas)
 
         return redirect('ver_reporte_vehiculo', id=nuevo_vehiculo.id)
 
@@ -165,37 +164,17 @@ def listar_vehiculos(request):
     fecha_hasta = request.GET.get('fecha_hasta')
 
     # Determinar el conjunto inicial de vehículos según permisos
-    if user.is_superuser:
-        vehiculos = Vehiculo.objects.all()
-    else:
-        try:
-            perfil = user.perfilusuario
-            
-            if perfil.cargo == 'TECNICO':
-                vehiculos = Vehiculo.objects.filter(usuario=user)
-            elif perfil.cargo in ['JEFE', 'GERENTE']:
-                vehiculos = Vehiculo.objects.filter(
-                    usuario__perfilusuario__empresa=perfil.empresa
-                )
-            else:
-                vehiculos = Vehiculo.objects.none()
-        except AttributeError:
-            vehiculos = Vehiculo.objects.none()
+    vehiculos = Vehiculo.objects.visible_to(user)
 
     # Aplicar filtros adicionales
     if query:
-        vehiculos = vehiculos.filter(
-            Q(patente__icontains=query) |
-            Q(marca__icontains=query) |
-            Q(modelo__icontains=query) |
-            Q(numero_orden__icontains=query)
-        )
+        vehiculos = vehiculos.buscar(query)
 
     if fecha_desde:
         try:
             fecha_desde_parsed = parse_date(fecha_desde)
             if fecha_desde_parsed:
-                vehiculos = vehiculos.filter(fecha_registro__date__gte=fecha_desde_parsed)
+                vehiculos = vehiculos.registrados_entre(desde=fecha_desde_parsed)
         except:
             pass
 
@@ -203,14 +182,12 @@ def listar_vehiculos(request):
         try:
             fecha_hasta_parsed = parse_date(fecha_hasta)
             if fecha_hasta_parsed:
-                vehiculos = vehiculos.filter(fecha_registro__date__lte=fecha_hasta_parsed)
+                vehiculos = vehiculos.registrados_entre(hasta=fecha_hasta_parsed)
         except:
             pass
 
-    # Paginación
-    paginator = Paginator(vehiculos.order_by('-fecha_registro'), 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginación por cursor: sin OFFSET ni COUNT(*) exacto en cada página
+    page_obj = PaginadorCursor(vehiculos.image_meta_only(), 15).pagina(request.GET.get('cursor'))
 
     # Determinar si el usuario puede ver opciones adicionales
     try:
@@ -239,42 +216,157 @@ def listar_vehiculos(request):
 
 
 # ------------------------------
-# Función auxiliar para procesar puntos con múltiples imágenes
+# Autocompletar del buscador
 # ------------------------------
-def procesar_punto_con_imagenes(detalle, punto_model, punto_imagen_model, clave, request):
-    """Procesa un punto con sus múltiples imágenes"""
-    estado = request.POST.get(f'estado_{clave}')
-    observacion = request.POST.get(f'observaciones_{clave}')
-    imagenes_base64 = request.POST.getlist(f'imagenes_{clave}[]')
+@login_required
+def autocompletar_vehiculos(request):
+    """Sugerencias para el buscador del listado; usa la misma búsqueda por índice"""
+    texto = request.GET.get('q', '').strip()
+    if not texto:
+        return JsonResponse({'resultados': []})
+
+    vehiculos = (
+        Vehiculo.objects.visible_to(request.user).buscar(texto)
+        .order_by('-fecha_registro', '-pk')
+        .values('id', 'numero_orden', 'patente', 'marca', 'modelo')[:8]
+    )
+    return JsonResponse({'resultados': [
+        {**vehiculo, 'url': reverse('ver_reporte_vehiculo', args=[vehiculo['id']])}
+        for vehiculo in vehiculos
+    ]})
 
-    if estado or observacion is not None or imagenes_base64:
-        punto, _ = punto_model.objects.get_or_create(
-            detalle=detalle, 
-            nombre=clave, 
-            defaults={'usuario': request.user}
+
+# ------------------------------
+# Búsqueda en observaciones
+# ------------------------------
+@login_required
+def buscar_observaciones(request):
+    """Puntos cuya observación contiene el texto, por relevancia, solo de vehículos visibles"""
+    texto = request.GET.get('q', '').strip()
+    resultados = []
+    if texto:
+        puntos = PuntoInspeccion.objects.filter(
+            detalle__vehiculo__in=Vehiculo.objects.visible_to(request.user)
+        )
+        resultados = (
+            busqueda.buscar_observaciones(puntos, texto)
+            .select_related('detalle__vehiculo')
+            .only(
+                'sistema', 'nombre', 'estado', 'observacion', 'fecha_registro', 'detalle__id',
+                'detalle__vehiculo__numero_orden', 'detalle__vehiculo__patente',
+                'detalle__vehiculo__marca', 'detalle__vehiculo__modelo',
+            )
+            .order_by('-relevancia', '-fecha_registro')[:50]
         )
 
-        punto.estado = estado or punto.estado
-        punto.observacion = observacion if observacion is not None else punto.observacion
-        punto.usuario = request.user
-        punto.save()
+    return render(request, 'vehiculos/buscar_observaciones.html', {
+        'q': texto,
+        'resultados': resultados,
+    })
+
 
-        # Procesar imágenes
-        for imagen_base64 in imagenes_base64:
-            if imagen_base64.strip():
-                punto_imagen_model.objects.create(
-                    punto=punto,
-                    imagen_base64=imagen_base64,
-                    usuario=request.user
-                )
+# ------------------------------
+# Exportar fotos en ZIP
+# ------------------------------
+@login_required
+def exportar_fotos(request):
+    def fecha(nombre):
+        try:
+            return parse_date(request.GET.get(nombre) or '')
+        except ValueError:
+            return None
+
+    def entero(nombre):
+        # isdigit() también acepta '²', que int() rechaza
+        valor = request.GET.get(nombre, '')
+        return int(valor) if valor.isascii() and valor.isdigit() else None
+
+    vehiculos = exportar.filtrar_vehiculos(
+        Vehiculo.objects.visible_to(request.user),
+        vehiculo_id=entero('vehiculo'),
+        fecha_desde=fecha('fecha_desde'),
+        fecha_hasta=fecha('fecha_hasta'),
+        empresa_id=entero('empresa'),
+    )
 
-    return punto
+    # El ZIP se arma mientras se envía: no se guarda ni en disco ni en memoria
+    response = StreamingHttpResponse(exportar.generar_zip(vehiculos), content_type='application/zip')
+    nombre = f"fotos_{timezone.localdate():%Y%m%d}.zip"
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return response
+
+
+# ------------------------------
+# Funciones auxiliares para recibir imágenes y procesar puntos
+# ------------------------------
+def recibir_imagenes(request, campo_archivos, campo_refs, campo_base64):
+    """Guarda en el almacén las imágenes recibidas y devuelve sus InfoImagen.
+
+    Acepta archivos multipart, hashes ya subidos por /imagenes/subir/ y,
+    por compatibilidad con formularios antiguos, base64. El llamador pasa el
+    resultado a normalizacion.programar() después de guardar las filas, para
+    que la normalización las encuentre. Lanza subidas.ErrorSubida si un
+    archivo supera el tamaño máximo.
+    """
+    # Con el mismo límite que /imagenes/subir/, antes de guardar ninguna
+    subidas.validar_tamano(request.FILES.getlist(campo_archivos))
+    nuevas = []
+    for archivo in request.FILES.getlist(campo_archivos):
+        mime, _, _ = imagenes.analizar_archivo(archivo)
+        if mime.startswith('image/'):
+            nuevas.append(imagenes.guardar_archivo(archivo))
+    for imagen_base64 in request.POST.getlist(campo_base64):
+        nuevas.append(imagenes.guardar_imagen_base64(imagen_base64))
+
+    # Las referencias ya se contabilizaron y normalizaron al subirse
+    subidas_antes = [imagenes.info_imagen(sha256.strip()) for sha256 in request.POST.getlist(campo_refs)]
+    return [info for info in subidas_antes + nuevas if info]
+
+
+def guardar_formulario_puntos(detalle, claves, request):
+    """Lee del POST los puntos del formulario de un sistema y los guarda en un solo lote.
+
+    Las fotos se guardan en el almacén antes de abrir la transacción.
+    """
+    datos = {}
+    for clave in claves:
+        datos[clave] = inspecciones.DatosPunto(
+            estado=request.POST.get(f'estado_{clave}'),
+            observacion=request.POST.get(f'observaciones_{clave}'),
+            imagenes=recibir_imagenes(
+                request, f'imagenes_{clave}', f'imagenes_ref_{clave}[]', f'imagenes_{clave}[]',
+            ),
+        )
+    guardados = inspecciones.guardar_puntos(detalle, datos, request.user)
+    # Las referencias no traen tamano_original, así que solo cuentan las recién subidas
+    normalizacion.programar(request.user, [i for dato in datos.values() for i in dato.imagenes])
+    return guardados
+
+
+def imagenes_existentes(detalle, punto_imagen_model):
+    """Ids de las imágenes ya guardadas de cada punto, para la isla JSON de la plantilla"""
+    puntos = {}
+    filas = (
+        punto_imagen_model.objects
+        .filter(punto__detalle=detalle)
+        .order_by('id')
+        .values_list('punto__nombre', 'id')
+    )
+    for nombre, imagen_id in filas:
+        puntos.setdefault(nombre, []).append(imagen_id)
+
+    url = reverse('ver_imagen_fila', args=[punto_imagen_model._meta.model_name, 0])
+    return {
+        'url_base': url[:url.rindex('0/')],
+        'puntos': puntos,
+    }
 
 
 # ------------------------------
 # Detalle Motor
 # ------------------------------
 @login_required
+@idempotente('detalle_motor')
 def agregar_detalle_motor(request, id):
     vehiculo = get_object_or_404(Vehiculo, id=id)
     detalle_motor, created = DetalleMotor.objects.get_or_create(
@@ -289,13 +381,13 @@ def agregar_detalle_motor(request, id):
     ]
 
     if request.method == 'POST':
-        for clave, label in puntos_motor:
-            procesar_punto_con_imagenes(
-                detalle_motor, PuntoMotor, PuntoMotorImagen, clave, request
-            )
-
-        messages.success(request, "Detalle del motor guardado correctamente.")
-        return redirect('ver_reporte_vehiculo', id=vehiculo.id)
+        try:
+            guardar_formulario_puntos(detalle_motor, [clave for clave, _ in puntos_motor], request)
+        except subidas.ErrorSubida as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, "Detalle del motor guardado correctamente.")
+            return redirect('ver_reporte_vehiculo', id=vehiculo.id)
 
     puntos = {p.nombre: p for p in detalle_motor.puntos.all()}
 
@@ -304,6 +396,7 @@ def agregar_detalle_motor(request, id):
         'puntos_motor': puntos_motor,
         'puntos': puntos,
         'ESTADOS': ESTADOS,
+        'imagenes_existentes': imagenes_existentes(detalle_motor, PuntoMotorImagen),
     })
 
 
@@ -311,6 +404,7 @@ def agregar_detalle_motor(request, id):
 # Detalle Transmisión
 # ------------------------------
 @login_required
+@idempotente('detalle_transmision')
 def agregar_detalle_transmision(request, id):
     vehiculo = get_object_or_404(Vehiculo, id=id)
     detalle_transmision, created = DetalleTransmision.objects.get_or_create(
@@ -325,13 +419,13 @@ def agregar_detalle_transmision(request, id):
     ]
 
     if request.method == 'POST':
-        for clave, label in puntos_transmision:
-            procesar_punto_con_imagenes(
-                detalle_transmision, PuntoTransmision, PuntoTransmisionImagen, clave, request
-            )
-
-        messages.success(request, "Detalle de transmisión guardado correctamente.")
-        return redirect('ver_reporte_vehiculo', id=vehiculo.id)
+        try:
+            guardar_formulario_puntos(detalle_transmision, [clave for clave, _ in puntos_transmision], request)
+        except subidas.ErrorSubida as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, "Detalle de transmisión guardado correctamente.")
+            return redirect('ver_reporte_vehiculo', id=vehiculo.id)
 
     puntos = {p.nombre: p for p in detalle_transmision.puntos.all()}
 
@@ -340,6 +434,7 @@ def agregar_detalle_transmision(request, id):
         'puntos_transmision': puntos_transmision,
         'puntos': puntos,
         'ESTADOS': ESTADOS,
+        'imagenes_existentes': imagenes_existentes(detalle_transmision, PuntoTransmisionImagen),
     })
 
 
@@ -347,6 +442,7 @@ def agregar_detalle_transmision(request, id):
 # Detalle Frenos
 # ------------------------------
 @login_required
+@idempotente('detalle_frenos')
 def agregar_detalle_frenos(request, id):
     vehiculo = get_object_or_404(Vehiculo, id=id)
     detalle_frenos, created = DetalleFrenos.objects.get_or_create(
@@ -361,13 +457,13 @@ def agregar_detalle_frenos(request, id):
     ]
 
     if request.method == 'POST':
-        for clave, label in puntos_frenos:
-            procesar_punto_con_imagenes(
-                detalle_frenos, PuntoFrenos, PuntoFrenosImagen, clave, request
-            )
-
-        messages.success(request, "Detalle de frenos guardado correctamente.")
-        return redirect('ver_reporte_vehiculo', id=vehiculo.id)
+        try:
+            guardar_formulario_puntos(detalle_frenos, [clave for clave, _ in puntos_frenos], request)
+        except subidas.ErrorSubida as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, "Detalle de frenos guardado correctamente.")
+            return redirect('ver_reporte_vehiculo', id=vehiculo.id)
 
     puntos = {p.nombre: p for p in detalle_frenos.puntos.all()}
 
@@ -376,6 +472,7 @@ def agregar_detalle_frenos(request, id):
         'puntos_frenos': puntos_frenos,
         'puntos': puntos,
         'ESTADOS': ESTADOS,
+        'imagenes_existentes': imagenes_existentes(detalle_frenos, PuntoFrenosImagen),
     })
 
 
@@ -383,6 +480,7 @@ def agregar_detalle_frenos(request, id):
 # Detalle Dirección y Suspensión
 # ------------------------------
 @login_required
+@idempotente('detalle_direccion_suspension')
 def agregar_detalle_direccion_suspension(request, id):
     vehiculo = get_object_or_404(Vehiculo, id=id)
     detalle_direccion_suspension, created = DetalleDireccionSuspension.objects.get_or_create(
@@ -399,14 +497,15 @@ def agregar_detalle_direccion_suspension(request, id):
     ]
 
     if request.method == 'POST':
-        for clave, label in puntos_direccion_suspension:
-            procesar_punto_con_imagenes(
-                detalle_direccion_suspension, PuntoDireccionSuspension, 
-                PuntoDireccionSuspensionImagen, clave, request
+        try:
+            guardar_formulario_puntos(
+                detalle_direccion_suspension, [clave for clave, _ in puntos_direccion_suspension], request
             )
-
-        messages.success(request, "Detalle de Dirección y Suspensión guardado correctamente.")
-        return redirect('ver_reporte_vehiculo', id=vehiculo.id)
+        except subidas.ErrorSubida as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, "Detalle de Dirección y Suspensión guardado correctamente.")
+            return redirect('ver_reporte_vehiculo', id=vehiculo.id)
 
     puntos = {p.nombre: p for p in detalle_direccion_suspension.puntos.all()}
 
@@ -415,6 +514,7 @@ def agregar_detalle_direccion_suspension(request, id):
         'puntos_direccion_suspension': puntos_direccion_suspension,
         'puntos': puntos,
         'ESTADOS': ESTADOS,
+        'imagenes_existentes': imagenes_existentes(detalle_direccion_suspension, PuntoDireccionSuspensionImagen),
     })
 
 
@@ -422,6 +522,7 @@ def agregar_detalle_direccion_suspension(request, id):
 # Detalle Carrocería
 # ------------------------------
 @login_required
+@idempotente('detalle_carroceria')
 def agregar_detalle_carroceria(request, id):
     vehiculo = get_object_or_404(Vehiculo, id=id)
     detalle_carroceria, created = DetalleCarroceria.objects.get_or_create(
@@ -437,13 +538,13 @@ def agregar_detalle_carroceria(request, id):
     ]
 
     if request.method == 'POST':
-        for clave, label in puntos_carroceria:
-            procesar_punto_con_imagenes(
-                detalle_carroceria, PuntoCarroceria, PuntoCarroceriaImagen, clave, request
-            )
-
-        messages.success(request, "Detalle de carrocería guardado correctamente.")
-        return redirect('ver_reporte_vehiculo', id=vehiculo.id)
+        try:
+            guardar_formulario_puntos(detalle_carroceria, [clave for clave, _ in puntos_carroceria], request)
+        except subidas.ErrorSubida as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, "Detalle de carrocería guardado correctamente.")
+            return redirect('ver_reporte_vehiculo', id=vehiculo.id)
 
     puntos = {p.nombre: p for p in detalle_carroceria.puntos.all()}
 
@@ -452,6 +553,7 @@ def agregar_detalle_carroceria(request, id):
         'puntos_carroceria': puntos_carroceria,
         'puntos': puntos,
         'ESTADOS': ESTADOS,
+        'imagenes_existentes': imagenes_existentes(detalle_carroceria, PuntoCarroceriaImagen),
     })
 
 
@@ -459,6 +561,7 @@ def agregar_detalle_carroceria(request, id):
 # Revisión General
 # ------------------------------
 @login_required
+@idempotente('detalle_revision_general')
 def agregar_detalle_revision_general(request, id):
     vehiculo = get_object_or_404(Vehiculo, id=id)
     detalle_revision, created = DetalleRevisionGeneral.objects.get_or_create(
@@ -477,13 +580,13 @@ def agregar_detalle_revision_general(request, id):
     ]
 
     if request.method == 'POST':
-        for clave, label in puntos_revision:
-            procesar_punto_con_imagenes(
-                detalle_revision, PuntoRevisionGeneral, PuntoRevisionGeneralImagen, clave, request
-            )
-
-        messages.success(request, "Detalle de revisión general guardado correctamente.")
-        return redirect('ver_reporte_vehiculo', id=vehiculo.id)
+        try:
+            guardar_formulario_puntos(detalle_revision, [clave for clave, _ in puntos_revision], request)
+        except subidas.ErrorSubida as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, "Detalle de revisión general guardado correctamente.")
+            return redirect('ver_reporte_vehiculo', id=vehiculo.id)
 
     puntos = {p.nombre: p for p in detalle_revision.puntos.all()}
 
@@ -492,6 +595,7 @@ def agregar_detalle_revision_general(request, id):
         'puntos_revision': puntos_revision,
         'puntos': puntos,
         'ESTADOS': ESTADOS,
+        'imagenes_existentes': imagenes_existentes(detalle_revision, PuntoRevisionGeneralImagen),
     })
 
 
@@ -499,6 +603,7 @@ def agregar_detalle_revision_general(request, id):
 # Detalle Interior
 # ------------------------------
 @login_required
+@idempotente('detalle_interior')
 def agregar_detalle_interior(request, id):
     vehiculo = get_object_or_404(Vehiculo, id=id)
     detalle_interior, created = DetalleInterior.objects.get_or_create(
@@ -515,13 +620,13 @@ def agregar_detalle_interior(request, id):
     ]
 
     if request.method == 'POST':
-        for clave, label in puntos_interior:
-            procesar_punto_con_imagenes(
-                detalle_interior, PuntoInterior, PuntoInteriorImagen, clave, request
-            )
-
-        messages.success(request, "Detalle del interior guardado correctamente.")
-        return redirect('ver_reporte_vehiculo', id=vehiculo.id)
+        try:
+            guardar_formulario_puntos(detalle_interior, [clave for clave, _ in puntos_interior], request)
+        except subidas.ErrorSubida as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, "Detalle del interior guardado correctamente.")
+            return redirect('ver_reporte_vehiculo', id=vehiculo.id)
 
     puntos = {p.nombre: p for p in detalle_interior.puntos.all()}
 
@@ -530,6 +635,69 @@ def agregar_detalle_interior(request, id):
         'puntos_interior': puntos_interior,
         'puntos': puntos,
         'ESTADOS': ESTADOS,
+        'imagenes_existentes': imagenes_existentes(detalle_interior, PuntoInteriorImagen),
+    })
+
+
+# ------------------------------
+# Inspección completa en un solo envío (JSON)
+# ------------------------------
+@login_required
+@idempotente('guardar_inspeccion')
+def guardar_inspeccion(request, id):
+    """Todos los sistemas de la inspección en un POST; el formato está en inspecciones.py"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
+    vehiculo = get_object_or_404(Vehiculo.objects.visible_to(request.user).image_meta_only(), id=id)
+
+    try:
+        cuerpo = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'JSON inválido'}, status=400)
+    try:
+        por_sistema = inspecciones.leer_inspeccion(cuerpo)
+    except inspecciones.ErrorInspeccion as e:
+        return JsonResponse({'success': False, 'error': str(e), 'errores': e.errores}, status=400)
+
+    # Las fotos llegan como hashes ya subidos (y contabilizados) por /imagenes/subir/
+    guardados = inspecciones.guardar_inspeccion(vehiculo, por_sistema, request.user)
+    return JsonResponse({'success': True, 'vehiculo': vehiculo.id, 'sistemas': {
+        sistema: {
+            clave: {'id': punto.pk, 'estado': punto.estado, 'observacion': punto.observacion}
+            for clave, punto in puntos.items()
+        }
+        for sistema, puntos in guardados.items()
+    }})
+
+
+# ------------------------------
+# Sincronización por lotes (captura sin conexión)
+# ------------------------------
+@login_required
+def sincronizar(request):
+    """POST: aplica un lote de operaciones y devuelve los cambios del servidor.
+    GET: solo los cambios desde ``?desde=<cursor>``. Formato en sincronizacion.py"""
+    if request.method == 'GET':
+        return JsonResponse({'success': True, **sincronizacion.cambios_desde(request.user, request.GET.get('desde'))})
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
+
+    try:
+        lote = sincronizacion.leer_lote(json.loads(request.body))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'JSON inválido'}, status=400)
+    except sincronizacion.ErrorSincronizacion as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    try:
+        resultados = sincronizacion.aplicar_operaciones(lote.operaciones, request.user)
+    except sincronizacion.ConflictoSincronizacion as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=409)
+
+    return JsonResponse({
+        'success': True,
+        'resultados': resultados,
+        'imagenes_faltantes': sincronizacion.imagenes_faltantes(lote.imagenes),
+        **sincronizacion.cambios_desde(request.user, lote.desde),
     })
 
 
@@ -538,74 +706,149 @@ def agregar_detalle_interior(request, id):
 # ------------------------------
 @login_required
 def ver_reporte_vehiculo(request, id):
-    vehiculo = get_object_or_404(Vehiculo, id=id)
-    
-    # Obtener todos los detalles y puntos
-    detalles = {}
-    sistemas = [
-        ('detalle_motor', 'puntos_motor'),
-        ('detalle_transmision', 'puntos_transmision'),
-        ('detalle_frenos', 'puntos_frenos'),
-        ('detalle_direccion_suspension', 'puntos_direccion_suspension'),
-        ('detalle_carroceria', 'puntos_carroceria'),
-        ('detalle_revision_general', 'puntos_revision_general'),
-        ('detalle_interior', 'puntos_interior'),
-    ]
+    # Todo el reporte (detalles, puntos e imágenes) con un número fijo de consultas
+    reporte = reportes.cargar_reporte(id)
+    return render(request, 'vehiculos/ver_reporte.html', reporte.contexto())
 
-    # Obtener todos los puntos organizados por sistema para la sección de detalles avanzados
-    sistemas_con_puntos = []
-    todos_los_puntos = []  # Lista para almacenar todos los puntos
-    
-    for detalle_attr, puntos_attr in sistemas:
-        detalle = getattr(vehiculo, detalle_attr, None)
-        puntos = detalle.puntos.all() if detalle else []
-        puntos_dict = {p.nombre: p for p in puntos}
-        
-        detalles[detalle_attr] = detalle
-        detalles[puntos_attr] = puntos_dict
-        
-        # Agregar a la lista de todos los puntos
-        todos_los_puntos.extend(puntos)
-        
-        # Para la sección de detalles avanzados
-        if detalle and puntos:
-            sistema_info = {
-                'nombre': detalle_attr.replace('detalle_', '').replace('_', ' ').title(),
-                'icono': get_sistema_icon(detalle_attr),
-                'puntos': puntos
-            }
-            sistemas_con_puntos.append(sistema_info)
-
-    # Calcular estadísticas para el resumen usando la lista de todos los puntos
-    total_puntos = len(todos_los_puntos)
-    puntos_buenos = sum(1 for p in todos_los_puntos if p.estado == 'BUENO')
-    puntos_observacion = sum(1 for p in todos_los_puntos if p.estado == 'OBSERVACION')
-    puntos_rechazados = sum(1 for p in todos_los_puntos if p.estado == 'RECHAZADO')
-
-    return render(request, 'vehiculos/ver_reporte.html', {
-        'vehiculo': vehiculo,
-        'sistemas_con_puntos': sistemas_con_puntos,
-        'total_puntos': total_puntos,
-        'puntos_buenos': puntos_buenos,
-        'puntos_observacion': puntos_observacion,
-        'puntos_rechazados': puntos_rechazados,
-        **detalles
-    })
 
-def get_sistema_icon(detalle_attr):
-    """Devuelve el ícono correspondiente para cada sistema"""
-    iconos = {
-        'detalle_motor': 'gear',
-        'detalle_transmision': 'gear-wide-connected',
-        'detalle_frenos': 'stop-circle',
-        'detalle_direccion_suspension': 'sliders',
-        'detalle_carroceria': 'car-front',
-        'detalle_revision_general': 'clipboard-check',
-        'detalle_interior': 'cup-hot'
-    }
-    return iconos.get(detalle_attr, 'circle')
+# ------------------------------
+# Subida binaria de imágenes (multipart y por partes)
+# ------------------------------
+@login_required
+@csrf_exempt
+def subir_imagenes(request):
+    # Los archivos se vuelcan a disco temporal en vez de quedar en memoria.
+    # Los handlers deben cambiarse antes de que el middleware CSRF lea el POST.
+    request.upload_handlers = [TemporaryFileUploadHandler(request)]
+    return _subir_imagenes(request)
 
 
+@csrf_protect
+@idempotente('subir_imagenes')
+def _subir_imagenes(request):
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
+
+    archivos = request.FILES.getlist('imagenes')
+    if not archivos:
+        return JsonResponse({'success': False, 'error': 'No se recibieron imágenes'}, status=400)
+
+    try:
+        subidas.validar_tamano(archivos)
+    except subidas.ErrorSubida as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    for archivo in archivos:
+        mime, _, _ = imagenes.analizar_archivo(archivo)
+        if not mime.startswith('image/'):
+            return JsonResponse({'success': False, 'error': f'"{archivo.name}" no es una imagen válida'}, status=400)
+
+    guardadas = [imagenes.guardar_archivo(archivo) for archivo in archivos]
+    normalizacion.programar(request.user, guardadas)
+    return JsonResponse({'success': True, 'imagenes': [asdict(info) for info in guardadas]})
+
+
+@login_required
+def subir_imagen_por_partes(request, upload_id):
+    # GET: cuántos bytes hay guardados, para reanudar
+    if request.method == 'GET':
+        return JsonResponse({'offset': subidas.offset_actual(request.user.id, upload_id)})
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
+
+    try:
+        inicio, fin, total = subidas.parsear_rango(request.headers.get('Content-Range'))
+        offset = subidas.agregar_parte(request.user.id, upload_id, inicio, fin, request)
+        if offset < total:
+            return JsonResponse({'success': True, 'completa': False, 'offset': offset})
+        info = subidas.finalizar(request.user.id, upload_id)
+        normalizacion.programar(request.user, [info])
+    except subidas.DesfaseSubida as e:
+        return JsonResponse({'success': False, 'error': str(e), 'offset': e.offset}, status=409)
+    except subidas.ErrorSubida as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({'success': True, 'completa': True, 'imagen': asdict(info)})
+
+
+# ------------------------------
+# Servir imágenes del almacén por hash
+# ------------------------------
+def _servir_blob(request, sha256, variante, cache_control):
+    if variante != imagenes.VARIANTE_ORIGINAL and variante not in imagenes.get_variantes():
+        raise Http404("Variante no válida")
+
+    etag = f'"{sha256}-{variante}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        try:
+            archivo = imagenes.abrir_variante(sha256, variante)
+        except (FileNotFoundError, OSError):
+            raise Http404("Imagen no encontrada")
+        response = FileResponse(archivo, content_type=imagenes.detectar_mime(archivo))
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+@login_required
+def ver_imagen(request, sha256, variante=imagenes.VARIANTE_ORIGINAL):
+    # El contenido de un hash nunca cambia: se puede cachear para siempre
+    try:
+        return _servir_blob(request, sha256, variante, 'private, max-age=31536000, immutable')
+    except Http404:
+        # Foto recibida que ya se normalizó y cuyo blob se borró: sigue en su hash nuevo
+        vigente = imagenes.hash_vigente(sha256)
+        if vigente == sha256:
+            raise
+        if variante == imagenes.VARIANTE_ORIGINAL:
+            return redirect('ver_imagen', sha256=vigente)
+        return redirect('ver_imagen_variante', sha256=vigente, variante=variante)
+
+
+# ------------------------------
+# Servir la imagen de una fila por id (vehículo, punto o imagen de texto)
+# ------------------------------
+def filas_visibles(modelo, usuario):
+    """Filas con imagen del modelo que pertenecen a vehículos visibles para el usuario"""
+    if issubclass(modelo, Vehiculo):
+        return modelo.objects.visible_to(usuario)
+    if issubclass(modelo, ImagenPunto):
+        return modelo.objects.filter(punto__detalle__vehiculo__in=Vehiculo.objects.visible_to(usuario))
+    # ImagenTexto y otras sin vehículo: solo desde el admin
+    return modelo.objects.all() if usuario.is_staff else modelo.objects.none()
+
+
+@login_required
+def ver_imagen_fila(request, modelo, id, variante=imagenes.VARIANTE_ORIGINAL):
+    try:
+        modelo = apps.get_model('vehiculos', modelo)
+    except LookupError:
+        raise Http404("Modelo no válido")
+    if not issubclass(modelo, ImagenAlmacenadaMixin):
+        raise Http404("Modelo no válido")
+
+    if variante != imagenes.VARIANTE_ORIGINAL and variante not in imagenes.get_variantes():
+        raise Http404("Variante no válida")
+
+    # Los ids son correlativos: solo se sirven filas de vehículos que el usuario puede ver
+    filas = filas_visibles(modelo, request.user)
+    # La fila puede cambiar de almacenamiento, así que se cachea con revalidación
+    cache_control = 'private, max-age=86400'
+    fila = get_object_or_404(filas.image_meta_only(), pk=id)
+    if fila.imagen_sha256:
+        return _servir_blob(request, fila.imagen_sha256, variante, cache_control)
+
+    # Fila todavía sin migrar: se decodifica el base64 y se reduce en el servidor, sin guardarlo
+    imagen_base64 = modelo.objects.filter(pk=id).values_list('imagen_base64', flat=True).first()
+    datos = imagenes.variante_en_memoria(imagenes.decodificar_base64(imagen_base64), variante)
+    if not datos:
+        raise Http404("Imagen no encontrada")
+    mime, _, _ = imagenes.analizar_imagen(datos)
+    response = HttpResponse(datos, content_type=mime)
+    response['Cache-Control'] = cache_control
+    return response
+
 
 # views.py - VERSIÓN CON MEJOR DEBUG
 from django.core.mail import EmailMessage, send_mail